@@ -0,0 +1,96 @@
+"""
+Модуль непрозрачных API-токенов для межсервисных вызовов.
+
+Токен — случайная строка с префиксом `ag_`, которую клиент передаёт в заголовке
+`Authorization: Bearer ...`. В базе хранится только SHA-256 токена: токен содержит 256 бит
+случайности, поэтому перебор невозможен и медленный хеш вроде bcrypt не нужен.
+
+Результат проверки кэшируется в `TTLCache` по хешу токена, в том числе отрицательный
+(«такого токена нет»), поэтому повторные запросы не ходят ни в bcrypt, ни в базу данных.
+Кэш сбрасывается целиком при изменении версий таблиц `api_tokens` и `users`: выпуск или
+отзыв токена и деактивация пользователя сразу видны во всех воркерах.
+"""
+
+import hashlib
+import secrets
+
+from app.backend import db
+from app.backend.cache import TTLCache
+from app.backend.deadline import apply_loader_timeout
+from app.backend.metrics import register_collector
+from app.backend.queries import API_TOKEN_OWNER
+from app.backend.singleflight import flights
+from app.backend.versions import table_versions
+
+TOKEN_PREFIX = "ag_"  # Отличает API-токены от JWT в заголовке Authorization
+TABLES = ("api_tokens", "users")
+
+def generate_token() -> str:
+    """
+    :return: str: Новый токен; показывается владельцу один раз и нигде не сохраняется.
+    """
+    return TOKEN_PREFIX + secrets.token_urlsafe(32)
+
+
+def hash_token(token: str) -> str:
+    """
+    :param token: Токен из заголовка.
+    :return: str: SHA-256 токена в hex (значение колонки `token_hash`).
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def is_api_token(token: str) -> bool:
+    """True, если строка похожа на API-токен, а не на JWT."""
+    return token.startswith(TOKEN_PREFIX)
+
+
+class TokenVerifier:
+    """
+    Проверка API-токенов с кэшем результатов в памяти процесса.
+
+    Атрибуты:
+        cache (TTLCache): Хеш токена -> id владельца или None (токен недействителен).
+    """
+
+    def __init__(self, cache: TTLCache | None = None):
+        self.cache = cache or TTLCache(max_entries=10_000, ttl=60.0, negative_ttl=10.0)
+        self._versions: tuple[int, ...] | None = None
+
+    def _sync_versions(self) -> None:
+        # Выпуск/отзыв токена или деактивация пользователя в любом воркере сбрасывает кэш
+        versions = tuple(table_versions.get(table) for table in TABLES)
+        if versions != self._versions:
+            self.cache.clear()
+            self._versions = versions
+
+    async def verify(self, token: str) -> int | None:
+        """
+        :param token: API-токен из заголовка `Authorization`.
+        :return: int | None: id активного владельца или None, если токен недействителен.
+        """
+        self._sync_versions()
+        token_hash = hash_token(token)
+        user_id = self.cache.get(token_hash, default=False)
+        if user_id is not False:
+            return user_id
+
+        async def load() -> int | None:
+            # Только основной сервер: только что выпущенный токен может ещё не дойти до реплики
+            async with db.get_session_factory()() as ss:
+                apply_loader_timeout(ss)
+                return await ss.scalar(API_TOKEN_OWNER, {"token_hash": token_hash})
+
+        user_id = await flights.do(("api_token", token_hash), load)
+        self.cache.put(token_hash, user_id)
+        return user_id
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Статистика кэша проверок.
+        """
+        return self.cache.stats()
+
+
+token_verifier = TokenVerifier()
+register_collector("api_tokens", token_verifier.stats)
@@ -0,0 +1,180 @@
+"""
+Модуль кэша сериализованных ответов.
+
+Списки ролей и правил доступа одинаковы для всех клиентов с правом чтения, поэтому
+готовые байты JSON кэшируются по ключу (эндпоинт, версия таблицы, курсор страницы).
+Повторное чтение пропускает и запрос к БД, и сериализацию. Версия таблицы входит в ключ,
+так что после записи старые записи больше не выдаются, а обработчики записи дополнительно
+вызывают `invalidate`, чтобы сразу освободить память.
+
+Вытеснение — LRU с двумя ограничениями: числом записей и суммарным размером в байтах.
+
+`TTLCache` — небольшой LRU со сроком жизни записей для результатов проверок (например,
+API-токенов), включая отрицательные: «такого ключа нет» тоже кэшируется, но на меньший срок.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from app.backend.metrics import register_collector
+
+
+class ResponseCache:
+    """
+    LRU-кэш сериализованных ответов с ограничением по размеру.
+
+    Атрибуты:
+        max_entries (int): Максимальное число записей.
+        max_bytes (int): Максимальный суммарный размер хранимых ответов.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> bytes | None:
+        """
+        :param key: Ключ вида (эндпоинт, версия, курсор).
+        :return: bytes | None: Готовое тело ответа или None при промахе.
+        """
+        payload = self._entries.get(key)
+        if payload is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, key: tuple, payload: bytes) -> None:
+        """
+        Сохраняет тело ответа, вытесняя давно не использованные записи.
+        Ответы больше `max_bytes` не кэшируются.
+
+        :param key: Ключ вида (эндпоинт, версия, курсор).
+        :param payload: Сериализованное тело ответа.
+        """
+        if len(payload) > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = payload
+        self._size += len(payload)
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def invalidate(self, endpoint: Hashable) -> None:
+        """
+        Удаляет все записи эндпоинта (вызывается обработчиками записи).
+
+        :param endpoint: Первый элемент ключа, например "roles".
+        """
+        for key in [key for key in self._entries if key[0] == endpoint]:
+            self._discard(key)
+
+    def clear(self) -> None:
+        """Удаляет все записи (например, после отката тестовой транзакции)."""
+        self._entries.clear()
+        self._size = 0
+
+    def _discard(self, key: tuple) -> None:
+        payload = self._entries.pop(key, None)
+        if payload is not None:
+            self._size -= len(payload)
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Число записей, занятая память, попадания, промахи и доля попаданий.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class TTLCache:
+    """
+    LRU-кэш со сроком жизни записей и отдельным сроком для отрицательных результатов.
+
+    Отрицательным считается значение None: оно хранится `negative_ttl` секунд, чтобы
+    повторные запросы с несуществующим ключом не доходили до базы данных.
+
+    Атрибуты:
+        max_entries (int): Максимальное число записей.
+        ttl (float): Срок жизни положительной записи в секундах.
+        negative_ttl (float): Срок жизни отрицательной записи в секундах.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_entries: int = 10_000, ttl: float = 60.0, negative_ttl: float = 10.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = _MISSING) -> Any:
+        """
+        :param key: Ключ записи.
+        :param default: Что вернуть при промахе или истёкшей записи.
+        :return: Сохранённое значение (в том числе None) или `default`.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        if entry[1] is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Сохраняет значение; None сохраняется на `negative_ttl` секунд.
+
+        :param key: Ключ записи.
+        :param value: Значение или None для отрицательного результата.
+        """
+        ttl = self.negative_ttl if value is None else self.ttl
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Удаляет все записи."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Число записей, попадания (в том числе отрицательные) и промахи.
+        """
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+        }
+
+
+response_cache = ResponseCache()
+register_collector("response_cache", response_cache.stats)
@@ -0,0 +1,112 @@
+"""
+Модуль сжатия ответов.
+
+Кодеки — gzip (всегда), zstd (`compression.zstd` из Python 3.14 или пакет `backports.zstd`)
+и brotli (пакет `brotli`) — подключаются, только если доступны: без них сервис работает
+на gzip. `negotiate` выбирает кодек по заголовку `Accept-Encoding` с учётом q-весов,
+при равных весах — в порядке предпочтения сервера (zstd быстрее и плотнее gzip).
+
+Кодировщик сжимает ответ целиком (`finish`) или потоково (`chunk` на каждую часть):
+в потоковом режиме каждая часть сбрасывается до границы блока, чтобы клиент получал
+NDJSON-прогресс сразу, а не по окончании ответа. Используется `CompressionMiddleware`
+(см. `app.backend.middleware`); результаты замеров — `benchmarks/bench_compression.py`.
+"""
+
+import zlib
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class GzipEncoder:
+    """gzip (zlib); уровень 5 — почти степень сжатия уровня 9 при заметно меньшей цене CPU."""
+
+    name = "gzip"
+
+    def __init__(self, level: int = 5):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: формат gzip
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class ZstdEncoder:
+    """Zstandard: при той же цене CPU сжимает JSON плотнее gzip."""
+
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        self._compressor = zstd.ZstdCompressor(level=level)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data, zstd.ZstdCompressor.FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data, zstd.ZstdCompressor.FLUSH_FRAME)
+
+
+class BrotliEncoder:
+    """Brotli; уровни выше 5 слишком дороги для динамических ответов."""
+
+    name = "br"
+
+    def __init__(self, level: int = 4):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+# Доступные кодеки в порядке предпочтения сервера
+ENCODERS = {
+    encoder.name: encoder
+    for encoder, available in (
+        (ZstdEncoder, zstd is not None),
+        (BrotliEncoder, brotli is not None),
+        (GzipEncoder, True),
+    )
+    if available
+}
+
+
+def negotiate(accept_encoding: str, available=ENCODERS) -> str | None:
+    """
+    :param accept_encoding: Значение заголовка `Accept-Encoding`.
+    :param available: Имена кодеков в порядке предпочтения сервера.
+    :return: str | None: Имя выбранного кодека; None — отдавать без сжатия.
+    """
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            weights[coding.strip()] = q
+
+    best, best_q = None, 0.0
+    for name in available:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
@@ -3,24 +3,113 @@
 
 Этот модуль предоставляет функции для инициализации таблиц,
 тестирования подключения к PostgreSQL и получения данных из базы.
+Записи выполняются через `session` (основной сервер), чтения — через
+`read_session` (реплика, если она настроена).
+
+Движки и фабрики сессий создаются лениво при первом обращении (`get_engine()`,
+`get_session_factory()` и т.д.), поэтому импорт модуля не читает настройки
+и не загружает драйвер asyncpg. Атрибуты `engine`, `session`, `replica_engine`,
+`read_session` и `setting` оставлены для совместимости и тоже вычисляются лениво.
 """
 import asyncio
 
-from typing import Optional
+from functools import lru_cache
 
 from sqlalchemy import text
-from sqlalchemy.orm import DeclarativeBase
 
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
-from app.backend.settings import setting  # Экземпляр класса Settings
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from app.backend import query_stats, statement_cache
+from app.backend.settings import get_settings
 
 from app.models.user import User
 from app.models.role import Role
 from app.models.business_element import BusinessElement
 from app.models.access_rule import AccessRule, Base
+from app.models.api_token import ApiToken
+from app.models.revoked_token import RevokedToken
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    """
+    Создаёт движок с общими для основного сервера и реплики параметрами пула и кэшей
+    и подключает к нему учёт кэша выражений и журнал медленных запросов.
+    """
+    setting = get_settings()
+    engine = create_async_engine(
+        url,
+        echo=False,
+        pool_size=setting.DB_POOL_SIZE,
+        connect_args={"prepared_statement_cache_size": setting.DB_PREPARED_STATEMENT_CACHE_SIZE},
+    )
+    statement_cache.instrument(engine)
+    return query_stats.instrument(engine, threshold=setting.SLOW_QUERY_MS / 1000)
+
+
+@lru_cache
+def get_engine() -> AsyncEngine:
+    """
+    :return: AsyncEngine: Движок основного сервера, создаваемый при первом обращении.
+    """
+    return _create_engine(get_settings().get_path)
+
+
+@lru_cache
+def get_replica_engine() -> AsyncEngine:
+    """
+    :return: AsyncEngine: Движок реплики для чтения. Без настроенной реплики
+             возвращается движок основного сервера.
+    """
+    setting = get_settings()
+    if not setting.get_replica_path:
+        return get_engine()
+    return _create_engine(setting.get_replica_path)
+
+
+@lru_cache
+def get_session_factory() -> async_sessionmaker:
+    """
+    :return: async_sessionmaker: Фабрика сессий основного сервера.
+    """
+    return async_sessionmaker(bind=get_engine())
+
+
+@lru_cache
+def get_read_session_factory() -> async_sessionmaker:
+    """
+    :return: async_sessionmaker: Фабрика сессий для чтения (реплика).
+    """
+    return async_sessionmaker(bind=get_replica_engine())
+
+
+def reset_engines() -> None:
+    """
+    Сбрасывает движки и фабрики сессий, унаследованные от родительского процесса.
+
+    Вызывается в воркере сразу после fork: сокеты пула родителя не закрываются
+    (`close=False`), чтобы не оборвать чужие соединения, а новые движки создаются
+    лениво при первом обращении уже в дочернем процессе.
+    """
+    for getter in (get_engine, get_replica_engine):
+        if getter.cache_info().currsize:
+            getter().sync_engine.dispose(close=False)
+    for getter in (get_engine, get_replica_engine, get_session_factory, get_read_session_factory):
+        getter.cache_clear()
+
+
+_LAZY_ATTRIBUTES = {
+    "engine": get_engine,
+    "replica_engine": get_replica_engine,
+    "session": get_session_factory,
+    "read_session": get_read_session_factory,
+    "setting": get_settings,
+}
+
 
-engine = create_async_engine(setting.get_path, echo=False)
-session = async_sessionmaker(bind=engine)
+def __getattr__(name: str):
+    # Совместимость: `from app.backend.db import engine, session, setting` без создания при импорте
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 async def create_tables():
@@ -34,7 +123,7 @@ async def create_tables():
         Exception: Если произошла ошибка при создании таблиц.
     """
     try:
-        async with engine.begin() as conn:
+        async with get_engine().begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
             print("Таблицы успешно созданы!")
     except Exception as e:
@@ -48,7 +137,7 @@ async def get_version() -> None:
     Эта функция предназначена для проверки подключения к базе данных
     и должна быть удалена после завершения тестирования.
     """
-    async with session() as ss:
+    async with get_session_factory()() as ss:
         res = await ss.execute(text("select version();"))
         print(res.fetchone())
 
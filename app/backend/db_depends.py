@@ -8,6 +8,14 @@
 Используется совместно с `sqlalchemy.ext.asyncio.AsyncSession` и `async_generator` для корректного жизненного цикла сессии.
 Гарантирует, что каждое HTTP-запроса получает изолированную сессию, предотвращая утечки ресурсов и конфликты транзакций.
 
+Чтения масштабируются через реплику: обработчики только для чтения используют `get_read_session`,
+а записи — `get_session` (основной сервер). После собственной записи пользователь получает cookie
+`RW_COOKIE_NAME`, и в течение `READ_YOUR_WRITES_SECONDS` его чтения тоже идут на основной сервер,
+чтобы не увидеть устаревшие данные из-за задержки репликации.
+
+Обе зависимости передают дедлайн запроса в PostgreSQL (`SET LOCAL statement_timeout`,
+см. `app.backend.deadline`).
+
 Пример использования:
     from fastapi import Depends
     from .dependencies import get_session
@@ -18,18 +26,66 @@
         return result.scalars().all()
 """
 
+import time
+
+from fastapi import Request, Response
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.backend.db import session
 
+from app.backend.db import get_read_session_factory, get_session_factory
+from app.backend.deadline import apply_statement_timeout
+from app.backend.settings import get_settings
+
+RW_COOKIE_NAME = "ag_rw_until"  # Cookie с окончанием окна read-your-writes (unix time)
 
-async def get_session() -> AsyncSession:
+
+async def get_session(response: Response) -> AsyncSession:
     """
     Асинхронная функция зависимости для FastAPI, предоставляющая сессию SQLAlchemy.
-    Создаёт новую асинхронную сессию SQLAlchemy и управляет её жизненным циклом.
+    Создаёт новую асинхронную сессию SQLAlchemy к основному серверу и управляет её жизненным циклом.
     Сессия автоматически закрывается после завершения запроса.
+    После успешного коммита выставляет cookie окна read-your-writes.
+    """
+    async with get_session_factory()() as ss:
+        apply_statement_timeout(ss)
+        window = get_settings().READ_YOUR_WRITES_SECONDS
+
+        @event.listens_for(ss.sync_session, "after_commit")
+        def _mark_write(_):
+            response.set_cookie(
+                RW_COOKIE_NAME, str(time.time() + window),
+                max_age=max(int(window), 1), httponly=True,
+            )
+
+        try:
+            yield ss
+        finally:
+            await ss.close()  # Закрывает сессию при ошибке
+
+
+def _in_read_your_writes_window(request: Request) -> bool:
+    """Проверяет, не истекло ли окно read-your-writes после записи пользователя."""
+    value = request.cookies.get(RW_COOKIE_NAME)
+    if not value:
+        return False
+    try:
+        return float(value) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_read_session(request: Request) -> AsyncSession:
+    """
+    Зависимость для обработчиков только для чтения.
+    Отдаёт сессию к реплике, а в окне read-your-writes — к основному серверу.
     """
-    async with session() as ss:
+    if _in_read_your_writes_window(request):
+        factory = get_session_factory()
+    else:
+        factory = get_read_session_factory()
+    async with factory() as ss:
+        apply_statement_timeout(ss)
         try:
             yield ss
         finally:
-            await ss.close()  # Закрывает сессию при ошибке
\ No newline at end of file
+            await ss.close()
@@ -0,0 +1,77 @@
+"""
+Модуль дедлайнов запросов.
+
+`DeadlineMiddleware` (см. `app.backend.middleware`) назначает каждому запросу бюджет времени:
+по маршруту; заголовок `X-Request-Timeout` может его только сократить. Дедлайн
+хранится в контекстной переменной; сессии из `get_session`/`get_read_session` передают
+оставшееся время в PostgreSQL как `SET LOCAL statement_timeout` в начале каждой транзакции,
+так что запрос к базе данных не переживает сам HTTP-запрос.
+
+Общие загрузки (single-flight: пользователь, снимок прав, API-токены, отзывы) открывают
+собственные сессии и защищены от отмены вызывающего запроса, а их результат нужен сразу
+нескольким запросам с разными бюджетами. Поэтому они получают не дедлайн вызывающего,
+а постоянный потолок `LOADER_STATEMENT_TIMEOUT_MS` (`apply_loader_timeout`): брошенная
+загрузка не держит соединение пула дольше него.
+"""
+
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+current_deadline: ContextVar[float | None] = ContextVar("current_deadline", default=None)
+
+MIN_STATEMENT_TIMEOUT_MS = 1  # 0 в PostgreSQL означает «без ограничения»
+LOADER_STATEMENT_TIMEOUT_MS = 5_000  # Потолок общих загрузок: простые запросы по индексу
+
+
+def remaining() -> float | None:
+    """
+    :return: float | None: Сколько секунд осталось до дедлайна запроса (None — дедлайна нет).
+    """
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def statement_timeout_ms() -> int | None:
+    """
+    :return: int | None: Значение `statement_timeout` для транзакции, начинающейся сейчас.
+    """
+    left = remaining()
+    if left is None:
+        return None
+    return max(MIN_STATEMENT_TIMEOUT_MS, int(left * 1000))
+
+
+def apply_statement_timeout(session) -> None:
+    """
+    Подписывает сессию на начало транзакции: каждая транзакция получает `statement_timeout`
+    по оставшемуся бюджету запроса. Без дедлайна и не на PostgreSQL ничего не делает.
+
+    :param session: `AsyncSession` запроса.
+    """
+    if current_deadline.get() is None:
+        return
+    _listen(session, statement_timeout_ms)
+
+
+def apply_loader_timeout(session, timeout_ms: int = LOADER_STATEMENT_TIMEOUT_MS) -> None:
+    """
+    Подписывает сессию общей загрузки на постоянный `statement_timeout` в каждой транзакции.
+    Не на PostgreSQL ничего не делает.
+
+    :param session: `AsyncSession` загрузки.
+    :param timeout_ms: Потолок времени выражения, мс.
+    """
+    _listen(session, lambda: timeout_ms)
+
+
+def _listen(session, timeout) -> None:
+    def _set_timeout(_session, _transaction, connection):
+        value = timeout()
+        if value is not None and connection.dialect.name == "postgresql":
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(value)}")
+
+    event.listen(session.sync_session, "after_begin", _set_timeout)
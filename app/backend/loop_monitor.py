@@ -0,0 +1,115 @@
+"""
+Модуль мониторинга задержки цикла событий.
+
+Фоновая задача `LoopMonitor.run` каждые `interval` секунд засыпает и замеряет, насколько
+позже запланированного она проснулась: это задержка планирования (lag) цикла событий —
+столько ждал бы любой готовый к работе запрос. Значения складываются в гистограмму,
+которую отдаёт `GET /metrics` (раздел `event_loop`).
+
+Пока цикл заблокирован синхронным вызовом (bcrypt, тяжёлая сериализация, блокирующий I/O),
+сама задача выполниться не может, поэтому стек снимает сторожевой поток: если пульс цикла
+не обновлялся дольше `interval + threshold`, он сохраняет текущий стек потока цикла
+(`sys._current_frames`). Когда цикл освобождается, задержка записывается вместе с этим
+стеком — видно, какой код держал цикл.
+
+Накладные расходы: одно пробуждение задачи и два пробуждения потока на `interval`.
+"""
+
+import asyncio
+import bisect
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from app.backend.metrics import register_collector
+
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)  # Верхние границы корзин гистограммы
+
+
+class LoopMonitor:
+    """
+    Монитор задержки цикла событий со снятием стека при блокировке.
+
+    Атрибуты:
+        interval (float): Период замера, сек.
+        threshold (float): Задержка, начиная с которой блокировка записывается со стеком, сек.
+        stalls (deque[dict]): Последние блокировки: задержка, время, стек.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1, max_stalls: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: deque[dict] = deque(maxlen=max_stalls)
+        self.counts = [0] * (len(BUCKETS_MS) + 1)  # Последняя корзина — больше BUCKETS_MS[-1]
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self._beat = 0.0
+        self._pending_stack: str | None = None
+        self._loop_thread_id: int | None = None
+        self._stop = threading.Event()
+
+    def record(self, lag: float) -> None:
+        """Добавляет замер задержки (сек) в гистограмму; блокировку — в `stalls`."""
+        lag_ms = lag * 1000
+        self.counts[bisect.bisect_left(BUCKETS_MS, lag_ms)] += 1
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.threshold:
+            self.stall_count += 1
+            self.stalls.append({
+                "lag_ms": round(lag_ms, 1),
+                "at": time.time(),
+                "stack": self._pending_stack,
+            })
+        self._pending_stack = None
+
+    def _watchdog(self) -> None:
+        # Отдельный поток: работает, даже когда цикл событий заблокирован
+        captured_for = None
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            if time.monotonic() - beat < self.interval + self.threshold or captured_for == beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._pending_stack = "".join(traceback.format_stack(frame, limit=15))
+                captured_for = beat  # Один стек на одну блокировку
+
+    async def run(self) -> None:
+        """Фоновая задача замеров (запускается в lifespan)."""
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._beat = time.monotonic()
+        watchdog = threading.Thread(target=self._watchdog, name="loop-monitor", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                started = time.monotonic()
+                self._beat = started
+                await asyncio.sleep(self.interval)
+                self.record(max(0.0, time.monotonic() - started - self.interval))
+        finally:
+            self._stop.set()
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Гистограмма задержек (мс), средняя и максимальная задержка, блокировки.
+        """
+        labels = [f"le_{bound}" for bound in BUCKETS_MS] + ["inf"]
+        return {
+            "samples": self.samples,
+            "mean_lag_ms": round(self.total_lag / self.samples * 1000, 3) if self.samples else 0.0,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "histogram_ms": dict(zip(labels, self.counts)),
+            "stalls": self.stall_count,
+            "recent_stalls": list(self.stalls),
+        }
+
+
+loop_monitor = LoopMonitor()
+register_collector("event_loop", loop_monitor.stats)
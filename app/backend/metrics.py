@@ -0,0 +1,28 @@
+"""
+Модуль метрик приложения.
+
+Компоненты регистрируют здесь функции-сборщики, возвращающие словарь показателей,
+а эндпоинт `GET /metrics` отдаёт их все одним JSON-объектом. Сборщики вызываются
+только при запросе метрик, поэтому на обработку обычных запросов они не влияют.
+"""
+
+from typing import Callable
+
+_collectors: dict[str, Callable[[], dict]] = {}
+
+
+def register_collector(name: str, collector: Callable[[], dict]) -> None:
+    """
+    Регистрирует сборщик метрик.
+
+    :param name: Имя раздела в ответе `GET /metrics`.
+    :param collector: Функция без аргументов, возвращающая словарь показателей.
+    """
+    _collectors[name] = collector
+
+
+def collect() -> dict:
+    """
+    :return: dict: Показатели всех зарегистрированных сборщиков по их именам.
+    """
+    return {name: collector() for name, collector in _collectors.items()}
@@ -0,0 +1,479 @@
+"""
+Модуль ASGI-middleware приложения.
+
+`ConcurrencyLimitMiddleware` ограничивает число одновременно обрабатываемых запросов
+по группам маршрутов (вход/регистрация, чтения, записи) и сбрасывает нагрузку: если
+запрос ждёт свободного места дольше бюджета очереди группы, он сразу получает 503
+с заголовком `Retry-After`, а не копится в очереди к пулу соединений до таймаутов.
+Так задержка принятых запросов остаётся ограниченной, а перегрузка не деградирует всех.
+
+`DeadlineMiddleware` назначает запросу бюджет времени (см. `app.backend.deadline`) и
+отменяет обработчик, когда бюджет исчерпан (504) или клиент отключился: брошенная работа
+сразу перестаёт занимать соединения пула.
+
+`AuthTraceMiddleware` включает трассировку решений авторизации (см. `app.backend.trace`)
+для запросов с заголовком `X-AuthZ-Trace` и отдаёт её администратору в заголовке ответа.
+
+`CompressionMiddleware` сжимает ответы (gzip, а также zstd/brotli, если доступны;
+см. `app.backend.compression`) для клиентов, которые это поддерживают: JSON-списки ролей
+и правил сжимаются в разы, и удалённые клиенты получают их заметно быстрее.
+
+`QueryRouteMiddleware` сообщает журналу запросов (см. `app.backend.query_stats`), какому
+маршруту принадлежат выполняемые SQL-выражения.
+"""
+
+import asyncio
+import math
+import re
+import time
+from dataclasses import dataclass, field
+
+import orjson
+
+from app.backend.compression import ENCODERS, negotiate
+from app.backend.deadline import current_deadline
+from app.backend.metrics import register_collector
+from app.backend.permissions import permission_cache
+from app.backend.query_stats import current_scope
+from app.backend.trace import ADMIN_ROLE_NAME, TRACE_HEADER, AuthTrace, current_trace
+
+
+@dataclass
+class RouteGroup:
+    """
+    Группа маршрутов с общим лимитом конкурентности.
+
+    Атрибуты:
+        name (str): Имя группы в метриках.
+        limit (int): Максимум одновременно обрабатываемых запросов.
+        queue_timeout (float): Бюджет ожидания в очереди, сек; после него — 503.
+        prefixes (tuple[str, ...]): Префиксы путей группы (пусто — любые пути).
+        methods (tuple[str, ...]): HTTP-методы группы (пусто — любые методы).
+    """
+
+    name: str
+    limit: int
+    queue_timeout: float
+    prefixes: tuple[str, ...] = ()
+    methods: tuple[str, ...] = ()
+    inflight: int = 0
+    admitted: int = 0
+    shed: int = 0
+    waiting: int = 0
+    max_queue_time: float = 0.0
+    _semaphore: asyncio.Semaphore | None = field(default=None, repr=False)
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods and method not in self.methods:
+            return False
+        return not self.prefixes or path.startswith(self.prefixes)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Создаётся при первом запросе, уже внутри работающего цикла событий
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "max_queue_time_ms": round(self.max_queue_time * 1000, 1),
+        }
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    ASGI-middleware ограничения конкурентности и сброса нагрузки.
+
+    Запрос относится к первой подходящей группе; пути из `exempt` (проверки здоровья,
+    метрики) и запросы без подходящей группы не ограничиваются.
+    """
+
+    def __init__(self, app, groups: list[RouteGroup], exempt: tuple[str, ...] = ()):
+        self.app = app
+        self.groups = groups
+        self.exempt = exempt
+        register_collector("concurrency", self.stats)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+        group = next((g for g in self.groups if g.matches(scope["method"], scope["path"])), None)
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        semaphore = group.semaphore
+        if semaphore.locked():
+            # Мест нет: ждём не дольше бюджета очереди
+            started = time.monotonic()
+            group.waiting += 1
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=group.queue_timeout)
+            except TimeoutError:
+                group.shed += 1
+                await self._reject(group, send)
+                return
+            finally:
+                group.waiting -= 1
+            group.max_queue_time = max(group.max_queue_time, time.monotonic() - started)
+        else:
+            await semaphore.acquire()
+
+        group.admitted += 1
+        group.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            group.inflight -= 1
+            semaphore.release()
+
+    @staticmethod
+    async def _reject(group: RouteGroup, send) -> None:
+        body = orjson.dumps({"detail": "Сервер перегружен, повторите запрос позже"})
+        retry_after = str(max(1, math.ceil(group.queue_timeout)))
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", retry_after.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Показатели каждой группы: лимит, в работе, в очереди, принято, сброшено.
+        """
+        return {group.name: group.stats() for group in self.groups}
+
+
+class AuthTraceMiddleware:
+    """
+    ASGI-middleware трассировки авторизации.
+
+    Без заголовка `X-AuthZ-Trace` запрос проходит без изменений. С заголовком трасса
+    собирается всегда, но добавляется в ответ, только если пользователь запроса —
+    администратор (роль `admin` в `permission_cache`).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        trace = AuthTrace()
+        token = current_trace.set(trace)
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start" and self._is_admin(trace):
+                message = {
+                    **message,
+                    "headers": [
+                        *message.get("headers", []),
+                        (TRACE_HEADER.encode(), trace.header(message["status"])),
+                    ],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            current_trace.reset(token)
+
+    @staticmethod
+    def _requested(scope) -> bool:
+        name = TRACE_HEADER.encode()
+        return any(key == name and value not in (b"", b"0") for key, value in scope["headers"])
+
+    @staticmethod
+    def _is_admin(trace: AuthTrace) -> bool:
+        principal = trace.last("principal")
+        if principal is None or principal.get("role_id") is None:
+            return False
+        return permission_cache.roles.get(principal["role_id"]) == ADMIN_ROLE_NAME
+
+
+class DeadlineMiddleware:
+    """
+    ASGI-middleware дедлайнов и отмены работы отключившихся клиентов.
+
+    Бюджет берётся из первого подходящего шаблона `routes` (None — без дедлайна), иначе
+    `default`. Заголовок `X-Request-Timeout` (секунды, конечное число) может только сократить
+    бюджет маршрута; маршрутам без дедлайна он его не назначает. Обработчик выполняется отдельной задачей; она отменяется по истечении
+    бюджета (клиент получает 504, если ответ ещё не начат) или при `http.disconnect`.
+    """
+
+    HEADER = b"x-request-timeout"
+    MIN_SECONDS = 0.05
+
+    def __init__(
+        self,
+        app,
+        default: float | None,
+        routes: list[tuple[str, float | None]] = (),
+    ):
+        self.app = app
+        self.default = default
+        self.routes = [(re.compile(pattern), seconds) for pattern, seconds in routes]
+        self.expired = 0
+        self.disconnected = 0
+        register_collector("deadlines", self.stats)
+
+    def _budget(self, scope) -> float | None:
+        budget = next(
+            (seconds for pattern, seconds in self.routes if pattern.match(scope["path"])),
+            self.default,
+        )
+        if budget is None:
+            return None  # Заголовок клиента не добавляет дедлайн маршрутам без него
+        for key, value in scope["headers"]:
+            if key == self.HEADER:
+                try:
+                    requested = float(value)
+                except ValueError:
+                    break
+                if math.isfinite(requested):
+                    # Клиент может только сократить бюджет сервера, но не увеличить его
+                    budget = min(budget, max(requested, self.MIN_SECONDS))
+                break
+        return budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = self._budget(scope)
+        token = current_deadline.set(None if budget is None else time.monotonic() + budget)
+        messages: asyncio.Queue = asyncio.Queue()
+        disconnected = asyncio.Event()
+        response_started = False
+
+        async def pump():
+            # Читаем сообщения клиента заранее, чтобы заметить отключение во время обработки
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    return
+
+        async def send_tracked(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, messages.get, send_tracked))
+        listener = asyncio.ensure_future(pump())
+        disconnect = asyncio.ensure_future(disconnected.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {handler, disconnect}, timeout=budget, return_when=asyncio.FIRST_COMPLETED,
+            )
+            if handler in done:
+                handler.result()  # Исключение обработчика уходит дальше, как без middleware
+                return
+            handler.cancel()
+            await asyncio.gather(handler, return_exceptions=True)
+            if disconnect in done:
+                self.disconnected += 1
+                return
+            self.expired += 1
+            if not response_started:
+                await self._timeout(send)
+        finally:
+            for task in (handler, listener, disconnect):
+                task.cancel()
+            current_deadline.reset(token)
+
+    @staticmethod
+    async def _timeout(send) -> None:
+        body = orjson.dumps({"detail": "Превышено время обработки запроса"})
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Сколько запросов прервано по дедлайну и из-за отключения клиента.
+        """
+        return {"expired": self.expired, "disconnected": self.disconnected}
+
+
+class QueryRouteMiddleware:
+    """
+    ASGI-middleware атрибуции SQL-выражений маршрутам.
+
+    Кладёт scope запроса в контекстную переменную; шаблон маршрута появляется в нём
+    после маршрутизации и читается только при выполнении выражения.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware сжатия ответов.
+
+    Сжимаются ответы с типом из `content_types` и телом не меньше `minimum_size` байт,
+    если клиент прислал подходящий `Accept-Encoding`; уже сжатые ответы не трогаются.
+    Потоковые ответы (`more_body`) сжимаются по частям без буферизации: каждая часть
+    сразу уходит клиенту. У сжатого ответа убирается `Content-Length`, а ETag становится
+    слабым — байты представления другие. `Vary: Accept-Encoding` получают все ответы
+    сжимаемых типов, в том числе отданные без сжатия, и ответы без тела (304, HEAD);
+    у последних при выбранном кодеке ETag тоже слабый, как у заменяемого ими ответа.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        content_types: tuple[str, ...] = ("application/json", "application/x-ndjson", "text/"),
+        levels: dict[str, int] | None = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = content_types
+        self.levels = levels or {}
+        self.skipped = 0
+        self.encodings: dict[str, dict] = {}
+        register_collector("compression", self.stats)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = next((value for key, value in scope["headers"] if key == b"accept-encoding"), b"")
+        name = negotiate(accept.decode("latin-1")) if accept else None
+        head = scope["method"] == "HEAD"
+
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start = message  # Заголовки зависят от первой части тела: ждём её
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                compressible = self._compressible(start["headers"])
+                bodyless = head or start["status"] == 304
+                if name is None or bodyless or not compressible or (
+                    not more_body and len(body) < self.minimum_size
+                ):
+                    # Представление зависит от Accept-Encoding, даже если этот ответ не сжат:
+                    # Vary нужен кэшам всегда. Ответ без тела (304, HEAD) заменяет сжатый ответ
+                    # с тем же ETag, поэтому при выбранном кодеке ETag у него тоже слабый
+                    passthrough = True
+                    if name is not None:
+                        self.skipped += 1
+                    headers = self._headers(
+                        start["headers"], weak_etag=name is not None and bodyless, vary=compressible or bodyless,
+                    )
+                    await send({**start, "headers": headers})
+                    await send(message)
+                    return
+                encoder = ENCODERS[name](**({"level": self.levels[name]} if name in self.levels else {}))
+                counters = self.encodings.setdefault(name, {"responses": 0, "bytes_in": 0, "bytes_out": 0})
+                counters["responses"] += 1
+                await send({**start, "headers": self._headers(start["headers"], name)})
+
+            compressed = encoder.chunk(body) if more_body else encoder.finish(body)
+            counters = self.encodings[name]
+            counters["bytes_in"] += len(body)
+            counters["bytes_out"] += len(compressed)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, headers) -> bool:
+        content_type = b""
+        for key, value in headers:
+            if key == b"content-encoding":
+                return False
+            if key == b"content-type":
+                content_type = value
+        media_type = content_type.split(b";", 1)[0].strip().decode("latin-1").lower()
+        return bool(media_type) and media_type.startswith(self.content_types)
+
+    @staticmethod
+    def _headers(headers, name: str | None = None, weak_etag: bool = True, vary: bool = True) -> list:
+        """
+        :param headers: Заголовки ответа приложения.
+        :param name: Кодек сжатого ответа; None — тело отдаётся как есть.
+        :param weak_etag: Сделать ETag слабым.
+        :param vary: Добавить `Vary: Accept-Encoding`.
+        :return: list: Заголовки для клиента.
+        """
+        result = []
+        varies = []
+        for key, value in headers:
+            if name is not None and key == b"content-length":
+                continue
+            if weak_etag and key == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value
+            if key == b"vary":
+                varies.append(value)
+                continue
+            result.append((key, value))
+        tokens = {token.strip().lower() for value in varies for token in value.split(b",")}
+        if vary and not tokens & {b"accept-encoding", b"*"}:
+            varies.append(b"Accept-Encoding")
+        if varies:
+            result.append((b"vary", b", ".join(varies)))
+        if name is not None:
+            result.append((b"content-encoding", name.encode()))
+        return result
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Ответов без сжатия; по каждому кодеку — ответов, байт до/после и степень сжатия.
+        """
+        return {
+            "skipped": self.skipped,
+            "available": list(ENCODERS),
+            **{
+                name: {
+                    **counters,
+                    "ratio": round(counters["bytes_in"] / counters["bytes_out"], 2) if counters["bytes_out"] else 0.0,
+                }
+                for name, counters in self.encodings.items()
+            },
+        }
@@ -0,0 +1,296 @@
+"""
+Модуль загрузки данных для проверки прав доступа.
+
+Каждый защищённый обработчик начинается с одного и того же пролога: найти активного
+пользователя по id из токена и правило доступа его роли к бизнес-элементу. Пользователь
+загружается через `flights` (single-flight), поэтому одновременные одинаковые запросы
+разделяют один запрос к БД. Правила, роли и бизнес-элементы целиком держатся в общем
+для воркеров снимке `permission_cache` и пересобираются только после изменения этих таблиц.
+
+Загрузки возвращают неизменяемые объекты, не привязанные к сессии: результат безопасно
+отдавать нескольким запросам сразу.
+"""
+
+import asyncio
+import atexit
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессной блокировки нет, воркеры собирают снимок сами
+    fcntl = None
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend import db
+from app.backend.deadline import apply_loader_timeout
+from app.backend.metrics import register_collector
+from app.backend.queries import ACTIVE_USER_BY_ID
+from app.backend.settings import get_settings
+from app.backend.snapshot import (
+    MASK_CREATE, MASK_DELETE, MASK_EXISTS, MASK_READ, MASK_UPDATE,
+    PermissionSnapshot, compile_snapshot, open_private, private_directory, write_snapshot,
+)
+from app.backend.singleflight import flights
+from app.backend.trace import stage
+from app.backend.versions import table_versions
+from app.models.access_rule import AccessRule
+from app.models.business_element import BusinessElement
+from app.models.role import Role
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Активный пользователь, от имени которого выполняется запрос."""
+
+    id: int
+    email: str
+    first_name: str | None
+    last_name: str | None
+    role_id: int | None
+
+
+@dataclass(frozen=True, slots=True)
+class RulePermissions:
+    """Разрешения роли на бизнес-элемент (поля совпадают с моделью `AccessRule`)."""
+
+    read_permission: bool
+    create_permission: bool
+    update_permission: bool
+    delete_permission: bool
+
+
+# Маска из снимка -> разрешения; объекты создаются один раз на все проверки
+RULES_BY_MASK = [
+    RulePermissions(
+        read_permission=bool(mask & MASK_READ),
+        create_permission=bool(mask & MASK_CREATE),
+        update_permission=bool(mask & MASK_UPDATE),
+        delete_permission=bool(mask & MASK_DELETE),
+    ) if mask & MASK_EXISTS else None
+    for mask in range(32)
+]
+
+
+async def load_principal(session: AsyncSession, user_id: int | str) -> Principal | None:
+    """
+    Загружает активного пользователя по id.
+
+    :param session: Сессия запроса; загрузка идёт на том же движке.
+    :param user_id: Идентификатор пользователя из токена.
+    :return: Principal | None: Пользователь или None, если он не найден или неактивен.
+    """
+    user_id = int(user_id)
+    bind = session.bind
+
+    async def load() -> Principal | None:
+        async with AsyncSession(bind=bind) as ss:
+            apply_loader_timeout(ss)
+            user = await ss.scalar(ACTIVE_USER_BY_ID, {"user_id": user_id})
+            if user is None:
+                return None
+            return Principal(
+                id=user.id,
+                email=user.email,
+                first_name=user.first_name,
+                last_name=user.last_name,
+                role_id=user.role_id,
+            )
+
+    with stage("principal", user_id=user_id) as traced:
+        principal = await flights.do(("principal", bind, user_id), load)
+        traced["found"] = principal is not None
+        traced["role_id"] = principal.role_id if principal else None
+    return principal
+
+
+def _remove_directory(directory: str, owner: int) -> None:
+    # Удаляет только создавший каталог процесс (воркеры и так выходят через os._exit)
+    if os.getpid() == owner:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class PermissionCache:
+    """
+    Данные авторизации: правила доступа, роли и бизнес-элементы в общем снимке.
+
+    Данные компилируются в бинарный снимок (`app.backend.snapshot`) в файле, общем для
+    всех воркеров одного мастера, и читаются через `mmap` без копирования. Снимок считается
+    актуальным, пока версии таблиц `access_rules`, `roles` и `business_elements`
+    в `table_versions` не изменились. После записи первая проверка прав в каждом воркере
+    сначала пытается открыть уже пересобранный другим воркером файл; собирает снимок только
+    воркер, первым взявший файловую блокировку, — одна сборка на все воркеры вместо N.
+    Одновременные проверки внутри воркера объединяются через `flights`.
+
+    Загрузка всегда идёт с основного сервера: после изменения прав реплика может
+    отставать, и устаревшие правила закрепились бы в снимке с новой версией.
+
+    Атрибуты:
+        path (str | None): Путь к файлу снимка; по умолчанию — в закрытом каталоге мастера
+            (см. `snapshot_path`). Каталог должен принадлежать процессу: снимок определяет
+            права, и подложенный другим пользователем файл выдал бы чужие разрешения.
+    """
+
+    TABLES = ("access_rules", "roles", "business_elements")
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self.snapshot: PermissionSnapshot | None = None
+        self.refreshes = 0  # Сборок снимка этим процессом
+        self.reopens = 0  # Снимков, собранных другим процессом и открытых этим
+
+    def _current_versions(self) -> tuple[int, ...]:
+        return tuple(table_versions.get(table) for table in self.TABLES)
+
+    def snapshot_path(self) -> str:
+        """
+        Путь к файлу снимка. Без `path` и `PERMISSION_SNAPSHOT_DIR` создаётся закрытый (0700)
+        каталог процесса в /dev/shm; мастер вызывает метод до fork, чтобы каталог был общим
+        для его воркеров, и удаляет каталог при выходе.
+
+        :raises PermissionError: Каталог снимка чужой или открыт для записи другим.
+        """
+        if self.path is None:
+            directory = get_settings().PERMISSION_SNAPSHOT_DIR
+            if directory is None:
+                base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+                directory = tempfile.mkdtemp(prefix="accessguard-", dir=base)
+                atexit.register(_remove_directory, directory, os.getpid())
+            self.path = os.path.join(private_directory(directory), "permissions.bin")
+        return self.path
+    @property
+    def roles(self) -> dict[int, str | None]:
+        return self.snapshot.roles if self.snapshot else {}
+
+    @property
+    def elements(self) -> dict[int, str | None]:
+        return self.snapshot.elements if self.snapshot else {}
+
+    @property
+    def is_fresh(self) -> bool:
+        """True, если снимок открыт и таблицы с момента его сборки не менялись."""
+        return self.snapshot is not None and self.snapshot.versions == self._current_versions()
+
+    async def refresh(self) -> None:
+        """Обновляет снимок; одновременные вызовы разделяют одно обновление."""
+        await flights.do(("permission_cache",), self._load)
+
+    def _reopen(self, versions: tuple[int, ...]) -> bool:
+        # Файл мог уже пересобрать другой воркер
+        try:
+            snapshot = PermissionSnapshot.open(self.snapshot_path())
+        except (OSError, ValueError):  # Нет файла, чужой файл или битый формат: пересобираем
+            return False
+        if snapshot.epoch != table_versions.epoch or snapshot.versions != versions:
+            return False
+        self.snapshot = snapshot
+        self.reopens += 1
+        return True
+
+    @asynccontextmanager
+    async def _compile_lock(self):
+        # Межпроцессная блокировка на время сборки; без fcntl каждый процесс собирает сам
+        if fcntl is None:
+            yield
+            return
+        lock_path = self.snapshot_path() + ".lock"
+        try:
+            fd = open_private(lock_path, os.O_RDWR | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            fd = open_private(lock_path, os.O_RDWR)  # Уже создан другим воркером
+        try:
+            await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    async def _load(self) -> None:
+        # Версии фиксируются до чтения: запись во время загрузки вызовет ещё одну перезагрузку
+        versions = self._current_versions()
+        if self._reopen(versions):
+            return
+        async with self._compile_lock():
+            if self._reopen(versions):
+                return
+            async with db.get_session_factory()() as ss:
+                apply_loader_timeout(ss)
+                rules = await ss.execute(select(
+                    AccessRule.role_id, AccessRule.element_id,
+                    AccessRule.read_permission, AccessRule.create_permission,
+                    AccessRule.update_permission, AccessRule.delete_permission,
+                ))
+                roles = await ss.execute(select(Role.id, Role.name))
+                elements = await ss.execute(select(BusinessElement.id, BusinessElement.name))
+                data = compile_snapshot(
+                    table_versions.epoch, versions, rules, roles.all(), elements.all(),
+                )
+            write_snapshot(self.snapshot_path(), data)
+        self.snapshot = PermissionSnapshot.open(self.snapshot_path())
+        self.refreshes += 1
+
+    async def get_rule(self, role_id: int | None, element_id: int) -> RulePermissions | None:
+        """
+        :param role_id: Идентификатор роли.
+        :param element_id: Идентификатор бизнес-элемента.
+        :return: RulePermissions | None: Разрешения или None, если правила нет.
+        """
+        with stage("rule", role_id=role_id, element_id=element_id) as traced:
+            traced["cache"] = "hit" if self.is_fresh else "refresh"
+            if traced["cache"] == "refresh":
+                await self.refresh()
+            rule = RULES_BY_MASK[self.snapshot.mask(role_id, element_id)]
+            traced["found"] = rule is not None
+            if rule is not None:
+                traced.update(
+                    read=rule.read_permission,
+                    create=rule.create_permission,
+                    update=rule.update_permission,
+                    delete=rule.delete_permission,
+                )
+        return rule
+
+    async def get_role_rules(self, role_id: int | None) -> dict[int, RulePermissions | None]:
+        """
+        :param role_id: Идентификатор роли.
+        :return: dict[int, RulePermissions | None]: Разрешения роли на каждый бизнес-элемент
+                 (None — правила нет).
+        """
+        if not self.is_fresh:
+            await self.refresh()
+        return {
+            element_id: RULES_BY_MASK[mask]
+            for element_id, mask in self.snapshot.role_masks(role_id).items()
+        }
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Размер снимка, число сборок и открытий чужих сборок, актуальность.
+        """
+        return {
+            "snapshot_bytes": self.snapshot.nbytes if self.snapshot else 0,
+            "roles": len(self.roles),
+            "elements": len(self.elements),
+            "refreshes": self.refreshes,
+            "reopens": self.reopens,
+            "fresh": self.is_fresh,
+        }
+
+
+permission_cache = PermissionCache()
+register_collector("permission_cache", permission_cache.stats)
+
+
+async def load_rule(role_id: int | None, element_id: int) -> RulePermissions | None:
+    """
+    Возвращает правило доступа роли к бизнес-элементу из `permission_cache`.
+
+    :param role_id: Идентификатор роли пользователя.
+    :param element_id: Идентификатор бизнес-элемента (2 — роли, 3 — правила доступа).
+    :return: RulePermissions | None: Разрешения или None, если правила нет.
+    """
+    return await permission_cache.get_rule(role_id, element_id)
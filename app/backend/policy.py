@@ -0,0 +1,225 @@
+"""
+Модуль синхронизации политики доступа «как код».
+
+Политика — полное желаемое состояние ролей, бизнес-элементов и правил, где роли и элементы
+идентифицируются именами (id в разных окружениях разные). `apply_policy` загружает текущее
+состояние тремя запросами, сравнивает его с желаемым в памяти операциями над множествами
+и выполняет только изменившиеся строки пачками — в транзакции вызывающего кода.
+Одновременные синхронизации упорядочиваются транзакционной advisory-блокировкой PostgreSQL.
+
+Обработчики проверяют права по фиксированным id бизнес-элементов (`REFERENCED_ELEMENTS`),
+поэтому политика, которая удалила бы такой элемент (или пересоздала его под другим id,
+переименовав), отклоняется целиком.
+"""
+
+from dataclasses import dataclass, field
+
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.access_rule import AccessRule
+from app.models.business_element import BusinessElement
+from app.models.role import Role
+from app.schemas.policy import Policy
+
+PERMISSION_FIELDS = ("read_permission", "create_permission", "update_permission", "delete_permission")
+CHUNK_SIZE = 5_000  # Строк на один запрос: меньше лимита параметров asyncpg (32767)
+POLICY_LOCK_KEY = 0x41475043  # Ключ advisory-блокировки синхронизации политики
+# Бизнес-элементы, на которые обработчики ссылаются по id: "roles" (2) и "rule" (3)
+REFERENCED_ELEMENTS = frozenset({2, 3})
+
+
+class PolicyError(ValueError):
+    """Политика противоречива (например, правило ссылается на неизвестную роль)."""
+
+
+@dataclass
+class EntityDiff:
+    """Изменения ролей или бизнес-элементов."""
+
+    create: list[tuple[str, str | None]] = field(default_factory=list)  # (имя, описание)
+    update: list[tuple[int, str | None]] = field(default_factory=list)  # (id, описание)
+    delete: list[int] = field(default_factory=list)  # id
+
+
+@dataclass
+class RuleDiff:
+    """Изменения правил; новые правила адресуются именами, id ролей и элементов ещё нет."""
+
+    create: list[tuple[str, str, tuple[bool, ...]]] = field(default_factory=list)
+    update: list[tuple[int, tuple[bool, ...]]] = field(default_factory=list)
+    delete: list[int] = field(default_factory=list)
+
+
+def diff_named(current: dict[str, tuple[int, str | None]], desired: dict[str, str | None]) -> EntityDiff:
+    """
+    :param current: Имя -> (id, описание) в базе данных.
+    :param desired: Имя -> описание в политике.
+    :return: EntityDiff: Что создать, у чего поменять описание и что удалить.
+    """
+    return EntityDiff(
+        create=[(name, desired[name]) for name in desired.keys() - current.keys()],
+        update=[
+            (current[name][0], desired[name])
+            for name in desired.keys() & current.keys()
+            if current[name][1] != desired[name]
+        ],
+        delete=[current[name][0] for name in current.keys() - desired.keys()],
+    )
+
+
+def diff_rules(
+    current: dict[tuple[str, str], tuple[int, tuple[bool, ...]]],
+    desired: dict[tuple[str, str], tuple[bool, ...]],
+    stale: list[int] = (),
+) -> RuleDiff:
+    """
+    :param current: (роль, элемент) -> (id правила, биты прав) в базе данных.
+    :param desired: (роль, элемент) -> биты прав в политике.
+    :param stale: id правил, которые удаляются в любом случае (дубликаты, битые ссылки).
+    :return: RuleDiff: Что создать, обновить и удалить.
+    """
+    return RuleDiff(
+        create=[(role, element, desired[(role, element)]) for role, element in desired.keys() - current.keys()],
+        update=[
+            (current[key][0], desired[key])
+            for key in desired.keys() & current.keys()
+            if current[key][1] != desired[key]
+        ],
+        delete=[current[key][0] for key in current.keys() - desired.keys()] + list(stale),
+    )
+
+
+def _unique_names(items, kind: str) -> dict[str, str | None]:
+    named = {}
+    for item in items:
+        if item.name in named:
+            raise PolicyError(f"Повторное имя {kind} {item.name!r}")
+        named[item.name] = item.description
+    return named
+
+
+def _desired_state(policy: Policy):
+    roles = _unique_names(policy.roles, "роли")
+    elements = _unique_names(policy.elements, "бизнес-элемента")
+    rules = {}
+    for rule in policy.rules:
+        if rule.role not in roles:
+            raise PolicyError(f"Правило ссылается на неизвестную роль {rule.role!r}")
+        if rule.element not in elements:
+            raise PolicyError(f"Правило ссылается на неизвестный бизнес-элемент {rule.element!r}")
+        if (rule.role, rule.element) in rules:
+            raise PolicyError(f"Повторное правило для пары {rule.role!r} × {rule.element!r}")
+        rules[(rule.role, rule.element)] = tuple(getattr(rule, name) for name in PERMISSION_FIELDS)
+    return roles, elements, rules
+
+
+def _chunks(items: list, size: int = CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def _delete(session: AsyncSession, model, ids: list[int]) -> None:
+    for chunk in _chunks(ids):
+        await session.execute(delete(model).where(model.id.in_(chunk)))
+
+
+async def _sync_named(session: AsyncSession, model, diff: EntityDiff, ids: dict[str, int]) -> None:
+    """Обновляет описания и создаёт новые строки, дописывая их id в `ids`."""
+    # ORM bulk UPDATE по первичному ключу: один executemany на пачку
+    for chunk in _chunks(diff.update):
+        await session.execute(update(model), [{"id": id_, "description": descr} for id_, descr in chunk])
+    for chunk in _chunks(diff.create):
+        created = await session.execute(
+            insert(model).returning(model.id, model.name),
+            [{"name": name, "description": descr} for name, descr in chunk],
+        )
+        ids.update({name: id_ for id_, name in created})
+
+
+def summary(roles: EntityDiff, elements: EntityDiff, rules: RuleDiff, dry_run: bool) -> dict:
+    """
+    :return: dict: Число созданных, обновлённых и удалённых строк (схема `PolicySyncResult`).
+    """
+    def counts(diff):
+        return {"created": len(diff.create), "updated": len(diff.update), "deleted": len(diff.delete)}
+
+    return {"dry_run": dry_run, "roles": counts(roles), "elements": counts(elements), "rules": counts(rules)}
+
+
+async def apply_policy(session: AsyncSession, policy: Policy, dry_run: bool = False) -> dict:
+    """
+    Приводит роли, бизнес-элементы и правила к политике, меняя только отличающиеся строки.
+    Транзакцию фиксирует вызывающий код.
+
+    :param session: Сессия основного сервера.
+    :param policy: Полное желаемое состояние.
+    :param dry_run: Только посчитать изменения, ничего не записывая.
+    :return: dict: Сводка изменений (см. `summary`).
+    :raises PolicyError: Политика противоречива или удаляет элемент из `REFERENCED_ELEMENTS`.
+    """
+    desired_roles, desired_elements, desired_rules = _desired_state(policy)
+
+    await session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": POLICY_LOCK_KEY})
+    current_roles = {
+        name: (id_, descr)
+        for id_, name, descr in await session.execute(select(Role.id, Role.name, Role.description))
+    }
+    current_elements = {
+        name: (id_, descr)
+        for id_, name, descr in await session.execute(
+            select(BusinessElement.id, BusinessElement.name, BusinessElement.description)
+        )
+    }
+    role_names = {id_: name for name, (id_, _) in current_roles.items()}
+    element_names = {id_: name for name, (id_, _) in current_elements.items()}
+
+    current_rules, stale = {}, []
+    rows = await session.execute(
+        select(AccessRule.id, AccessRule.role_id, AccessRule.element_id,
+               *(getattr(AccessRule, name) for name in PERMISSION_FIELDS))
+        .order_by(AccessRule.id)
+    )
+    for rule_id, role_id, element_id, *bits in rows:
+        key = (role_names.get(role_id), element_names.get(element_id))
+        if None in key or key in current_rules:
+            stale.append(rule_id)  # Правило без роли/элемента или дубликат пары
+            continue
+        current_rules[key] = (rule_id, tuple(bool(bit) for bit in bits))
+
+    roles = diff_named(current_roles, desired_roles)
+    elements = diff_named(current_elements, desired_elements)
+    rules = diff_rules(current_rules, desired_rules, stale)
+    referenced = sorted(element_names[id_] for id_ in REFERENCED_ELEMENTS.intersection(elements.delete))
+    if referenced:
+        raise PolicyError(
+            f"Бизнес-элементы {', '.join(map(repr, referenced))} используются проверками прав "
+            "и не могут быть удалены или переименованы политикой"
+        )
+    if dry_run:
+        return summary(roles, elements, rules, dry_run)
+
+    # Сначала правила: они ссылаются на удаляемые роли и элементы
+    await _delete(session, AccessRule, rules.delete)
+    await _delete(session, Role, roles.delete)
+    await _delete(session, BusinessElement, elements.delete)
+
+    role_ids = {name: id_ for name, (id_, _) in current_roles.items()}
+    element_ids = {name: id_ for name, (id_, _) in current_elements.items()}
+    await _sync_named(session, Role, roles, role_ids)
+    await _sync_named(session, BusinessElement, elements, element_ids)
+
+    for chunk in _chunks(rules.update):
+        await session.execute(update(AccessRule), [
+            {"id": rule_id, **dict(zip(PERMISSION_FIELDS, bits))} for rule_id, bits in chunk
+        ])
+    for chunk in _chunks(rules.create):
+        await session.execute(insert(AccessRule), [
+            {
+                "role_id": role_ids[role],
+                "element_id": element_ids[element],
+                **dict(zip(PERMISSION_FIELDS, bits)),
+            }
+            for role, element, bits in chunk
+        ])
+    return summary(roles, elements, rules, dry_run)
@@ -0,0 +1,100 @@
+"""
+Модуль с «горячими» запросами к пользователям.
+
+Удаление аккаунта лишь выставляет `is_active = False`, поэтому все поиски
+пользователей должны отбрасывать деактивированные строки. Фильтр выполняется
+на стороне PostgreSQL условием `WHERE is_active`, которое совпадает с предикатом
+частичных индексов `ix_users_email_lower_active` и `ix_users_id_active`, — так
+планировщик использует компактные индексы только по активным пользователям.
+
+Email сравнивается как `lower(users.email) = :email` — выражение функционального индекса,
+а параметр приводится к нижнему регистру заранее, в схемах (`normalize_email`): поиск
+без учёта регистра остаётся одной пробой индекса.
+
+Запросы, составляющие почти весь трафик, построены один раз при импорте с именованными
+параметрами (`bindparam`) и выполняются как `session.execute(QUERY, {"user_id": ...})`.
+Объект запроса и его ключ кэша не пересоздаются на каждый вызов, SQL-текст всегда один
+и тот же — поэтому стабильно попадает и в кэш компиляции SQLAlchemy, и в кэш
+подготовленных выражений asyncpg (см. `app.backend.statement_cache`).
+"""
+
+from sqlalchemy import Select, bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models.api_token import ApiToken
+from app.models.user import User
+
+
+def active_users() -> Select:
+    """
+    Базовый запрос по активным пользователям.
+
+    :return: Select: `SELECT ... FROM users WHERE is_active`
+    """
+    return select(User).where(User.is_active)
+
+
+# Активный пользователь по идентификатору (индекс `ix_users_id_active`).
+# Параметры: user_id.
+ACTIVE_USER_BY_ID = active_users().where(User.id == bindparam("user_id"))
+
+# Активный пользователь по email без учёта регистра (индекс `ix_users_email_lower_active`).
+# Параметры: email (уже в нижнем регистре).
+ACTIVE_USER_BY_EMAIL = active_users().where(func.lower(User.email) == bindparam("email"))
+
+# Регистрация одним запросом `INSERT ... ON CONFLICT DO NOTHING RETURNING id`.
+# Арбитр конфликта — частичный уникальный индекс `ix_users_email_lower_active`: если
+# активный пользователь с таким email (в любом регистре) уже есть, запрос ничего не вставляет и возвращает пустой
+# результат. Это убирает лишний SELECT и гонку между проверкой и вставкой.
+# Параметры: `user_values(...)`.
+INSERT_ACTIVE_USER = (
+    pg_insert(User)
+    .values(
+        email=bindparam("new_email"),
+        hashed_password=bindparam("new_hashed_password"),
+        first_name=bindparam("new_first_name"),
+        last_name=bindparam("new_last_name"),
+        is_active=True,
+    )
+    .on_conflict_do_nothing(index_elements=[func.lower(User.email)], index_where=User.is_active)
+    .returning(User.id)
+)
+
+# Обновление активного пользователя одним запросом `UPDATE ... RETURNING id`:
+# пустой результат — пользователь не найден или неактивен.
+# Параметры: user_id и `user_values(...)`.
+UPDATE_ACTIVE_USER = (
+    update(User)
+    .where(User.is_active, User.id == bindparam("user_id"))
+    .values(
+        email=bindparam("new_email"),
+        hashed_password=bindparam("new_hashed_password"),
+        first_name=bindparam("new_first_name"),
+        last_name=bindparam("new_last_name"),
+    )
+    .returning(User.id)
+)
+
+
+def user_values(email: str, hashed_password: str, first_name: str, last_name: str) -> dict:
+    """
+    Параметры для `INSERT_ACTIVE_USER` и `UPDATE_ACTIVE_USER`.
+
+    Имена параметров отличаются от имён колонок: SQLAlchemy резервирует
+    имена колонок под автоматические параметры VALUES/SET.
+    """
+    return {
+        "new_email": email,
+        "new_hashed_password": hashed_password,
+        "new_first_name": first_name,
+        "new_last_name": last_name,
+    }
+
+
+# Владелец активного API-токена; токен деактивированного пользователя не действует.
+# Параметры: token_hash.
+API_TOKEN_OWNER = (
+    select(ApiToken.user_id)
+    .join(User, User.id == ApiToken.user_id)
+    .where(ApiToken.token_hash == bindparam("token_hash"), ApiToken.is_active, User.is_active)
+)
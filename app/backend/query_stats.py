@@ -0,0 +1,209 @@
+"""
+Модуль журнала медленных запросов с отпечатками выражений.
+
+Обработчики событий `before_cursor_execute`/`after_cursor_execute` движка замеряют время
+каждого выражения и копят статистику по паре (маршрут, отпечаток). Отпечаток — SQL-текст
+с литералами, заменёнными на `?`, и свёрнутыми списками `IN (...)`: почти одинаковые
+запросы из `roles.py`, `ac_rule.py` и `users.py` различаются, а одинаковые с разными
+значениями — сливаются. Получается аналог pg_stat_statements в разрезе маршрутов API.
+
+Маршрут — шаблон пути FastAPI (`GET /roles/{role_id}`); его берёт из scope запроса
+`QueryRouteMiddleware` (см. `app.backend.middleware`). Выражения дольше порога
+(`SLOW_QUERY_MS`) пишутся в лог и в кольцевой буфер вместе с параметрами, чтобы по
+требованию получить их план (`EXPLAIN` без выполнения). Агрегаты отдаёт `GET /admin/queries`.
+"""
+
+import hashlib
+import logging
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.backend.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+current_scope: ContextVar[dict | None] = ContextVar("current_query_scope", default=None)
+
+MAX_ENTRIES = 2_000  # Пар (маршрут, отпечаток); остальное копится под OVERFLOW_KEY
+OVERFLOW_KEY = ("*", "*")
+NO_ROUTE = "-"  # Выражения вне HTTP-запроса: прогрев, фоновые задачи
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+\b|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """
+    :param statement: SQL-текст выражения.
+    :return: str: Нормализованный текст: литералы и параметры — `?`, списки `IN` — `IN (...)`.
+    """
+    normalized = _STRING.sub("?", statement)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _PARAM.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (...)", normalized)
+    return _SPACES.sub(" ", normalized).strip()
+
+
+@lru_cache(maxsize=4096)
+def fingerprint_id(fp: str) -> str:
+    """
+    :return: str: Короткий стабильный идентификатор отпечатка (для URL и логов).
+    """
+    return hashlib.blake2b(fp.encode(), digest_size=8).hexdigest()
+
+
+def current_route() -> str:
+    """
+    :return: str: Шаблон маршрута текущего запроса (`NO_ROUTE` вне HTTP-запроса).
+    """
+    scope = current_scope.get()
+    if scope is None:
+        return NO_ROUTE
+    route = scope.get("route")  # Появляется в scope после маршрутизации
+    path = getattr(route, "path", None) or scope.get("path", "")
+    return f"{scope.get('method', '')} {path}"
+
+
+class QueryStats:
+    """
+    Статистика выполнения выражений по маршрутам и отпечаткам.
+
+    Атрибуты:
+        threshold (float): Порог медленного выражения, сек.
+        entries (dict): (маршрут, отпечаток) -> [число, суммарное время, максимум].
+        slow (deque[dict]): Последние медленные выражения с параметрами.
+    """
+
+    def __init__(self, threshold: float = 0.2, max_slow: int = 100):
+        self.threshold = threshold
+        self.entries: dict[tuple[str, str], list] = {}
+        self.slow: deque[dict] = deque(maxlen=max_slow)
+
+    def before(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        """Обработчик события `before_cursor_execute`."""
+        conn.info["query_started"] = time.perf_counter()
+
+    def after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        """Обработчик события `after_cursor_execute`."""
+        started = conn.info.pop("query_started", None)
+        if started is None:
+            return
+        if executemany and parameters:
+            parameters = parameters[0]  # Для плана достаточно первого набора параметров
+        self.record(statement, parameters, time.perf_counter() - started)
+
+    def record(self, statement: str, parameters, elapsed: float) -> None:
+        """Добавляет выполнение выражения в статистику; медленное — ещё и в журнал."""
+        route, fp = current_route(), fingerprint(statement)
+        key = (route, fp)
+        entry = self.entries.get(key)
+        if entry is None:
+            if len(self.entries) >= MAX_ENTRIES:
+                key = OVERFLOW_KEY
+            entry = self.entries.setdefault(key, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] = max(entry[2], elapsed)
+
+        if elapsed >= self.threshold:
+            fid = fingerprint_id(fp)
+            self.slow.append({
+                "id": fid,
+                "route": route,
+                "ms": round(elapsed * 1000, 2),
+                "at": time.time(),
+                "statement": statement,
+                "parameters": parameters,
+            })
+            logger.warning("Медленный запрос %s (%.1f мс, %s): %s", fid, elapsed * 1000, route, fp)
+
+    def report(self, route: str | None = None, sort: str = "total_ms", limit: int = 50) -> list[dict]:
+        """
+        :param route: Только выражения этого маршрута.
+        :param sort: Поле сортировки по убыванию: `total_ms`, `max_ms`, `mean_ms` или `calls`.
+        :param limit: Сколько строк вернуть.
+        :return: list[dict]: Агрегаты по (маршрут, отпечаток).
+        """
+        rows = []
+        for (entry_route, fp), (calls, total, longest) in self.entries.items():
+            if route is not None and entry_route != route:
+                continue
+            rows.append({
+                "route": entry_route,
+                "id": fingerprint_id(fp),
+                "fingerprint": fp,
+                "calls": calls,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total / calls * 1000, 3),
+                "max_ms": round(longest * 1000, 3),
+            })
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return rows[:limit]
+
+    def slow_sample(self, fid: str) -> dict | None:
+        """
+        :return: dict | None: Последнее медленное выполнение выражения с отпечатком `fid`.
+        """
+        return next((sample for sample in reversed(self.slow) if sample["id"] == fid), None)
+
+    def reset(self) -> None:
+        self.entries.clear()
+        self.slow.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Число отслеживаемых пар и выполнений, медленных выражений в журнале.
+        """
+        return {
+            "entries": len(self.entries),
+            "calls": sum(entry[0] for entry in self.entries.values()),
+            "slow_logged": len(self.slow),
+            "threshold_ms": self.threshold * 1000,
+        }
+
+
+query_stats = QueryStats()
+register_collector("queries", query_stats.stats)
+
+
+def instrument(engine: AsyncEngine, threshold: float | None = None) -> AsyncEngine:
+    """
+    Подключает учёт времени выражений к движку.
+
+    :param engine: Асинхронный движок.
+    :param threshold: Порог медленного выражения, сек (по умолчанию — текущий).
+    :return: AsyncEngine: Тот же движок (для использования в выражениях).
+    """
+    if threshold is not None:
+        query_stats.threshold = threshold
+    event.listen(engine.sync_engine, "before_cursor_execute", query_stats.before)
+    event.listen(engine.sync_engine, "after_cursor_execute", query_stats.after)
+    return engine
+
+
+async def explain(session, sample: dict) -> list:
+    """
+    Строит план медленного выражения с его сохранёнными параметрами. Выражение
+    не выполняется (`EXPLAIN` без `ANALYZE`).
+
+    :param session: Сессия для чтения.
+    :param sample: Элемент `QueryStats.slow`.
+    :return: list: План в формате JSON PostgreSQL.
+    """
+    connection = await session.connection()
+    parameters = sample["parameters"]
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {sample['statement']}",
+        tuple(parameters) if isinstance(parameters, (list, tuple)) else parameters,
+    )
+    return result.scalar()
@@ -0,0 +1,249 @@
+"""
+Модуль списка отозванных JWT.
+
+При выходе из системы `jti` токена сохраняется в таблицу `revoked_tokens` до истечения срока
+действия токена. Проверять таблицу на каждый запрос дорого, поэтому каждый воркер держит
+в памяти фильтр Блума по всем отозванным `jti` и точное множество недавно отозванных:
+
+* `jti` нет в фильтре — токен точно не отозван, запроса к базе нет (обычный случай);
+* `jti` есть в точном множестве — токен отозван, запроса к базе тоже нет;
+* иначе (возможное ложное срабатывание фильтра) — проверка одним запросом по индексу.
+
+Отзыв в любом воркере увеличивает версию таблицы в `table_versions`; остальные воркеры
+при следующей проверке догружают только новые записи — с `created_at` позже самого нового
+известного за вычетом `SYNC_SLACK`. Запас нужен потому, что `created_at` — время начала
+транзакции: запись, зафиксированная позже более новой, всё равно попадёт в окно, а уже
+загруженные `jti` из окна отбрасываются. Целиком действующие отзывы загружаются только
+при старте и периодической очисткой (фоновая задача), которая удаляет просроченные
+записи и пересобирает фильтр.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import bindparam, delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.backend import db
+from app.backend.deadline import apply_loader_timeout
+from app.backend.metrics import register_collector
+from app.backend.singleflight import flights
+from app.backend.versions import table_versions
+from app.models.revoked_token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+TABLE = "revoked_tokens"
+# Запас окна догрузки: больше любой транзакции отзыва (её ограничивает дедлайн запроса)
+SYNC_SLACK = timedelta(seconds=60)
+
+# Отзыв токена; повторный выход с тем же токеном ничего не меняет.
+# Параметры: jti, expires_at.
+REVOKE_TOKEN = (
+    pg_insert(RevokedToken)
+    .values(jti=bindparam("jti"), expires_at=bindparam("expires_at"))
+    .on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+)
+
+# Проверка после срабатывания фильтра Блума. Параметры: jti.
+TOKEN_IS_REVOKED = select(RevokedToken.id).where(RevokedToken.jti == bindparam("jti"))
+
+
+class BloomFilter:
+    """
+    Фильтр Блума по строкам: без ложных отрицаний, с долей ложных срабатываний `error_rate`
+    при числе элементов до `capacity`.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Двойное хеширование: k позиций из двух 64-битных половин одного blake2b
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    Отозванные токены в памяти воркера: фильтр Блума и точное множество недавних `jti`.
+
+    Атрибуты:
+        bloom (BloomFilter): Все известные неистёкшие отозванные `jti`.
+        recent (OrderedDict[str, float]): Недавно отозванные `jti` -> время истечения (unix).
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001, recent_size: int = 10_000):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.recent_size = recent_size
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.recent: OrderedDict[str, float] = OrderedDict()
+        self._version: int | None = None
+        self._watermark: datetime | None = None  # Самый новый известный created_at
+        self._window: dict[str, datetime] = {}  # jti из окна догрузки -> created_at
+        self.checks = 0
+        self.bloom_negatives = 0
+        self.recent_hits = 0
+        self.db_checks = 0
+        self.false_positives = 0
+        self.prunes = 0
+
+    def remember(self, jti: str, expires_at: float) -> None:
+        """
+        Добавляет `jti` в фильтр и в точное множество недавних.
+
+        :param jti: Идентификатор токена.
+        :param expires_at: Время истечения токена (unix).
+        """
+        self.bloom.add(jti)
+        self.recent[jti] = expires_at
+        self.recent.move_to_end(jti)
+        while len(self.recent) > self.recent_size:
+            self.recent.popitem(last=False)
+
+    async def is_revoked(self, jti: str) -> bool:
+        """
+        :param jti: Идентификатор токена (claim `jti`).
+        :return: bool: True, если токен отозван.
+        """
+        self.checks += 1
+        if table_versions.get(TABLE) != self._version:
+            await self.sync()
+        if jti not in self.bloom:
+            self.bloom_negatives += 1
+            return False
+        if jti in self.recent:
+            self.recent_hits += 1
+            return True
+
+        self.db_checks += 1
+        async with db.get_session_factory()() as ss:
+            apply_loader_timeout(ss)
+            found = await ss.scalar(TOKEN_IS_REVOKED, {"jti": jti})
+        if found is None:
+            self.false_positives += 1
+        return found is not None
+
+    async def sync(self) -> None:
+        """Догружает новые отзывы после изменения таблицы (одна загрузка на воркер)."""
+        await flights.do(("revocation_list",), self._sync)
+
+    async def _sync(self) -> None:
+        # Версия фиксируется до чтения: отзыв во время загрузки вызовет ещё одну синхронизацию
+        version = table_versions.get(TABLE)
+        full = self._watermark is None or self.bloom.count > self.bloom.capacity
+        query = select(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.created_at).where(
+            RevokedToken.expires_at > func.now()
+        )
+        if not full:
+            query = query.where(RevokedToken.created_at > self._watermark - SYNC_SLACK)
+        async with db.get_session_factory()() as ss:
+            apply_loader_timeout(ss)
+            rows = (await ss.execute(query)).all()
+        if full:
+            self._rebuild(rows)
+        else:
+            self._merge(rows)
+        self._version = version
+
+    def _merge(self, rows) -> None:
+        for jti, expires_at, created_at in rows:
+            if jti not in self._window:
+                self.remember(jti, expires_at.timestamp())
+            self._track(jti, created_at)
+        self._trim_window()
+
+    def _rebuild(self, rows) -> None:
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        # Отозванные в этом воркере во время загрузки есть только в `recent`
+        now = time.time()
+        local = [(jti, expires_at) for jti, expires_at in self.recent.items() if expires_at > now]
+        self.bloom = bloom
+        self.recent.clear()
+        self._window.clear()
+        self._watermark = None
+        for jti, expires_at, created_at in sorted(rows, key=lambda row: row[1]):
+            self.remember(jti, expires_at.timestamp())
+            self._track(jti, created_at)
+        for jti, expires_at in local:
+            if jti not in self.recent:
+                self.remember(jti, expires_at)
+        self._trim_window()
+
+    def _track(self, jti: str, created_at: datetime) -> None:
+        self._window[jti] = created_at
+        if self._watermark is None or created_at > self._watermark:
+            self._watermark = created_at
+
+    def _trim_window(self) -> None:
+        if self._watermark is not None:
+            horizon = self._watermark - SYNC_SLACK
+            self._window = {jti: at for jti, at in self._window.items() if at > horizon}
+
+    async def prune(self) -> None:
+        """Удаляет просроченные записи и пересобирает фильтр только по действующим."""
+        async with db.get_session_factory()() as ss:
+            apply_loader_timeout(ss)
+            await ss.execute(delete(RevokedToken).where(RevokedToken.expires_at <= func.now()))
+            await ss.commit()
+        self._watermark = None  # Следующая синхронизация — полная
+        await self.sync()
+        self.prunes += 1
+
+    async def run_pruner(self, interval: float = 600.0) -> None:
+        """Фоновая задача: очистка раз в `interval` секунд (запускается в lifespan)."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.prune()
+            except Exception as e:
+                logger.warning("Очистка отозванных токенов не удалась: %s", e)
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Размер фильтра и счётчики проверок по путям ответа.
+        """
+        return {
+            "bloom_items": self.bloom.count,
+            "bloom_bytes": len(self.bloom._bits),
+            "recent": len(self.recent),
+            "checks": self.checks,
+            "bloom_negatives": self.bloom_negatives,
+            "recent_hits": self.recent_hits,
+            "db_checks": self.db_checks,
+            "false_positives": self.false_positives,
+            "prunes": self.prunes,
+        }
+
+
+def revoke_values(jti: str, expires_at: float) -> dict:
+    """
+    :param jti: Идентификатор токена.
+    :param expires_at: Время истечения токена (unix).
+    :return: dict: Параметры для `REVOKE_TOKEN`.
+    """
+    return {"jti": jti, "expires_at": datetime.fromtimestamp(expires_at, tz=timezone.utc)}
+
+
+revocation_list = RevocationList()
+register_collector("revocation_list", revocation_list.stats)
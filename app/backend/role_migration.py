@@ -0,0 +1,126 @@
+"""
+Модуль переноса пользователей между ролями и каскадного удаления роли.
+
+Пользователи переносятся пачками по ключу (`role_id`, `id` больше последнего перенесённого):
+каждая пачка — отдельная короткая транзакция `UPDATE ... WHERE id IN (следующие N участников)`,
+поэтому блокируются только строки текущей пачки и ненадолго, а таблица `users` остаётся
+доступной для записи. Индекс `ix_users_role_id_id` делает выбор каждой пачки дешёвым даже
+для ролей с миллионами участников.
+
+Завершающая транзакция переносит «отставших» (зарегистрированных во время переноса),
+удаляет правила доступа роли и саму роль. Ход работы отдаётся генератором словарей —
+роутер транслирует их клиенту построчно (NDJSON).
+"""
+
+from typing import AsyncIterator
+
+from sqlalchemy import bindparam, delete, exists, select, update
+from sqlalchemy.orm import aliased
+
+from app.backend import db
+from app.models.access_rule import AccessRule
+from app.models.role import Role
+from app.models.user import User
+
+BATCH_SIZE = 5_000
+
+_members = aliased(User)
+
+# Следующая пачка участников роли переносится в целевую роль.
+# Параметры: from_role_id, to_role_id, last_id, batch_size.
+REASSIGN_BATCH = (
+    update(User)
+    .where(User.id.in_(
+        select(_members.id)
+        .where(_members.role_id == bindparam("from_role_id"), _members.id > bindparam("last_id"))
+        .order_by(_members.id)
+        .limit(bindparam("batch_size"))
+        .scalar_subquery()
+    ))
+    .values(role_id=bindparam("to_role_id"))
+    .returning(User.id)
+    .execution_options(synchronize_session=False)
+)
+
+
+class RoleInUseError(Exception):
+    """Роль назначена пользователям, а целевая роль для переноса не указана."""
+
+
+async def role_has_users(session, role_id: int) -> bool:
+    """
+    :return: bool: True, если роль назначена хотя бы одному пользователю.
+    """
+    return bool(await session.scalar(select(exists().where(User.role_id == role_id))))
+
+
+async def reassign_users(
+    from_role_id: int, to_role_id: int, batch_size: int = BATCH_SIZE
+) -> AsyncIterator[dict]:
+    """
+    Переносит всех участников роли пачками, каждая — в своей транзакции.
+
+    :param from_role_id: Исходная роль.
+    :param to_role_id: Целевая роль.
+    :param batch_size: Пользователей в одной транзакции.
+    :return: AsyncIterator[dict]: Ход работы после каждой пачки.
+    """
+    moved, last_id, batch = 0, 0, 0
+    params = {"from_role_id": from_role_id, "to_role_id": to_role_id, "batch_size": batch_size}
+    while True:
+        async with db.get_session_factory()() as ss:
+            result = await ss.execute(REASSIGN_BATCH, {**params, "last_id": last_id})
+            ids = result.scalars().all()
+            await ss.commit()
+        if not ids:
+            return
+        batch += 1
+        moved += len(ids)
+        last_id = max(ids)
+        yield {"stage": "users", "batch": batch, "moved": moved}
+
+
+async def delete_role(role_id: int, to_role_id: int | None = None) -> dict:
+    """
+    Удаляет роль вместе с её правилами доступа в одной транзакции.
+
+    :param role_id: Удаляемая роль.
+    :param to_role_id: Куда перенести оставшихся участников; без неё роль с участниками
+                       не удаляется.
+    :return: dict: Число перенесённых в этой транзакции пользователей и удалённых правил.
+    :raises RoleInUseError: У роли есть участники, а `to_role_id` не задан.
+    """
+    async with db.get_session_factory()() as ss:
+        stragglers = 0
+        if to_role_id is not None:
+            result = await ss.execute(
+                update(User).where(User.role_id == role_id).values(role_id=to_role_id)
+                .execution_options(synchronize_session=False)
+            )
+            stragglers = result.rowcount
+        elif await role_has_users(ss, role_id):
+            raise RoleInUseError(role_id)
+        rules = await ss.execute(delete(AccessRule).where(AccessRule.role_id == role_id))
+        await ss.execute(delete(Role).where(Role.id == role_id))
+        await ss.commit()
+    return {"stage": "delete", "moved": stragglers, "rules_deleted": rules.rowcount}
+
+
+async def migrate_role(
+    from_role_id: int, to_role_id: int, delete_source: bool = False, batch_size: int = BATCH_SIZE
+) -> AsyncIterator[dict]:
+    """
+    Переносит участников роли и, по желанию, удаляет исходную роль.
+
+    :return: AsyncIterator[dict]: Ход работы; последний элемент содержит `"done": True`.
+    """
+    moved = 0
+    async for progress in reassign_users(from_role_id, to_role_id, batch_size):
+        moved = progress["moved"]
+        yield progress
+    summary = {"done": True, "moved": moved, "role_deleted": False}
+    if delete_source:
+        deleted = await delete_role(from_role_id, to_role_id)
+        yield deleted
+        summary.update(moved=moved + deleted["moved"], rules_deleted=deleted["rules_deleted"], role_deleted=True)
+    yield summary
@@ -2,8 +2,14 @@
 Mодуль предоставляет класс `Settings`, который загружает параметры подключения
 к базе данных из переменных окружения (файл `.env`) и формирует строку подключения
 в формате, совместимом с SQLAlchemy и asyncpg.
+
+Экземпляр настроек создаётся лениво при первом вызове `get_settings()`, а не при импорте:
+импорт модулей приложения (например, в тестах) не требует `.env` и переменных окружения.
 """
 
+from functools import lru_cache
+from pathlib import Path
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -16,6 +22,20 @@ class Settings(BaseSettings):
         DB_PORT (int): Порт, по которому доступна база данных.
         DB_HOST (str): Хост (адрес сервера) базы данных.
         DB_NAME (str): Название базы данных.
+        DB_REPLICA_HOST (str | None): Хост реплики для чтения. Если не задан,
+            все запросы идут на основной сервер.
+        DB_REPLICA_PORT (int | None): Порт реплики (по умолчанию совпадает с DB_PORT).
+        READ_YOUR_WRITES_SECONDS (float): Сколько секунд после собственной записи
+            пользователя его чтения направляются на основной сервер.
+        DB_POOL_SIZE (int): Размер пула соединений каждого движка.
+        DB_POOL_WARMUP (int): Сколько соединений пула открыть заранее при старте.
+        DB_PREPARED_STATEMENT_CACHE_SIZE (int): Размер кэша подготовленных выражений
+            asyncpg на каждом соединении.
+        PERMISSION_SNAPSHOT_DIR (str | None): Каталог файла снимка прав, общего для
+            воркеров: свой для каждого экземпляра, принадлежит процессу, права 0700.
+            По умолчанию мастер создаёт такой каталог в /dev/shm (или во временном каталоге).
+        SLOW_QUERY_MS (float): Порог медленного SQL-выражения, мс: такие выражения
+            пишутся в лог и журнал медленных запросов.
     """
 
     DB_USER: str
@@ -23,6 +43,14 @@ class Settings(BaseSettings):
     DB_PORT: int
     DB_HOST: str
     DB_NAME: str
+    DB_REPLICA_HOST: str | None = None
+    DB_REPLICA_PORT: int | None = None
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    DB_POOL_SIZE: int = 5
+    DB_POOL_WARMUP: int = 5
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500
+    PERMISSION_SNAPSHOT_DIR: str | None = None
+    SLOW_QUERY_MS: float = 200.0
 
     @property
     def get_path(self):
@@ -32,11 +60,34 @@ class Settings(BaseSettings):
         """
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def get_replica_path(self):
+        """
+        :return: str | None: Строка подключения к реплике для чтения в том же формате,
+                 что и `get_path`, либо None, если реплика не настроена.
+        """
+        if not self.DB_REPLICA_HOST:
+            return None
+        port = self.DB_REPLICA_PORT or self.DB_PORT
+        return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_REPLICA_HOST}:{port}/{self.DB_NAME}"
+
     model_config = SettingsConfigDict(
-        # Путь к файлу с переменными окружения
-        env_file=r"C:\Users\GIGABYTE\Desktop\Сетевое окружение\AccessGuard\app\backend\.env",
+        # Путь к файлу с переменными окружения (рядом с этим модулем)
+        env_file=Path(__file__).with_name(".env"),
         extra="ignore",  # Игнорировать лишние переменные в .env
     )
 
 
-setting = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """
+    :return: Settings: Экземпляр настроек, создаваемый при первом обращении.
+    """
+    return Settings()
+
+
+def __getattr__(name: str):
+    # Совместимость: `from app.backend.settings import setting` создаёт настройки по требованию
+    if name == "setting":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,67 @@
+"""
+Модуль объединения одинаковых конкурентных загрузок (single-flight).
+
+После инвалидации кэша или перезапуска воркера сотни запросов одновременно промахиваются
+и выполняют один и тот же запрос к БД. `SingleFlight` запускает загрузку по ключу только
+один раз: остальные вызовы с тем же ключом ждут уже выполняющуюся задачу и получают её
+результат (или её исключение). Как только задача завершилась, ключ освобождается —
+результаты здесь не кэшируются.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from app.backend.metrics import register_collector
+
+
+class SingleFlight:
+    """
+    Реестр выполняющихся загрузок по ключу.
+
+    Атрибуты:
+        calls (int): Сколько раз загрузка действительно запускалась.
+        shared (int): Сколько вызовов присоединились к уже выполняющейся загрузке.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет `fn` или присоединяется к уже выполняющемуся вызову с тем же ключом.
+
+        Загрузка идёт в отдельной задаче и защищена `asyncio.shield`: отмена одного
+        из ожидающих запросов (например, при разрыве соединения клиентом) не отменяет
+        загрузку для остальных.
+
+        :param key: Ключ загрузки, например ("principal", engine, user_id).
+        :param fn: Функция без аргументов, возвращающая корутину загрузки.
+        :return: Результат загрузки.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.calls += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Помечаем исключение полученным, даже если ждать было некому
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Число запусков, присоединений и выполняющихся загрузок.
+        """
+        return {"calls": self.calls, "shared": self.shared, "inflight": len(self._inflight)}
+
+
+flights = SingleFlight()
+register_collector("singleflight", flights.stats)
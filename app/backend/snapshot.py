@@ -0,0 +1,216 @@
+"""
+Модуль бинарного снимка данных авторизации.
+
+Правила доступа компилируются в компактный снимок фиксированного формата: отсортированные
+массивы id ролей и бизнес-элементов и матрица масок прав роль×элемент (один байт на пару).
+Снимок пишется во временный файл и атомарно подменяет основной (`os.replace`), а воркеры
+читают его через `mmap` без копирования: страницы файла общие для всех процессов, поэтому
+память не растёт с числом воркеров. Уже открытый снимок остаётся целым и после подмены —
+он продолжает указывать на прежний файл, пока воркер не откроет новый.
+
+Снимок определяет права, поэтому файлы создаются только в закрытом каталоге процесса
+(`private_directory`), без перехода по символическим ссылкам (`O_NOFOLLOW`) и с правами
+0600, а перед отображением проверяется владелец: чужой файл не принимается.
+
+Формат (little-endian):
+    заголовок `HEADER`: magic, версия формата, резерв, эпоха `table_versions`, версии таблиц,
+        число ролей R, число элементов E, длина блока имён N;
+    R × int32 — id ролей по возрастанию;
+    E × int32 — id бизнес-элементов по возрастанию;
+    R × E байт — маски прав (`MASK_*`), строка на роль;
+    N байт — JSON с именами ролей и элементов.
+"""
+
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_left
+
+MAGIC = b"AGPS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHH8s3qIII")  # 52 байта: массивы int32 за ним выровнены
+
+MASK_EXISTS = 1  # Правило для пары роль×элемент есть
+MASK_READ = 2
+MASK_CREATE = 4
+MASK_UPDATE = 8
+MASK_DELETE = 16
+
+
+def compile_snapshot(epoch: str, versions: tuple[int, int, int], rules, roles, elements) -> bytes:
+    """
+    Собирает снимок из строк таблиц.
+
+    :param epoch: Эпоха `table_versions` (8 hex-символов).
+    :param versions: Версии таблиц, с которыми согласованы данные.
+    :param rules: Строки (role_id, element_id, read, create, update, delete).
+    :param roles: Пары (id, name).
+    :param elements: Пары (id, name).
+    :return: bytes: Содержимое файла снимка.
+    """
+    roles, elements = dict(roles), dict(elements)
+    masks = {}
+    for role_id, element_id, read, create, update, delete in rules:
+        if role_id is None or element_id is None:
+            continue  # Правило без роли или элемента никогда не запрашивается
+        masks[(role_id, element_id)] = (
+            MASK_EXISTS
+            | (MASK_READ if read else 0)
+            | (MASK_CREATE if create else 0)
+            | (MASK_UPDATE if update else 0)
+            | (MASK_DELETE if delete else 0)
+        )
+
+    role_ids = sorted(set(roles) | {role_id for role_id, _ in masks})
+    element_ids = sorted(set(elements) | {element_id for _, element_id in masks})
+    matrix = bytearray(len(role_ids) * len(element_ids))
+    role_index = {role_id: i for i, role_id in enumerate(role_ids)}
+    element_index = {element_id: i for i, element_id in enumerate(element_ids)}
+    for (role_id, element_id), mask in masks.items():
+        matrix[role_index[role_id] * len(element_ids) + element_index[element_id]] = mask
+
+    names = json.dumps({"roles": roles, "elements": elements}, ensure_ascii=False).encode()
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, epoch.encode("ascii"), *versions,
+        len(role_ids), len(element_ids), len(names),
+    )
+    return b"".join((
+        header,
+        struct.pack(f"<{len(role_ids)}i", *role_ids),
+        struct.pack(f"<{len(element_ids)}i", *element_ids),
+        bytes(matrix),
+        names,
+    ))
+
+
+O_NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)  # Нет в Windows
+
+
+def is_private(st: os.stat_result) -> bool:
+    """
+    :param st: Результат `stat` файла или каталога.
+    :return: bool: True, если владелец — текущий пользователь, а группа и прочие не могут писать.
+    """
+    if not hasattr(os, "getuid"):  # Windows: владельцев POSIX нет
+        return True
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def private_directory(path: str) -> str:
+    """
+    Проверяет, что каталог снимка принадлежит процессу и закрыт для записи другими.
+
+    :param path: Путь к каталогу.
+    :return: str: Тот же путь.
+    :raises PermissionError: Каталог не символическая ссылка, но чужой или открыт для записи.
+    """
+    st = os.lstat(path)
+    if not os.path.isdir(path) or os.path.islink(path) or not is_private(st):
+        raise PermissionError(f"Каталог снимка прав {path!r} должен принадлежать процессу и иметь права 0700")
+    return path
+
+
+def open_private(path: str, flags: int) -> int:
+    """
+    Открывает файл без перехода по символическим ссылкам и проверяет его владельца.
+
+    :param path: Путь к файлу.
+    :param flags: Флаги `os.open`; с `O_CREAT` файл создаётся с правами 0600.
+    :return: int: Дескриптор файла.
+    :raises PermissionError: Файл чужой или открыт для записи другим.
+    """
+    fd = os.open(path, flags | O_NOFOLLOW, 0o600)
+    if not is_private(os.fstat(fd)):
+        os.close(fd)
+        raise PermissionError(f"Файл снимка прав {path!r} принадлежит другому пользователю")
+    return fd
+
+
+def write_snapshot(path: str, data: bytes) -> None:
+    """Атомарно заменяет файл снимка: читатели видят либо старый, либо новый файл целиком."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+    try:
+        fd = open_private(tmp_path, flags)
+    except FileExistsError:
+        os.unlink(tmp_path)  # Остаток упавшего процесса с тем же pid
+        fd = open_private(tmp_path, flags)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class PermissionSnapshot:
+    """
+    Снимок, открытый только для чтения.
+
+    Атрибуты:
+        epoch (str): Эпоха `table_versions`, в которой собран снимок.
+        versions (tuple[int, int, int]): Версии таблиц на момент сборки.
+        roles (dict[int, str | None]): Имена ролей.
+        elements (dict[int, str | None]): Имена бизнес-элементов.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, fmt, _, epoch, *rest = HEADER.unpack_from(view)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError("Неизвестный формат снимка прав")
+        *versions, n_roles, n_elements, names_len = rest
+        self.epoch = epoch.decode("ascii")
+        self.versions = tuple(versions)
+
+        offset = HEADER.size
+        self._role_ids = view[offset:offset + 4 * n_roles].cast("i")
+        offset += 4 * n_roles
+        self._element_ids = view[offset:offset + 4 * n_elements].cast("i")
+        offset += 4 * n_elements
+        self._masks = view[offset:offset + n_roles * n_elements]
+        offset += n_roles * n_elements
+        names = json.loads(bytes(view[offset:offset + names_len]))
+        self.roles = {int(key): value for key, value in names["roles"].items()}
+        self.elements = {int(key): value for key, value in names["elements"].items()}
+        self.nbytes = len(view)
+
+    @classmethod
+    def open(cls, path: str) -> "PermissionSnapshot":
+        """
+        Отображает файл снимка в память (страницы общие для всех процессов).
+
+        :raises PermissionError: Файл принадлежит другому пользователю.
+        """
+        fd = open_private(path, os.O_RDONLY)
+        try:
+            return cls(mmap.mmap(fd, 0, access=mmap.ACCESS_READ))
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _index(ids, value) -> int | None:
+        i = bisect_left(ids, value)
+        return i if i < len(ids) and ids[i] == value else None
+
+    def mask(self, role_id: int | None, element_id: int) -> int:
+        """
+        :return: int: Маска прав роли на элемент (0 — правила нет).
+        """
+        if role_id is None:
+            return 0
+        row, column = self._index(self._role_ids, role_id), self._index(self._element_ids, element_id)
+        if row is None or column is None:
+            return 0
+        return self._masks[row * len(self._element_ids) + column]
+
+    def role_masks(self, role_id: int | None) -> dict[int, int]:
+        """
+        :return: dict[int, int]: id бизнес-элемента -> маска прав роли (0 — правила нет)
+                 для всех элементов снимка.
+        """
+        row = None if role_id is None else self._index(self._role_ids, role_id)
+        n_elements = len(self._element_ids)
+        if row is None:
+            return dict.fromkeys(self._element_ids, 0)
+        masks = self._masks[row * n_elements:(row + 1) * n_elements]
+        return dict(zip(self._element_ids, masks))
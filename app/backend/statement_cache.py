@@ -0,0 +1,59 @@
+"""
+Модуль учёта попаданий в кэши выражений.
+
+Каждый запрос проходит два кэша:
+
+1. кэш компиляции SQLAlchemy (`query_cache_size` движка): по ключу кэша конструкции
+   выдаёт уже скомпилированный SQL;
+2. кэш подготовленных выражений asyncpg (`prepared_statement_cache_size`) на каждом
+   соединении: по тексту SQL выдаёт уже подготовленное на сервере выражение.
+
+Второй кэш срабатывает, только если SQL-текст стабилен, то есть если попал первый.
+Обработчик события `after_cursor_execute` читает `context.cache_hit` и считает
+попадания и промахи первого кэша; показатели доступны в `GET /metrics`
+в разделе `statement_cache`.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.backend.metrics import register_collector
+
+
+class StatementCacheStats:
+    """Счётчики результата поиска в кэше компиляции по каждому выполнению."""
+
+    def __init__(self):
+        self.counts = {stat: 0 for stat in CacheStats}
+
+    def record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        """Обработчик события `after_cursor_execute`."""
+        if context is not None:
+            self.counts[context.cache_hit] += 1
+
+    def stats(self) -> dict:
+        """
+        :return: dict: Число выполнений по результату поиска в кэше и доля попаданий
+                 среди кэшируемых выражений.
+        """
+        hits = self.counts[CacheStats.CACHE_HIT]
+        misses = self.counts[CacheStats.CACHE_MISS]
+        result = {stat.name.lower(): count for stat, count in self.counts.items()}
+        result["hit_ratio"] = hits / (hits + misses) if hits + misses else 0.0
+        return result
+
+
+statement_cache_stats = StatementCacheStats()
+register_collector("statement_cache", statement_cache_stats.stats)
+
+
+def instrument(engine: AsyncEngine) -> AsyncEngine:
+    """
+    Подключает учёт попаданий в кэш компиляции к движку.
+
+    :param engine: Асинхронный движок.
+    :return: AsyncEngine: Тот же движок (для использования в выражениях).
+    """
+    event.listen(engine.sync_engine, "after_cursor_execute", statement_cache_stats.record)
+    return engine
@@ -0,0 +1,94 @@
+"""
+Модуль трассировки решений авторизации.
+
+Клиент-администратор включает трассировку заголовком `X-AuthZ-Trace: 1`. Для такого запроса
+`AuthTraceMiddleware` (см. `app.backend.middleware`) создаёт `AuthTrace` в контекстной
+переменной, а этапы проверки прав записывают в неё себя и своё время:
+
+* `token` — разбор токена и проверка отзыва/API-токена;
+* `principal` — загрузка пользователя (найден ли, роль);
+* `rule` — правило роли к бизнес-элементу: попадание в кэш или перезагрузка, биты прав.
+
+В ответ добавляется заголовок `X-AuthZ-Trace` с JSON: решение (`allow` или причина отказа)
+и этапы с длительностью в миллисекундах. Трасса отдаётся только пользователю с ролью
+`admin`; без заголовка запроса все вызовы здесь сводятся к чтению контекстной переменной.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+TRACE_HEADER = "x-authz-trace"
+ADMIN_ROLE_NAME = "admin"
+
+
+class AuthTrace:
+    """
+    Трасса одного запроса.
+
+    Атрибуты:
+        stages (list[dict]): Этапы в порядке выполнения: имя, длительность, подробности.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: list[dict] = []
+
+    def add(self, name: str, elapsed: float, **detail) -> dict:
+        stage = {"stage": name, "ms": round(elapsed * 1000, 3), **detail}
+        self.stages.append(stage)
+        return stage
+
+    def last(self, name: str) -> dict | None:
+        return next((stage for stage in reversed(self.stages) if stage["stage"] == name), None)
+
+    def decision(self, status_code: int) -> str:
+        """
+        Восстанавливает путь решения по записанным этапам и статусу ответа.
+
+        :param status_code: HTTP-статус ответа.
+        :return: str: `allow` или причина отказа.
+        """
+        token, principal, rule = self.last("token"), self.last("principal"), self.last("rule")
+        if status_code < 400:
+            return "allow"
+        if token is not None and token.get("rejected"):
+            return f"deny:token:{token['rejected']}"
+        if principal is not None and not principal.get("found"):
+            return "deny:principal_not_found"
+        if rule is not None and not rule.get("found"):
+            return "deny:no_rule"
+        if status_code == 403 and rule is not None:
+            return "deny:permission_bit_false"
+        return f"error:{status_code}"
+
+    def header(self, status_code: int) -> bytes:
+        return json.dumps({
+            "decision": self.decision(status_code),
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "stages": self.stages,
+        }, separators=(",", ":"), default=str).encode("ascii")
+
+
+current_trace: ContextVar[AuthTrace | None] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def stage(name: str, **detail):
+    """
+    Замеряет этап проверки прав, если для запроса включена трассировка.
+
+    Возвращает словарь этапа (или пустой словарь без трассировки), в который вызывающий
+    код может дописать результат этапа.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield {}
+        return
+    started = time.perf_counter()
+    record = dict(detail)
+    try:
+        yield record
+    finally:
+        trace.add(name, time.perf_counter() - started, **record)
@@ -0,0 +1,98 @@
+"""
+Модуль версий таблиц для условных GET-запросов.
+
+Каждый обработчик записи увеличивает счётчик версии изменённой таблицы, а списочные
+эндпоинты строят из него сильный ETag. Если клиент присылает `If-None-Match` с актуальным
+ETag, ответ 304 отдаётся без обращения к базе данных и без сериализации.
+
+Счётчики лежат в анонимной разделяемой памяти (`mmap`), созданной при импорте модуля.
+При запуске через `app.serve` модуль импортируется мастером до fork, поэтому все воркеры
+видят одни и те же счётчики и одну «эпоху»: запись в одном воркере сразу меняет ETag
+и инвалидирует кэши (ответов, прав) во всех остальных. В ETag входит случайная эпоха,
+поэтому после перезапуска мастера старые ETag гарантированно не совпадут.
+"""
+
+import mmap
+import multiprocessing
+import secrets
+import struct
+import zlib
+
+from fastapi import Request
+
+
+class TableVersions:
+    """
+    Счётчики версий таблиц в разделяемой между воркерами памяти.
+
+    Имя таблицы отображается в один из `SLOTS` слотов по crc32. Коллизия лишь
+    приводит к лишней инвалидации другой таблицы и никогда — к устаревшим данным.
+
+    Атрибуты:
+        epoch (str): Случайный идентификатор мастер-процесса, входящий в каждый ETag.
+    """
+
+    SLOTS = 64
+    _SLOT = struct.Struct("q")
+
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self._counters = mmap.mmap(-1, self.SLOTS * self._SLOT.size)  # MAP_SHARED
+        self._lock = multiprocessing.Lock()  # Межпроцессная блокировка для инкремента
+
+    def _offset(self, table: str) -> int:
+        return zlib.crc32(table.encode()) % self.SLOTS * self._SLOT.size
+
+    def get(self, table: str) -> int:
+        """
+        :param table: Имя таблицы.
+        :return: int: Текущая версия таблицы (0, если записей ещё не было).
+        """
+        return self._SLOT.unpack_from(self._counters, self._offset(table))[0]
+
+    def bump(self, table: str) -> int:
+        """
+        Увеличивает версию таблицы после успешной записи.
+
+        :param table: Имя таблицы.
+        :return: int: Новая версия таблицы.
+        """
+        offset = self._offset(table)
+        with self._lock:
+            version = self._SLOT.unpack_from(self._counters, offset)[0] + 1
+            self._SLOT.pack_into(self._counters, offset, version)
+        return version
+
+    def etag(self, *tables: str) -> str:
+        """
+        Строит сильный ETag из версий указанных таблиц.
+
+        :param tables: Имена таблиц, от которых зависит ответ.
+        :return: str: ETag в кавычках, например `"1a2b3c4d-roles.5"`.
+        """
+        parts = "-".join(f"{table}.{self.get(table)}" for table in tables)
+        return f'"{self.epoch}-{parts}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Проверяет заголовок `If-None-Match` запроса на совпадение с ETag.
+
+    Поддерживаются списки ETag через запятую, `*` и слабые ETag (`W/"..."`),
+    которые для `If-None-Match` сравниваются по слабому правилу (RFC 9110).
+
+    :param request: Входящий запрос.
+    :param etag: Текущий ETag ресурса.
+    :return: bool: True, если клиент уже располагает актуальной версией.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+table_versions = TableVersions()
@@ -0,0 +1,100 @@
+"""
+Модуль прогрева приложения при старте.
+
+Сразу после деплоя пул соединений пуст, данные авторизации не загружены, а backend
+bcrypt в passlib инициализируется лениво при первом хешировании — первые запросы
+платят за всё это и дают всплеск p99. Прогрев выполняет эту работу заранее:
+
+1. открывает `DB_POOL_WARMUP` соединений пула основного сервера и реплики;
+2. загружает правила доступа, роли и бизнес-элементы в `permission_cache`;
+3. инициализирует backend bcrypt (в пуле потоков, чтобы не блокировать цикл событий).
+
+Пока прогрев не завершён, `GET /health/ready` отвечает 503, и балансировщик не направляет
+трафик на экземпляр. При ошибке (например, БД ещё недоступна) прогрев повторяется.
+"""
+
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.backend import db
+from app.backend.permissions import permission_cache
+from app.backend.revocation import revocation_list
+from app.backend.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """
+    Состояние готовности экземпляра.
+
+    Атрибуты:
+        ready (bool): Прогрев успешно завершён.
+        attempts (int): Число попыток прогрева.
+        last_error (str | None): Текст последней ошибки прогрева (наружу не отдаётся).
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.last_error: str | None = None
+
+
+readiness = Readiness()
+
+
+async def open_pool_connections(engine: AsyncEngine, count: int) -> None:
+    """
+    Открывает `count` соединений одновременно и возвращает их в пул.
+
+    :param engine: Движок, пул которого прогревается.
+    :param count: Число соединений (не больше размера пула, иначе лишние закроются).
+    """
+    count = min(count, engine.pool.size())
+    connections = await asyncio.gather(*(engine.connect() for _ in range(count)))
+    for connection in connections:
+        await connection.close()
+
+
+def init_password_hashing() -> None:
+    """Загружает backend bcrypt в passlib, выполнив фиктивную проверку пароля."""
+    from app.routers.auth import get_crypt_context
+
+    get_crypt_context().dummy_verify()
+
+
+async def warm_up() -> None:
+    """Выполняет все шаги прогрева один раз."""
+    warmup_size = get_settings().DB_POOL_WARMUP
+    engine, replica_engine = db.get_engine(), db.get_replica_engine()
+    await open_pool_connections(engine, warmup_size)
+    if replica_engine is not engine:
+        await open_pool_connections(replica_engine, warmup_size)
+    await permission_cache.refresh()
+    await revocation_list.sync()
+    await asyncio.to_thread(init_password_hashing)
+
+
+async def warm_up_until_ready(retry_delay: float = 1.0, max_delay: float = 30.0) -> None:
+    """
+    Повторяет прогрев до успеха с экспоненциальной задержкой и отмечает готовность.
+
+    :param retry_delay: Начальная задержка между попытками, сек.
+    :param max_delay: Максимальная задержка между попытками, сек.
+    """
+    delay = retry_delay
+    while not readiness.ready:
+        readiness.attempts += 1
+        try:
+            await warm_up()
+        except Exception as e:
+            readiness.last_error = str(e)
+            logger.warning("Прогрев не удался (попытка %s): %s", readiness.attempts, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+        else:
+            readiness.ready = True
+            readiness.last_error = None
+            logger.info("Прогрев завершён за %s попыт(ки)", readiness.attempts)
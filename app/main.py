@@ -1,20 +1,104 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+from app.backend.loop_monitor import loop_monitor
+from app.backend.metrics import collect
+from app.backend.middleware import (AuthTraceMiddleware, CompressionMiddleware, ConcurrencyLimitMiddleware,
+                                    DeadlineMiddleware, QueryRouteMiddleware, RouteGroup)
+from app.backend.revocation import revocation_list
+from app.backend.warmup import warm_up_until_ready
+from app.routers import auth, users, roles, ac_rule, health, policy, admin
+from app.schemas.common import MessageResponse
 
-from app.routers import auth, users, roles, ac_rule
 
-app = FastAPI(debug=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запускает прогрев в фоне: сервер стартует сразу, а /health/ready ждёт его окончания.
+    Там же работают периодическая очистка списка отозванных токенов и монитор задержки
+    цикла событий.
+    """
+    tasks = [
+        asyncio.create_task(warm_up_until_ready()),
+        asyncio.create_task(revocation_list.run_pruner()),
+        asyncio.create_task(loop_monitor.run()),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
 
-app.include_router(auth.router, prefix="/auth", tags=["auth"]) # Роутер аутентификации
-app.include_router(users.router, prefix="/users", tags=["users"])
-app.include_router(roles.router, prefix="/roles", tags=["roles"])
-app.include_router(ac_rule.router, prefix="/access-rules", tags=["access_rules"])
 
-@app.get("/")
 async def main():
     """Сообщение стартовой страницы"""
     return {"message": "ok"}
 
 
+async def metrics():
+    """Метрики приложения (кэши, ограничители и т.д.)"""
+    return collect()
+
+
+def create_app() -> FastAPI:
+    """
+    Фабрика приложения: собирает FastAPI-приложение с роутерами.
+
+    Настройки, движки БД, AuthX и CryptContext здесь не создаются — они
+    инициализируются лениво при первом обращении (или при прогреве в lifespan).
+    Для uvicorn: `uvicorn app.main:create_app --factory` или `app.main:app`.
+    """
+    # ORJSONResponse: ответы сериализуются через orjson вместо стандартного json
+    app = FastAPI(debug=True, default_response_class=ORJSONResponse, lifespan=lifespan)
+
+    app.include_router(auth.router, prefix="/auth", tags=["auth"]) # Роутер аутентификации
+    app.include_router(users.router, prefix="/users", tags=["users"])
+    app.include_router(roles.router, prefix="/roles", tags=["roles"])
+    app.include_router(ac_rule.router, prefix="/access-rules", tags=["access_rules"])
+    app.include_router(policy.router, prefix="/policy", tags=["policy"])
+    app.include_router(health.router, prefix="/health", tags=["health"])
+    app.include_router(admin.router, prefix="/admin", tags=["admin"])
+
+    # Атрибуция SQL-выражений маршрутам для журнала медленных запросов (GET /admin/queries)
+    app.add_middleware(QueryRouteMiddleware)
+    # Дедлайны запросов: по истечении бюджета или при отключении клиента обработчик
+    # отменяется, а запросы к PostgreSQL ограничены оставшимся временем (statement_timeout)
+    app.add_middleware(
+        DeadlineMiddleware,
+        default=10.0,
+        routes=[
+            (r"^/(health|metrics)", None),
+            (r"^/roles/\d+/reassign$", None),  # Потоковый перенос, пачки в своих транзакциях
+            (r"^/policy", 30.0),
+            (r"^/auth/(login|register)", 5.0),
+        ],
+    )
+    # Лимиты конкурентности по группам маршрутов: вход и регистрация (bcrypt, CPU)
+    # ограничиваются отдельно от чтений и записей, чтобы всплеск логинов не вытеснял чтения
+    app.add_middleware(
+        ConcurrencyLimitMiddleware,
+        groups=[
+            RouteGroup("auth", limit=8, queue_timeout=1.0, prefixes=("/auth/login", "/auth/register")),
+            RouteGroup("reads", limit=64, queue_timeout=0.5, methods=("GET", "HEAD")),
+            RouteGroup("writes", limit=16, queue_timeout=1.0),
+        ],
+        exempt=("/health", "/metrics"),
+    )
+    # Трассировка решений авторизации по заголовку X-AuthZ-Trace (только для администраторов)
+    app.add_middleware(AuthTraceMiddleware)
+    # Сжатие ответов: тела меньше ~1 КБ помещаются в один TCP-сегмент и не сжимаются
+    # (см. benchmarks/bench_compression.py); NDJSON-поток сжимается по частям
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    app.add_api_route("/", main, methods=["GET"], response_model=MessageResponse)
+    app.add_api_route("/metrics", metrics, methods=["GET"])
+    return app
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", reload=True)
\ No newline at end of file
+    uvicorn.run("app.main:create_app", factory=True, reload=True)
\ No newline at end of file
@@ -4,7 +4,7 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
-from app.backend.db import setting, User, Role, AccessRule, BusinessElement, Base
+from app.backend.db import setting, User, Role, AccessRule, BusinessElement, ApiToken, RevokedToken, Base
 
 
 config = context.config
@@ -0,0 +1,39 @@
+"""Частичные индексы по активным пользователям
+
+Revision ID: 5f3b2c9d1e47
+Revises: 28be395e8166
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f3b2c9d1e47'
+down_revision: Union[str, Sequence[str], None] = '28be395e8166'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Уникальность email теперь только среди активных пользователей
+    op.drop_constraint('users_email_key', 'users', type_='unique')
+    op.create_index(
+        'ix_users_email_active', 'users', ['email'], unique=True,
+        postgresql_where=sa.text('is_active'),
+    )
+    op.create_index(
+        'ix_users_id_active', 'users', ['id'],
+        postgresql_where=sa.text('is_active'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_id_active', table_name='users')
+    op.drop_index('ix_users_email_active', table_name='users')
+    op.create_unique_constraint('users_email_key', 'users', ['email'])
@@ -0,0 +1,34 @@
+"""Индекс users.role_id для переноса пользователей между ролями
+
+Revision ID: d3f6a8b1c024
+Revises: b7d2e5f8a913
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f6a8b1c024'
+down_revision: Union[str, Sequence[str], None] = 'b7d2e5f8a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY: построение индекса не блокирует запись в users
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_role_id_id', 'users', ['role_id', 'id'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_role_id_id', table_name='users', postgresql_concurrently=True)
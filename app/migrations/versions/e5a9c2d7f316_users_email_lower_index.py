@@ -0,0 +1,71 @@
+"""Email без учёта регистра: нормализация и индекс по lower(email)
+
+Revision ID: e5a9c2d7f316
+Revises: d3f6a8b1c024
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9c2d7f316'
+down_revision: Union[str, Sequence[str], None] = 'd3f6a8b1c024'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 50_000  # Диапазон id на одну транзакцию нормализации
+
+# Активные аккаунты, отличающиеся только регистром email: автоматически их не объединить
+CASE_DUPLICATES = sa.text("""
+    SELECT lower(email) AS email, array_agg(id ORDER BY id) AS ids
+    FROM users
+    WHERE is_active
+    GROUP BY lower(email)
+    HAVING count(*) > 1
+    LIMIT 20
+""")
+
+LOWERCASE_RANGE = sa.text("""
+    UPDATE users SET email = lower(email)
+    WHERE id > :low AND id <= :high AND email <> lower(email)
+""")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    duplicates = bind.execute(CASE_DUPLICATES).all()
+    if duplicates:
+        listed = "; ".join(f"{email}: {list(ids)}" for email, ids in duplicates)
+        raise RuntimeError(
+            "Есть активные пользователи с email, различающимися только регистром. "
+            f"Деактивируйте или объедините лишние аккаунты и повторите миграцию: {listed}"
+        )
+
+    with op.get_context().autocommit_block():
+        # Нормализация короткими транзакциями по диапазонам id: строки блокируются ненадолго
+        max_id = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM users")).scalar()
+        for low in range(0, max_id, BATCH_SIZE):
+            bind.execute(LOWERCASE_RANGE, {"low": low, "high": low + BATCH_SIZE})
+
+        # CONCURRENTLY: построение и удаление индексов не блокируют запись в users
+        op.create_index(
+            'ix_users_email_lower_active', 'users', [sa.text('lower(email)')], unique=True,
+            postgresql_where=sa.text('is_active'), postgresql_concurrently=True,
+        )
+        op.drop_index('ix_users_email_active', table_name='users', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Email остаются в нижнем регистре: исходный регистр не сохранялся
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_email_active', 'users', ['email'], unique=True,
+            postgresql_where=sa.text('is_active'), postgresql_concurrently=True,
+        )
+        op.drop_index('ix_users_email_lower_active', table_name='users', postgresql_concurrently=True)
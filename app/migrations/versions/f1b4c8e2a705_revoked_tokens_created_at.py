@@ -0,0 +1,34 @@
+"""Момент отзыва в revoked_tokens для догрузки новых записей
+
+Revision ID: f1b4c8e2a705
+Revises: e5a9c2d7f316
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b4c8e2a705'
+down_revision: Union[str, Sequence[str], None] = 'e5a9c2d7f316'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Существующие записи получают момент миграции: воркеры загрузят их при старте целиком
+    op.add_column(
+        'revoked_tokens',
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index(op.f('ix_revoked_tokens_created_at'), 'revoked_tokens', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_revoked_tokens_created_at'), table_name='revoked_tokens')
+    op.drop_column('revoked_tokens', 'created_at')
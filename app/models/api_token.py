@@ -0,0 +1,26 @@
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, func
+from app.models.access_rule import Base
+
+
+class ApiToken(Base):
+    """
+    Модель непрозрачного API-токена.
+    Используется сервисами, которые не могут хранить JWT в cookie: токен передаётся
+    в заголовке `Authorization: Bearer ...`. Сам токен не хранится — только его SHA-256.
+    """
+
+    # Название таблицы в базе данных
+    __tablename__ = "api_tokens"
+
+    # Уникальный идентификатор токена (первичный ключ)
+    id = Column(Integer, primary_key=True, index=True)
+    # Владелец токена: запросы с токеном выполняются от имени этого пользователя
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Произвольное название для владельца (например, "billing-service")
+    name = Column(String, nullable=False)
+    # SHA-256 токена в hex. Токен случайный и длинный, поэтому медленный хеш
+    # (bcrypt) не нужен: проверка — один поиск по уникальному индексу
+    token_hash = Column(String(64), unique=True, nullable=False)
+    # Отозванный токен остаётся в таблице с is_active=False
+    is_active = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, Integer, String, func
+from app.models.access_rule import Base
+
+
+class RevokedToken(Base):
+    """
+    Модель отозванного JWT.
+    При выходе из системы идентификатор токена (claim `jti`) сохраняется здесь до истечения
+    срока действия токена, после чего запись удаляется: просроченный токен и так не принимается.
+    """
+
+    # Название таблицы в базе данных
+    __tablename__ = "revoked_tokens"
+
+    # Уникальный идентификатор записи (первичный ключ)
+    id = Column(Integer, primary_key=True)
+    # Идентификатор токена (claim `jti`)
+    jti = Column(String, unique=True, nullable=False)
+    # Момент истечения токена (claim `exp`); по нему удаляются устаревшие записи
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    # Момент отзыва (время начала транзакции): воркеры догружают записи новее уже известных
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey
+from sqlalchemy import Boolean, Column, Index, Integer, String, ForeignKey, func
 
 
 class Base(DeclarativeBase):
@@ -18,7 +18,11 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True)
+    # Email хранится в нижнем регистре (см. `app.schemas.user.normalize_email`).
+    # Уникальность без учёта регистра обеспечивается частичным индексом по lower(email)
+    # только среди активных пользователей: email деактивированного аккаунта можно
+    # зарегистрировать повторно
+    email = Column(String)
     hashed_password = Column(String)
     first_name = Column(String)
     last_name = Column(String)
@@ -26,3 +30,21 @@ class User(Base):
 
     # Внешний ключ для связи с таблицей ролей
     role_id = Column(Integer, ForeignKey("roles.id"), default=2)  # По умолчанию роль "user" (id=2)
+
+    __table_args__ = (
+        # Частичные индексы по активным пользователям: все «горячие» запросы
+        # фильтруют по is_active, поэтому деактивированные строки в индекс не попадают
+        # Функциональный индекс: поиск `lower(email) = :email` — одна проба индекса,
+        # а Foo@x.com и foo@x.com не могут принадлежать двум активным аккаунтам
+        Index(
+            "ix_users_email_lower_active", func.lower(email), unique=True,
+            postgresql_where=is_active, sqlite_where=is_active,
+        ),
+        Index(
+            "ix_users_id_active", "id",
+            postgresql_where=is_active, sqlite_where=is_active,
+        ),
+        # Участники роли по возрастанию id: перенос пользователей между ролями идёт
+        # пачками по ключу (role_id, id > последний) без сканирования всей таблицы
+        Index("ix_users_role_id_id", "role_id", "id"),
+    )
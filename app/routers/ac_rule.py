@@ -1,44 +1,47 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import TypeAdapter
 from sqlalchemy import select, delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.access_rule import AccessRule
-from app.models.user import User
 from app.models.role import Role
 from app.models.business_element import BusinessElement
-from app.schemas.access_rule import AccessRuleCreate
-
-from app.backend.db_depends import get_session
+from app.schemas.access_rule import AccessRuleCreate, AccessRuleListItem, AccessRuleRead
+from app.schemas.common import MessageResponse
+
+from app.backend import db
+from app.backend.db_depends import get_session, get_read_session
+from app.backend.permissions import load_principal, load_rule
+from app.backend.cache import response_cache
+from app.backend.versions import etag_matches, table_versions
 from .auth import get_current_user_id
 
 router = APIRouter()
+rule_list_adapter = TypeAdapter(list[AccessRuleListItem])  # Сериализатор списка правил в JSON
 session = Annotated[
     AsyncSession, Depends(get_session)
 ]  # Аннотация типа для зависимости сессии
+read_session = Annotated[
+    AsyncSession, Depends(get_read_session)
+]  # Сессия для обработчиков только для чтения (реплика)
 
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=MessageResponse)
 async def create_rule(
         access_rule: AccessRuleCreate,
         session: session,
         current_user: dict = Depends(get_current_user_id)
 ):
     """Создать новое правило доступа."""
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
+    user = await load_principal(session, current_user["user_id"])
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден или неактивен"
         )
     # Получаем правило доступа для элемента с id=3 ("rule")
-    rule_query = await session.execute(
-        select(AccessRule)
-        .where(AccessRule.role_id == user.role_id)
-        .where(AccessRule.element_id == 3)
-    )
-    rule = rule_query.scalar_one_or_none()
+    rule = await load_rule(user.role_id, 3)
 
     if not rule or not rule.create_permission:
         raise HTTPException(
@@ -62,30 +65,27 @@ async def create_rule(
     )
     session.add(new_rule)
     await session.commit()
+    table_versions.bump("access_rules")
+    response_cache.invalidate("access_rules")
     return {"message": "Правило успешно создано"}
 
-@router.get("/")
+@router.get("/", response_model=list[AccessRuleListItem])
 async def get_access_rules(
-    session: session,
+    request: Request,
+    session: read_session,
     current_user: dict = Depends(get_current_user_id)
 ):
     """Получить список всех правил доступа (доступных для чтения)."""
-    emt_l = []
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
+    etag = table_versions.etag("access_rules")
+    user = await load_principal(session, current_user["user_id"])
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден или неактивен"
         )
     # Получаем правило доступа для элемента с id=3 ("rule")
-    rule_query = await session.execute(
-        select(AccessRule)
-        .where(AccessRule.role_id == user.role_id)
-        .where(AccessRule.element_id == 3)
-    )
-    rule = rule_query.scalar_one_or_none()
+    rule = await load_rule(user.role_id, 3)
 
     if not rule or not rule.read_permission:
         raise HTTPException(
@@ -93,39 +93,47 @@ async def get_access_rules(
             detail="У вас нет прав на чтение правил доступа"
         )
 
-    rules_query = await session.execute(select(AccessRule))
-    result = rules_query.scalars().all()
-    for el in result:
-        emt_l.append({
-            "id": el.id,
-            "role_id": el.role_id,
-            "element_id": el.element_id
-        })
-    return emt_l
-
-
-@router.get("/{access_rule_id}")
+    # Условный GET — только после проверки прав (правило берётся из снимка в памяти):
+    # таблица не менялась — 304 без запросов к БД и сериализации
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    # Готовые байты ответа кэшируются по версии таблицы: повтор без запроса и сериализации
+    cache_key = ("access_rules", etag, request.url.query)
+    payload = response_cache.get(cache_key)
+    if payload is None:
+        # Байты кэшируются под ETag, прочитанным до запроса, поэтому читаем с основного
+        # сервера: отстающая реплика записала бы под новый ETag старые данные до следующей
+        # записи. Промах случается раз на версию таблицы в воркере.
+        # Выбираем только нужные колонки: без ORM-объектов и identity map
+        async with db.get_session_factory()() as primary:
+            rules_query = await primary.execute(
+                select(AccessRule.id, AccessRule.role_id, AccessRule.element_id)
+            )
+        payload = rule_list_adapter.dump_json([
+            AccessRuleListItem(id=rule_id, role_id=role_id, element_id=element_id)
+            for rule_id, role_id, element_id in rules_query
+        ])
+        response_cache.put(cache_key, payload)
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/{access_rule_id}", response_model=AccessRuleRead)
 async def get_access_rule(
     s_rule_id: int,
-    session: session,
+    session: read_session,
     current_user: dict = Depends(get_current_user_id)
 ):
     """Получить информацию о правиле доступа."""
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
+    user = await load_principal(session, current_user["user_id"])
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден или неактивен"
         )
     # Получаем правило доступа для элемента с id=3 ("rule")
-    rule_query = await session.execute(
-        select(AccessRule)
-        .where(AccessRule.role_id == user.role_id)
-        .where(AccessRule.element_id == 3)
-    )
-    rule = rule_query.scalar_one_or_none()
+    rule = await load_rule(user.role_id, 3)
 
     if not rule or not rule.read_permission:
         raise HTTPException(
@@ -138,11 +146,9 @@ async def get_access_rule(
     if result is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Правила под id {s_rule_id} не существует")
 
-    return {"id": result.id,
-            "rule_id": result.role_id,
-            "element_id": result.element_id}
+    return AccessRuleRead(id=result.id, rule_id=result.role_id, element_id=result.element_id)
 
-@router.put("/{access_rule_id}")
+@router.put("/{access_rule_id}", response_model=MessageResponse)
 async def update_access_rule(
     s_rule_id: int,
     new_info: AccessRuleCreate,
@@ -150,21 +156,15 @@ async def update_access_rule(
     current_user: dict = Depends(get_current_user_id)
 ):
     """Обновить информацию о правиле доступа."""
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
+    user = await load_principal(session, current_user["user_id"])
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден или неактивен"
         )
     # Получаем правило доступа для элемента с id=3 ("rule")
-    rule_query = await session.execute(
-        select(AccessRule)
-        .where(AccessRule.role_id == user.role_id)
-        .where(AccessRule.element_id == 3)
-    )
-    rule = rule_query.scalar_one_or_none()
+    rule = await load_rule(user.role_id, 3)
 
     if not rule or not rule.update_permission:
         raise HTTPException(
@@ -192,35 +192,35 @@ async def update_access_rule(
         ).where(AccessRule.id == s_rule_id))
 
         await session.commit()
+        table_versions.bump("access_rules")
+        response_cache.invalidate("access_rules")
         return {"message": f"Правило под id {s_rule_id} успешно обновлена!"}
 
+    except HTTPException:
+        raise
     except Exception as e:
-        return f"Что-то пошло не так: {e}"
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Что-то пошло не так: {e}")
 
 
 
-@router.delete("/{role_id}")
+
+@router.delete("/{role_id}", response_model=MessageResponse)
 async def delete_role(
     del_rule_id: int,
     session: session,
     current_user: dict = Depends(get_current_user_id)
 ):
     """Удалить правило доступа"""
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
+    user = await load_principal(session, current_user["user_id"])
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден или неактивен"
         )
     # Получаем правило доступа для элемента с id=3 ("rule")
-    rule_query = await session.execute(
-        select(AccessRule)
-        .where(AccessRule.role_id == user.role_id)
-        .where(AccessRule.element_id == 3)
-    )
-    rule = rule_query.scalar_one_or_none()
+    rule = await load_rule(user.role_id, 3)
 
     if not rule or not rule.delete_permission:
         raise HTTPException(
@@ -237,6 +237,11 @@ async def delete_role(
 
         await session.execute(delete(AccessRule).where(AccessRule.id == del_rule_id))
         await session.commit()
+        table_versions.bump("access_rules")
+        response_cache.invalidate("access_rules")
         return {"message": f"Правило под id {del_rule_id} успешно удалена!"}
+    except HTTPException:
+        raise
     except Exception as e:
-        return f"Что-то пошло не так: {e}"
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Что-то пошло не так: {e}")
@@ -0,0 +1,90 @@
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.query_stats import QueryPlan, QueryStat, SlowQuery
+from app.backend.db_depends import get_read_session
+from app.backend.permissions import load_principal, permission_cache
+from app.backend.query_stats import explain, query_stats
+from app.backend.trace import ADMIN_ROLE_NAME
+from .auth import get_current_user_id
+
+router = APIRouter()
+read_session = Annotated[
+    AsyncSession, Depends(get_read_session)
+]  # Сессия для обработчиков только для чтения (реплика)
+
+
+async def require_admin(
+    session: read_session,
+    current_user: dict = Depends(get_current_user_id)
+) -> dict:
+    """Пропускает только пользователей с ролью администратора."""
+    user = await load_principal(session, current_user["user_id"])
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Пользователь не найден или неактивен"
+        )
+    # Снимок мог ещё не загрузиться (прогрев) или устареть (роль переименована)
+    if not permission_cache.is_fresh:
+        await permission_cache.refresh()
+    if permission_cache.roles.get(user.role_id) != ADMIN_ROLE_NAME:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Доступно только администратору"
+        )
+    return current_user
+
+
+@router.get("/queries", response_model=list[QueryStat], dependencies=[Depends(require_admin)])
+async def get_query_stats(
+    route: str | None = None,
+    sort: Literal["total_ms", "mean_ms", "max_ms", "calls"] = "total_ms",
+    limit: int = 50,
+):
+    """
+    Статистика SQL-выражений по маршрутам и отпечаткам: число выполнений, суммарное,
+    среднее и максимальное время. `route` — шаблон маршрута, например `GET /roles/`.
+    """
+    return query_stats.report(route=route, sort=sort, limit=limit)
+
+
+@router.get("/queries/slow", response_model=list[SlowQuery], dependencies=[Depends(require_admin)])
+async def get_slow_queries():
+    """Последние выражения дольше порога `SLOW_QUERY_MS`, новые первыми."""
+    return list(reversed(query_stats.slow))
+
+
+@router.post("/queries/{query_id}/explain", response_model=QueryPlan, dependencies=[Depends(require_admin)])
+async def explain_slow_query(query_id: str, session: read_session):
+    """
+    План последнего медленного выполнения выражения с его параметрами.
+    Выражение не выполняется (`EXPLAIN` без `ANALYZE`).
+    """
+    sample = query_stats.slow_sample(query_id)
+    if sample is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Медленное выполнение с таким отпечатком не найдено"
+        )
+    try:
+        plan = await explain(session, sample)
+    except DBAPIError as e:
+        # Например, параметры сохранённого выполнения не подходят под текущую схему
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"План не построен: {e.orig}"
+        )
+    await session.rollback()
+    return QueryPlan(id=query_id, statement=sample["statement"], plan=plan)
+
+
+@router.delete("/queries", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_admin)])
+async def reset_query_stats():
+    """Обнулить статистику и журнал медленных запросов этого воркера."""
+    query_stats.reset()
@@ -1,35 +1,84 @@
-import base64
-import json
+import time
 
 from fastapi import (APIRouter, Depends, Response, Request, HTTPException, status)
-from typing import Annotated
+from functools import lru_cache
+from typing import Annotated, TYPE_CHECKING
 
-from passlib.context import CryptContext
-from sqlalchemy import insert, select
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from authx import AuthX, AuthXConfig
 
-from app.models.user import User
-
-from app.schemas.user import UserCreate, UserLogin
+from app.schemas.api_token import ApiTokenCreate, ApiTokenCreated
+from app.schemas.common import DetailResponse
+from app.schemas.user import RegisterResponse, TokenResponse, UserCreate, UserLogin
+from app.backend.api_tokens import generate_token, hash_token, is_api_token, token_verifier
 from app.backend.db_depends import get_session
+from app.backend.queries import ACTIVE_USER_BY_EMAIL, INSERT_ACTIVE_USER, user_values
+from app.backend.revocation import REVOKE_TOKEN, revocation_list, revoke_values
+from app.backend.trace import stage
+from app.backend.versions import table_versions
+from app.models.api_token import ApiToken
+
+if TYPE_CHECKING:
+    from authx import AuthX, AuthXConfig
+    from passlib.context import CryptContext
 
 router = APIRouter()
-config = AuthXConfig()
-config.JWT_SECRET_KEY = "SUPER_SECRET_KEY"
-config.JWT_ACCESS_COOKIE_NAME = "my_secret_token"
-config.JWT_TOKEN_LOCATION = ["cookies"]
-security = AuthX(config=config)
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+ACCESS_COOKIE_NAME = "my_secret_token"  # Имя cookie с JWT
+MAX_TOKEN_LIFETIME = 30 * 24 * 3600  # Срок токенов, если в AuthX он не ограничен
+
+
+# AuthX и CryptContext создаются при первом обращении, а не при импорте роутера:
+# их импорт и инициализация заметно удлиняют старт воркеров и тестов.
+@lru_cache
+def get_auth_config() -> "AuthXConfig":
+    """Конфигурация AuthX."""
+    from authx import AuthXConfig
+
+    config = AuthXConfig()
+    config.JWT_SECRET_KEY = "SUPER_SECRET_KEY"
+    config.JWT_ACCESS_COOKIE_NAME = ACCESS_COOKIE_NAME
+    config.JWT_TOKEN_LOCATION = ["cookies", "headers"]
+    return config
+
+
+@lru_cache
+def get_security() -> "AuthX":
+    """Экземпляр AuthX для выпуска токенов."""
+    from authx import AuthX
+
+    return AuthX(config=get_auth_config())
+
+
+@lru_cache
+def get_crypt_context() -> "CryptContext":
+    """Контекст passlib для хеширования паролей bcrypt."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+_LAZY_ATTRIBUTES = {
+    "config": get_auth_config,
+    "security": get_security,
+    "bcrypt_context": get_crypt_context,
+}
+
+
+def __getattr__(name: str):
+    # Совместимость: `from app.routers.auth import security, bcrypt_context`
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 session = Annotated[
     AsyncSession, Depends(get_session)
 ]  # Аннотация типа для зависимости сессии
 
 async def is_authenticated(request: Request):
-    token = request.cookies.get(config.JWT_ACCESS_COOKIE_NAME)
+    token = request.cookies.get(ACCESS_COOKIE_NAME)
     if not token:
         return False  # Не авторизован
     try:
@@ -39,7 +88,7 @@ async def is_authenticated(request: Request):
         return False  # Токен недействителен
 
 
-@router.post("/register")
+@router.post("/register", response_model=RegisterResponse)
 async def register(user: UserCreate, session: session, request: Request):
     """Регистрация нового пользователя — только если не авторизован"""
 
@@ -57,82 +106,219 @@ async def register(user: UserCreate, session: session, request: Request):
     if user.password1 != user.password2:
         raise HTTPException(status_code=400, detail="Пароли не совпадают")
 
-    # Проверка на существование email
-    existing_user = await session.scalar(
-        select(User).where(User.email == user.email)
+    # Регистрация одним запросом: при занятом email RETURNING вернёт пустой результат
+    params = user_values(
+        email=user.email,
+        hashed_password=get_crypt_context().hash(user.password1),
+        first_name=user.first_name,
+        last_name=user.last_name,
     )
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Пользователь с таким email уже существует"
-        )
-
-    # Регистрация
-    query = insert(User).values([
-        {
-            "email": user.email,
-            "hashed_password": bcrypt_context.hash(user.password1),
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "is_active": True
-        }
-    ])
     try:
-        await session.execute(query)
-        await session.commit()
-        return {"status_code": status.HTTP_201_CREATED, "transaction": "Успешная регистрация"}
+        result = await session.execute(INSERT_ACTIVE_USER, params)
+        new_user_id = result.scalar_one_or_none()
+        if new_user_id is not None:
+            await session.commit()
     except Exception as e:
         await session.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+    if new_user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Пользователь с таким email уже существует"
+        )
+    return {"status_code": status.HTTP_201_CREATED, "transaction": "Успешная регистрация"}
 
-@router.post("/login")
+
+@router.post("/login", response_model=TokenResponse)
 async def login(user: UserLogin, session: session, response: Response):
     """Логиним пользователя, подправить сонтекст верифай"""
 
-    user_query = await session.scalar(
-            select(User).where(User.email == user.email))
+    user_query = await session.scalar(ACTIVE_USER_BY_EMAIL, {"email": user.email})
     if not user_query:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный email или пароль"
         )
-    if not bcrypt_context.verify(
+    if not get_crypt_context().verify(
             user.password, user_query.hashed_password
     ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверный email или пароль"
         )
-    token = security.create_access_token(uid=str(user_query.id))
-    response.set_cookie(config.JWT_ACCESS_COOKIE_NAME, token)
+    token = get_security().create_access_token(uid=str(user_query.id))
+    response.set_cookie(ACCESS_COOKIE_NAME, token)
     return {"access_token": token}
 
+class InvalidTokenError(ValueError):
+    """JWT не прошёл проверку; `reason` — причина отказа для трассировки."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def token_lifetime() -> float:
+    """
+    :return: float: Срок действия выпускаемых JWT, сек.
+    """
+    expires = get_auth_config().JWT_ACCESS_TOKEN_EXPIRES
+    return expires.total_seconds() if expires else MAX_TOKEN_LIFETIME
+
+
+def verified_claims(token: str) -> dict:
+    """
+    Проверяет подпись и срок действия JWT ключом AuthX и наличие claims `sub`, `jti` и `exp`.
+
+    :return: dict: Claims проверенного токена.
+    :raises InvalidTokenError: Токен подделан, просрочен, нечитаем или без обязательных claims.
+    """
+    from authx.exceptions import JWTDecodeError, TokenExpiredError
+    from authx.token import decode_token as decode_jwt
+
+    config = get_auth_config()
+    try:
+        claims = decode_jwt(token, key=config.public_key, algorithms=[config.JWT_ALGORITHM])
+    except TokenExpiredError as e:
+        raise InvalidTokenError("expired", "Срок действия токена истёк") from e
+    except JWTDecodeError as e:
+        raise InvalidTokenError("invalid", "Недействительный токен") from e
+
+    exp = claims.get("exp")
+    # Без `jti` токен нельзя отозвать, без `exp` — нельзя удалить запись об отзыве
+    if (
+        not isinstance(claims.get("sub"), str)
+        or not isinstance(claims.get("jti"), str) or not claims["jti"]
+        or isinstance(exp, bool) or not isinstance(exp, (int, float))
+    ):
+        raise InvalidTokenError("missing_claims", "Недействительный токен")
+    return claims
+
+
 def decode_token(token: str) -> str:
+    return verified_claims(token)["sub"]
+
+
+def bearer_token(request: Request) -> str | None:
+    """
+    :return: str | None: Токен из заголовка `Authorization: Bearer ...` или None.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+async def get_current_user_id(request: Request):
+    """
+    Определяет пользователя запроса.
+
+    Принимается заголовок `Authorization: Bearer` (API-токен `ag_...` или JWT)
+    либо JWT в cookie. API-токен проверяется через кэш `token_verifier` без bcrypt
+    и, как правило, без обращения к базе данных.
+    """
+    with stage("token") as traced:
+        token = bearer_token(request)
+        if token and is_api_token(token):
+            traced["kind"] = "api_token"
+            user_id = await token_verifier.verify(token)
+            if user_id is None:
+                traced["rejected"] = "invalid_api_token"
+                raise HTTPException(status_code=401, detail="Недействительный API-токен")
+            return {"user_id": str(user_id)}
+
+        traced["kind"] = "jwt"
+        token = token or request.cookies.get(ACCESS_COOKIE_NAME)
+        if not token:
+            traced["rejected"] = "missing"
+            raise HTTPException(status_code=401, detail="Вы не в системе")
+
+        try:
+            claims = verified_claims(token)
+        except InvalidTokenError as e:
+            traced["rejected"] = e.reason
+            raise HTTPException(status_code=401, detail=str(e))
+        if await revocation_list.is_revoked(claims["jti"]):
+            traced["rejected"] = "revoked"
+            raise HTTPException(status_code=401, detail="Токен отозван")
+        return {"user_id": claims["sub"]}
+
+
+@router.post("/tokens", response_model=ApiTokenCreated, status_code=status.HTTP_201_CREATED)
+async def create_api_token(
+    data: ApiTokenCreate,
+    session: session,
+    current_user: dict = Depends(get_current_user_id),
+):
+    """Выпустить API-токен текущего пользователя. Токен возвращается только в этом ответе."""
+    token = generate_token()
+    api_token = ApiToken(
+        user_id=int(current_user["user_id"]),
+        name=data.name,
+        token_hash=hash_token(token),
+        is_active=True,
+    )
+    session.add(api_token)
     try:
-        # Разбиваем токен на части
-        header, payload, signature = token.split('.')
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    table_versions.bump("api_tokens")  # Сбрасывает отрицательные записи кэша проверок
+    return {"id": api_token.id, "name": api_token.name, "token": token}
 
-        # Декодируем payload (base64url)
-        payload_bytes = base64.urlsafe_b64decode(payload + '==')  # Добавляем padding
-        payload_str = payload_bytes.decode('utf-8')
 
-        # Парсим JSON
-        data = json.loads(payload_str)
-        return data.get("sub")
+@router.delete("/tokens/{token_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_api_token(
+    token_id: int,
+    session: session,
+    current_user: dict = Depends(get_current_user_id),
+):
+    """Отозвать свой API-токен."""
+    try:
+        result = await session.execute(
+            update(ApiToken)
+            .where(
+                ApiToken.id == token_id,
+                ApiToken.user_id == int(current_user["user_id"]),
+                ApiToken.is_active,
+            )
+            .values(is_active=False)
+            .returning(ApiToken.id)
+        )
+        revoked_id = result.scalar_one_or_none()
+        if revoked_id is not None:
+            await session.commit()
     except Exception as e:
-        raise ValueError(f"Ошибка при декодировании: {e}")
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    if revoked_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Токен не найден")
+    table_versions.bump("api_tokens")  # Отзыв сразу виден во всех воркерах
 
-async def get_current_user_id(request: Request):
-    token = request.cookies.get(config.JWT_ACCESS_COOKIE_NAME)
-    if not token:
-        raise HTTPException(status_code=401, detail="Вы не в системе")
 
-    user_id = decode_token(token)
-    return {"user_id": user_id}
+@router.post("/logout", response_model=DetailResponse)
+async def logout(request: Request, response: Response, session: session):
+    """Выход пользователя из системы: токен отзывается до истечения срока действия."""
+    token = request.cookies.get(ACCESS_COOKIE_NAME) or bearer_token(request)
+    try:
+        claims = verified_claims(token) if token else None
+    except InvalidTokenError:
+        claims = None  # Подделанный или просроченный токен отзывать не нужно
 
+    if claims:
+        jti = claims["jti"]
+        # Запись об отзыве живёт не дольше, чем мог бы прожить выпущенный сервисом токен
+        expires_at = min(claims["exp"], time.time() + token_lifetime())
+        try:
+            await session.execute(REVOKE_TOKEN, revoke_values(jti, expires_at))
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        revocation_list.remember(jti, expires_at)
+        table_versions.bump("revoked_tokens")  # Остальные воркеры догрузят новый отзыв
 
-@router.post("/logout")
-async def logout(response: Response):
-    """Выход пользователя из системы."""
-    response.delete_cookie(config.JWT_ACCESS_COOKIE_NAME)  # Удаляем куки с токеном
+    response.delete_cookie(ACCESS_COOKIE_NAME)  # Удаляем куки с токеном
     return {"detail": "Вы успешно вышли из системы"}
\ No newline at end of file
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, status
+from fastapi.responses import ORJSONResponse
+
+from app.backend.warmup import readiness
+
+router = APIRouter()
+
+
+@router.get("/live")
+async def live():
+    """Процесс запущен и обрабатывает запросы."""
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def ready():
+    """
+    Экземпляр прогрет и готов принимать трафик; до этого — 503.
+
+    Эндпоинт открыт без аутентификации, поэтому текст ошибки прогрева (адрес базы, имя
+    пользователя) сюда не попадает — он пишется в журнал при каждой неудачной попытке.
+    """
+    if not readiness.ready:
+        return ORJSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "status": "warming_up",
+                "attempts": readiness.attempts,
+            },
+        )
+    return {"status": "ready"}
@@ -0,0 +1,76 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.policy import Policy, PolicySyncResult
+from app.backend.cache import response_cache
+from app.backend.db_depends import get_session
+from app.backend.permissions import load_principal, load_rule
+from app.backend.policy import REFERENCED_ELEMENTS, PolicyError, apply_policy
+from app.backend.versions import table_versions
+from .auth import get_current_user_id
+
+router = APIRouter()
+session = Annotated[
+    AsyncSession, Depends(get_session)
+]  # Аннотация типа для зависимости сессии
+
+POLICY_ELEMENTS = sorted(REFERENCED_ELEMENTS)  # "roles" и "rule": синхронизация меняет оба
+
+
+@router.put("/", response_model=PolicySyncResult)
+async def sync_policy(
+    policy: Policy,
+    session: session,
+    dry_run: bool = False,
+    current_user: dict = Depends(get_current_user_id)
+):
+    """
+    Привести роли, бизнес-элементы и правила доступа к переданной политике.
+
+    Меняются только отличающиеся строки, всё — одной транзакцией. С `dry_run=true`
+    возвращается только сводка изменений.
+    """
+    user = await load_principal(session, current_user["user_id"])
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Пользователь не найден или неактивен"
+        )
+
+    # Синхронизация создаёт, меняет и удаляет и роли, и правила: нужны все права на оба элемента
+    for element_id in POLICY_ELEMENTS:
+        rule = await load_rule(user.role_id, element_id)
+        if not rule or not (
+            rule.create_permission and rule.update_permission and rule.delete_permission
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="У вас нет прав на синхронизацию политики доступа"
+            )
+
+    try:
+        result = await apply_policy(session, policy, dry_run=dry_run)
+        if dry_run:
+            await session.rollback()
+            return result
+        await session.commit()
+    except PolicyError as e:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except IntegrityError as e:
+        # Например, удаляемая роль ещё назначена пользователям
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Политика не применена: {e.orig}")
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Что-то пошло не так: {e}")
+
+    for table in ("roles", "business_elements", "access_rules"):
+        table_versions.bump(table)
+    response_cache.invalidate("roles")
+    response_cache.invalidate("access_rules")
+    return result
@@ -1,44 +1,49 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, delete, update
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.schemas.role import RoleCreate # Схема сущности
-from app.models.user import User
-from app.models.access_rule import AccessRule
+from app.schemas.common import MessageResponse
+from app.schemas.role import RoleCreate, RoleListItem, RoleRead, RoleReassign # Схемы сущности
 from app.models.role import Role
-from app.backend.db_depends import get_session
+from app.backend import db
+from app.backend.db_depends import get_session, get_read_session
+from app.backend import role_migration
+from app.backend.permissions import load_principal, load_rule
+from app.backend.cache import response_cache
+from app.backend.versions import etag_matches, table_versions
 from .auth import get_current_user_id
 
 router = APIRouter()
+role_list_adapter = TypeAdapter(list[RoleListItem])  # Сериализатор списка ролей в JSON
 session = Annotated[
     AsyncSession, Depends(get_session)
 ]  # Аннотация типа для зависимости сессии
+read_session = Annotated[
+    AsyncSession, Depends(get_read_session)
+]  # Сессия для обработчиков только для чтения (реплика)
 
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=MessageResponse)
 async def create_role(
     role_data: RoleCreate,
     session: session,
     current_user: dict = Depends(get_current_user_id)
 ):
     """Создать роль"""
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
+    user = await load_principal(session, current_user["user_id"])
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден или неактивен"
         )
 
     # Получаем правило доступа для элемента с id=2 ("roles")
-    rule_query = await session.execute(
-        select(AccessRule)
-        .where(AccessRule.role_id == user.role_id)
-        .where(AccessRule.element_id == 2)
-    )
-    rule = rule_query.scalar_one_or_none()
+    rule = await load_rule(user.role_id, 2)
 
     if not rule:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="У вас нет прав на данный функционал")
@@ -50,73 +55,76 @@ async def create_role(
     new_role = Role(name=role_data.name, description=role_data.description)
     session.add(new_role)
     await session.commit()
+    table_versions.bump("roles")
+    response_cache.invalidate("roles")
 
     return {"message": "Роль успешно создана"}
 
-@router.get("/")
+@router.get("/", response_model=list[RoleListItem])
 async def get_roles(
-    session: session,
+    request: Request,
+    session: read_session,
     current_user: dict = Depends(get_current_user_id)
 ):
-    emt_l = []
     """Получить список всех ролей."""
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
+    etag = table_versions.etag("roles")
+    user = await load_principal(session, current_user["user_id"])
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден или неактивен"
         )
 
     # Получаем правило доступа для элемента с id=2 (например, "access_rules")
-    rule_query = await session.execute(
-        select(AccessRule)
-        .where(AccessRule.role_id == user.role_id)
-        .where(AccessRule.element_id == 2)  # Предполагаем, что access_rules = element_id=2
-    )
-    rule = rule_query.scalar_one_or_none()
+    rule = await load_rule(user.role_id, 2)
 
     if not rule:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="У вас нет прав на данный функционал")
 
     if not rule.read_permission:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Вы не можете создать роль")
-    roles_query = await session.execute(
-        select(Role))
-    result = roles_query.scalars().all()
-    for el in result:
-        emt_l.append({
-            "role_id": el.id,
-            "role_name": el.name
-        })
-    return emt_l
+
+    # Условный GET — только после проверки прав (правило берётся из снимка в памяти):
+    # таблица не менялась — 304 без запросов к БД и сериализации
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    # Готовые байты ответа кэшируются по версии таблицы: повтор без запроса и сериализации
+    cache_key = ("roles", etag, request.url.query)
+    payload = response_cache.get(cache_key)
+    if payload is None:
+        # Байты кэшируются под ETag, прочитанным до запроса, поэтому читаем с основного
+        # сервера: отстающая реплика записала бы под новый ETag старые данные до следующей
+        # записи. Промах случается раз на версию таблицы в воркере.
+        # Выбираем только нужные колонки: без ORM-объектов и identity map
+        async with db.get_session_factory()() as primary:
+            roles_query = await primary.execute(select(Role.id, Role.name))
+        payload = role_list_adapter.dump_json(
+            [RoleListItem(role_id=role_id, role_name=name) for role_id, name in roles_query]
+        )
+        response_cache.put(cache_key, payload)
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
 
 
 
-@router.get("/{role_id}")
+@router.get("/{role_id}", response_model=RoleRead)
 async def get_role(
     s_role_id: int,
-    session: session,
+    session: read_session,
     current_user: dict = Depends(get_current_user_id)
 ):
     """Получить информацию о роли"""
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
+    user = await load_principal(session, current_user["user_id"])
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден или неактивен"
         )
 
     # Получаем правило доступа для элемента с id=2 (например, "access_rules")
-    rule_query = await session.execute(
-        select(AccessRule)
-        .where(AccessRule.role_id == user.role_id)
-        .where(AccessRule.element_id == 2)
-    )
-    rule = rule_query.scalar_one_or_none()
+    rule = await load_rule(user.role_id, 2)
 
     if not rule:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="У вас нет прав на данный функционал")
@@ -129,12 +137,14 @@ async def get_role(
         result = roles_query.scalar_one_or_none()
         if result is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"роли под id {s_role_id} не существует")
-        return {"id": result.id, "name": result.name, "descr": result.description}
+        return RoleRead(id=result.id, name=result.name, descr=result.description)
+    except HTTPException:
+        raise
     except Exception as e:
-        return f"Что-то пошло не так: {e}"
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Что-то пошло не так: {e}")
 
 
-@router.put("/{role_id}")
+@router.put("/{role_id}", response_model=MessageResponse)
 async def update_role(
     s_role_id: int,
     new_info: RoleCreate,
@@ -142,22 +152,16 @@ async def update_role(
     current_user: dict = Depends(get_current_user_id)
 ):
     """Обновить информацию о роли"""
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
+    user = await load_principal(session, current_user["user_id"])
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден или неактивен"
         )
 
     # Получаем правило доступа для элемента с id=2 (например, "access_rules")
-    rule_query = await session.execute(
-        select(AccessRule)
-        .where(AccessRule.role_id == user.role_id)
-        .where(AccessRule.element_id == 2)
-    )
-    rule = rule_query.scalar_one_or_none()
+    rule = await load_rule(user.role_id, 2)
 
     if not rule:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="У вас нет прав на данный функционал")
@@ -177,35 +181,34 @@ async def update_role(
         "description": new_info.description}).where(Role.id == s_role_id))
 
         await session.commit()
+        table_versions.bump("roles")
+        response_cache.invalidate("roles")
         return {"message": f"Роль под id {s_role_id} успешно удалена!"}
+    except HTTPException:
+        raise
     except Exception as e:
-        return f"Что-то пошло не так: {e}"
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Что-то пошло не так: {e}")
 
 
 
-@router.delete("/{role_id}")
+@router.delete("/{role_id}", response_model=MessageResponse)
 async def delete_role(
     del_role_id: int,
     session: session,
     current_user: dict = Depends(get_current_user_id)
 ):
     """Удалить роль"""
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
+    user = await load_principal(session, current_user["user_id"])
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден или неактивен"
         )
 
     # Получаем правило доступа для элемента с id=2 (например, "access_rules")
-    rule_query = await session.execute(
-        select(AccessRule)
-        .where(AccessRule.role_id == user.role_id)
-        .where(AccessRule.element_id == 2)
-    )
-    rule = rule_query.scalar_one_or_none()
+    rule = await load_rule(user.role_id, 2)
 
     if not rule:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="У вас нет прав на на данный функционал")
@@ -219,10 +222,80 @@ async def delete_role(
         if result is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"роли под id {del_role_id} не существует")
 
-        await session.execute(delete(Role).where(Role.id == del_role_id))
-        await session.commit()
-        return {"message": f"Роль под id {del_role_id} успешно удалена!"}
+        # Правила роли удаляются вместе с ней; участников сначала нужно перенести
+        await session.rollback()
+        await role_migration.delete_role(del_role_id)
+    except HTTPException:
+        raise
+    except role_migration.RoleInUseError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Роль под id {del_role_id} назначена пользователям: перенесите их через "
+                   f"POST /roles/{del_role_id}/reassign"
+        )
     except Exception as e:
-        return f"Что-то пошло не так: {e}"
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Что-то пошло не так: {e}")
+
+    table_versions.bump("roles")
+    table_versions.bump("access_rules")
+    response_cache.invalidate("roles")
+    response_cache.invalidate("access_rules")
+    return {"message": f"Роль под id {del_role_id} успешно удалена!"}
+
 
+@router.post("/{role_id}/reassign")
+async def reassign_role_users(
+    role_id: int,
+    data: RoleReassign,
+    session: session,
+    current_user: dict = Depends(get_current_user_id)
+):
+    """
+    Перенести всех пользователей роли в другую роль (и, по желанию, удалить исходную).
+
+    Перенос идёт пачками в отдельных коротких транзакциях; ход работы отдаётся
+    построчно в формате NDJSON, последняя строка содержит `"done": true`.
+    """
+    user = await load_principal(session, current_user["user_id"])
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Пользователь не найден или неактивен"
+        )
 
+    rule = await load_rule(user.role_id, 2)
+
+    if not rule or not rule.update_permission or (data.delete_source and not rule.delete_permission):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Вы не можете переносить пользователей между ролями")
+
+    if role_id == data.target_role_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Исходная и целевая роли совпадают")
+    found = set((await session.execute(
+        select(Role.id).where(Role.id.in_((role_id, data.target_role_id)))
+    )).scalars())
+    missing = sorted({role_id, data.target_role_id} - found)
+    if missing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"роли под id {missing[0]} не существует")
+    await session.rollback()  # Дальше каждая пачка — в своей транзакции
+
+    async def progress():
+        try:
+            async for step in role_migration.migrate_role(
+                role_id, data.target_role_id, data.delete_source, data.batch_size
+            ):
+                yield orjson.dumps(step) + b"\n"
+        except Exception as e:
+            # Статус 200 уже отправлен: ошибка сообщается последней строкой.
+            # Перенесённые пачки остаются перенесёнными, повторный вызов продолжит перенос
+            yield orjson.dumps({"error": str(e)}) + b"\n"
+            return
+        finally:
+            if data.delete_source:
+                table_versions.bump("roles")
+                table_versions.bump("access_rules")
+                response_cache.invalidate("roles")
+                response_cache.invalidate("access_rules")
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
@@ -1,71 +1,135 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, update
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy.exc import IntegrityError
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.schemas.user import UserCreate, UserLogin
-from app.backend.db_depends import get_session
-from app.models.user import User
-from .auth import bcrypt_context
+from app.schemas.user import (EffectivePermissions, ElementActions, UserCreate, UserRead,
+                              UserUpdateResponse)
+from app.backend.cache import response_cache
+from app.backend.db_depends import get_session, get_read_session
+from app.backend.permissions import PermissionCache, load_principal, permission_cache
+from app.backend.queries import ACTIVE_USER_BY_ID, UPDATE_ACTIVE_USER, user_values
+from app.backend.versions import etag_matches, table_versions
+from .auth import get_crypt_context
 
-from .auth import security, get_current_user_id
+from .auth import get_current_user_id
 
 router = APIRouter()
+permissions_adapter = TypeAdapter(EffectivePermissions)  # Сериализатор карты прав в JSON
+# Клиент держит карту прав минуту, затем перепроверяет по ETag (обычно 304)
+PERMISSIONS_CACHE_CONTROL = "private, max-age=60, must-revalidate"
 session = Annotated[
     AsyncSession, Depends(get_session)
 ]  # Аннотация типа для зависимости сессии
+read_session = Annotated[
+    AsyncSession, Depends(get_read_session)
+]  # Сессия для обработчиков только для чтения (реплика)
 
 
-@router.get("/me")
+@router.get("/me", response_model=UserRead)
 async def get_current_user(
-    session: session,
+    session: read_session,
     current_user: dict = Depends(get_current_user_id)
 ):
     """Получить информацию о текущем пользователе."""
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
+    user = await load_principal(session, current_user["user_id"])
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден или неактивен"
         )
 
-    return {
-        "id": user.id,
-        "email": user.email,
-        "first_name": user.first_name,
-        "last_name": user.last_name,
-    }
+    return UserRead(
+        id=user.id,
+        email=user.email,
+        first_name=user.first_name,
+        last_name=user.last_name,
+    )
 
-@router.put("/me")
-async def update_current_user(new_info: UserCreate, session: session,
+@router.get("/me/permissions", response_model=EffectivePermissions)
+async def get_current_user_permissions(
+    request: Request,
+    session: read_session,
     current_user: dict = Depends(get_current_user_id)
 ):
-    """Получить информацию о текущем пользователе."""
-    user_id = current_user["user_id"]
-    user = await session.scalar(select(User).where(User.id == int(user_id)))
-    if not user or not user.is_active:
+    """
+    Карта «бизнес-элемент -> доступные действия» для роли текущего пользователя.
+
+    Клиент запрашивает её один раз за сессию и скрывает недоступные действия сам.
+    ETag зависит от версий таблиц прав и роли пользователя.
+    """
+    user = await load_principal(session, current_user["user_id"])
+
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Вы ен можете поменять данные пользователя"
+            detail="Пользователь не найден или неактивен"
         )
 
-    update_query = update(User).values(
-        {
-            "email": new_info.email,
-            "hashed_password": bcrypt_context.hash(new_info.password1),
-            "first_name": new_info.first_name,
-            "last_name": new_info.last_name
-        }).where(User.id == int(user_id))
-    try:
-        await session.execute(update_query)
-        await session.commit()
-        await session.refresh(user)  # Обновляем объект после коммита
-        return {"Message": "Данные успешно изменены"}
+    etag = table_versions.etag(*PermissionCache.TABLES)[:-1] + f'-role.{user.role_id}"'
+    headers = {"ETag": etag, "Cache-Control": PERMISSIONS_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
+    # Карта одинакова для всех пользователей роли: готовые байты кэшируются по ETag
+    cache_key = ("permissions", etag)
+    payload = response_cache.get(cache_key)
+    if payload is None:
+        rules = await permission_cache.get_role_rules(user.role_id)
+        elements = permission_cache.elements
+        payload = permissions_adapter.dump_json(EffectivePermissions(
+            role_id=user.role_id,
+            role=permission_cache.roles.get(user.role_id),
+            permissions={
+                elements.get(element_id) or str(element_id): ElementActions(
+                    read=bool(rule and rule.read_permission),
+                    create=bool(rule and rule.create_permission),
+                    update=bool(rule and rule.update_permission),
+                    delete=bool(rule and rule.delete_permission),
+                )
+                for element_id, rule in rules.items()
+            },
+        ))
+        response_cache.put(cache_key, payload)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+@router.put("/me", response_model=UserUpdateResponse)
+async def update_current_user(new_info: UserCreate, session: session,
+    current_user: dict = Depends(get_current_user_id)
+):
+    """Обновить данные текущего пользователя одним запросом UPDATE ... RETURNING."""
+    user_id = current_user["user_id"]
+    params = user_values(
+        email=new_info.email,
+        hashed_password=get_crypt_context().hash(new_info.password1),
+        first_name=new_info.first_name,
+        last_name=new_info.last_name,
+    )
+    try:
+        result = await session.execute(UPDATE_ACTIVE_USER, {"user_id": int(user_id), **params})
+        updated_id = result.scalar_one_or_none()
+        if updated_id is not None:
+            await session.commit()
+    except IntegrityError:
+        # Email уже занят другим активным пользователем (ix_users_email_lower_active)
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Пользователь с таким email уже существует"
+        )
     except Exception as e:
-        return f"Что-то пошло не так: {e}"
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    if updated_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Вы ен можете поменять данные пользователя"
+        )
+    return {"Message": "Данные успешно изменены"}
 
 
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
@@ -74,9 +138,9 @@ async def delete_current_user(
     current_user: dict = Depends(get_current_user_id),
 ):
     user_id = current_user["user_id"]
-    user = await session.get(User, int(user_id))
+    user = await session.scalar(ACTIVE_USER_BY_ID, {"user_id": int(user_id)})
 
-    if not user or not user.is_active:
+    if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден или уже деактивирован")
 
     user.is_active = False
@@ -85,3 +149,4 @@ async def delete_current_user(
     except Exception as e:
         await session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
+    table_versions.bump("users")  # API-токены деактивированного пользователя перестают действовать
@@ -7,3 +7,15 @@ class AccessRuleCreate(BaseModel):
     create_permission: bool = False
     update_permission: bool = False
     delete_permission: bool = False
+
+
+class AccessRuleListItem(BaseModel):
+    id: int
+    role_id: int | None = None
+    element_id: int | None = None
+
+
+class AccessRuleRead(BaseModel):
+    id: int
+    rule_id: int | None = None
+    element_id: int | None = None
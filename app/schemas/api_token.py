@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class ApiTokenCreate(BaseModel):
+    name: str
+
+
+class ApiTokenCreated(BaseModel):
+    id: int
+    name: str
+    token: str  # Показывается один раз: в базе хранится только хеш
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class MessageResponse(BaseModel):
+    message: str
+
+
+class DetailResponse(BaseModel):
+    detail: str
@@ -0,0 +1,40 @@
+from pydantic import BaseModel
+
+
+class PolicyRole(BaseModel):
+    name: str
+    description: str | None = None
+
+
+class PolicyElement(BaseModel):
+    name: str
+    description: str | None = None
+
+
+class PolicyRule(BaseModel):
+    role: str  # Имя роли
+    element: str  # Имя бизнес-элемента
+    read_permission: bool = False
+    create_permission: bool = False
+    update_permission: bool = False
+    delete_permission: bool = False
+
+
+class Policy(BaseModel):
+    """Полное желаемое состояние: всё, чего здесь нет, удаляется."""
+    roles: list[PolicyRole]
+    elements: list[PolicyElement]
+    rules: list[PolicyRule]
+
+
+class PolicyChanges(BaseModel):
+    created: int
+    updated: int
+    deleted: int
+
+
+class PolicySyncResult(BaseModel):
+    dry_run: bool
+    roles: PolicyChanges
+    elements: PolicyChanges
+    rules: PolicyChanges
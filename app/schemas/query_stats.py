@@ -0,0 +1,27 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class QueryStat(BaseModel):
+    route: str  # Шаблон маршрута, например "GET /roles/{role_id}"
+    id: str  # Идентификатор отпечатка
+    fingerprint: str
+    calls: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+
+
+class SlowQuery(BaseModel):
+    id: str
+    route: str
+    ms: float
+    at: float  # Unix-время выполнения
+    statement: str
+
+
+class QueryPlan(BaseModel):
+    id: str
+    statement: str
+    plan: Any  # EXPLAIN (FORMAT JSON) PostgreSQL
@@ -1,5 +1,22 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class RoleCreate(BaseModel):
     name: str
     description: str | None = None
+
+
+class RoleListItem(BaseModel):
+    role_id: int
+    role_name: str | None = None
+
+
+class RoleRead(BaseModel):
+    id: int
+    name: str | None = None
+    descr: str | None = None
+
+
+class RoleReassign(BaseModel):
+    target_role_id: int
+    delete_source: bool = False  # Удалить исходную роль (и её правила) после переноса
+    batch_size: int = Field(default=5_000, ge=1, le=50_000)
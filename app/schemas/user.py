@@ -1,7 +1,17 @@
-from pydantic import BaseModel, EmailStr, model_validator
+from typing import Annotated
+
+from pydantic import AfterValidator, BaseModel, EmailStr, model_validator
+
+
+def normalize_email(email: str) -> str:
+    """Email хранится и ищется в нижнем регистре: Foo@x.com и foo@x.com — один адрес."""
+    return email.strip().lower()
+
+
+NormalizedEmail = Annotated[EmailStr, AfterValidator(normalize_email)]
 
 class UserCreate(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
     password1: str
     password2: str
     first_name: str
@@ -21,5 +31,38 @@ class UserCreate(BaseModel):
 
 
 class UserLogin(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
     password: str
+
+
+class UserRead(BaseModel):
+    id: int
+    email: str
+    first_name: str | None = None
+    last_name: str | None = None
+
+
+class RegisterResponse(BaseModel):
+    status_code: int
+    transaction: str
+
+
+class TokenResponse(BaseModel):
+    access_token: str
+
+
+class UserUpdateResponse(BaseModel):
+    Message: str
+
+
+class ElementActions(BaseModel):
+    read: bool
+    create: bool
+    update: bool
+    delete: bool
+
+
+class EffectivePermissions(BaseModel):
+    role_id: int | None = None
+    role: str | None = None
+    permissions: dict[str, ElementActions]  # Имя бизнес-элемента -> доступные действия
@@ -0,0 +1,253 @@
+"""
+Производственный запуск: мастер-процесс с pre-fork воркерами.
+
+Мастер импортирует приложение (и, по желанию, загружает данные авторизации), замораживает
+кучу сборщика мусора (`gc.freeze()`) и открывает слушающий сокет, после чего делает fork
+нужного числа воркеров. Импортированный код и данные остаются общими страницами
+copy-on-write, а каждый воркер — независимый процесс со своим event loop, своими движками
+и пулами соединений (shared-nothing), поэтому обработка запросов масштабируется по ядрам.
+
+Сигналы мастеру:
+    SIGTERM / SIGINT — плавная остановка: воркеры дорабатывают текущие запросы.
+    SIGHUP — плавный перезапуск: поднимаются новые воркеры, затем останавливаются старые.
+
+Упавший воркер автоматически заменяется новым. Если воркеры падают вскоре после запуска
+(например, база данных недоступна), пауза перед каждым следующим запуском удваивается,
+а после `MAX_FAST_FAILURES` таких падений подряд мастер останавливается с кодом 1 —
+перезапуск всего сервиса остаётся супервизору (systemd, Kubernetes).
+
+Запуск:
+    python -m app.serve --host 0.0.0.0 --port 8000 --workers 4
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+SHUTDOWN_TIMEOUT = 30.0  # Сколько ждать плавной остановки воркера перед SIGKILL
+FAST_FAILURE_WINDOW = 10.0  # Воркер, проживший меньше, считается упавшим при запуске
+RESPAWN_BACKOFF_MIN = 0.5  # Пауза перед перезапуском после первого быстрого падения, сек
+RESPAWN_BACKOFF_MAX = 30.0
+MAX_FAST_FAILURES = 8  # Быстрых падений подряд, после которых мастер сдаётся
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    :param argv: Аргументы командной строки (по умолчанию `sys.argv`).
+    :return: argparse.Namespace: Параметры запуска.
+    """
+    parser = argparse.ArgumentParser(description="AccessGuard: pre-fork сервер")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        help="Число воркеров (по умолчанию — число ядер)",
+    )
+    parser.add_argument(
+        "--preload-data",
+        action="store_true",
+        help="Загрузить кэш прав в мастере до fork, чтобы воркеры разделяли его страницы",
+    )
+    return parser.parse_args(argv)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """
+    Открывает слушающий сокет в мастере; воркеры наследуют его при fork.
+
+    :return: socket.socket: Сокет в режиме прослушивания.
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload(load_data: bool):
+    """
+    Импортирует приложение в мастере до fork.
+
+    :param load_data: Если True, заранее заполняет кэш прав из базы данных. Движки,
+                      открытые мастером, сбрасываются до fork.
+    :return: FastAPI: Собранное приложение.
+    """
+    from app.backend import db
+    from app.backend.permissions import permission_cache
+    from app.main import app
+
+    permission_cache.snapshot_path()  # Закрытый каталог снимка — один на всех воркеров
+
+    if load_data:
+        async def load():
+            await permission_cache.refresh()
+            await db.get_engine().dispose()
+
+        asyncio.run(load())
+        db.reset_engines()
+
+    # Всё созданное до этой точки больше не трогается сборщиком мусора в воркерах,
+    # и его страницы не копируются из-за записи счётчиков ссылок при обходе GC.
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def run_worker(app, sock: socket.socket) -> None:
+    """
+    Тело воркера после fork: свои движки, свой event loop, общий сокет.
+    """
+    from app.backend.db import reset_engines
+
+    for sig in (signal.SIGHUP, signal.SIGCHLD, signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, signal.SIG_DFL)
+    reset_engines()
+
+    config = uvicorn.Config(app, lifespan="on", timeout_graceful_shutdown=SHUTDOWN_TIMEOUT)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Master:
+    """
+    Мастер-процесс: порождает воркеров, следит за ними и обрабатывает сигналы.
+    """
+
+    def __init__(self, app, sock: socket.socket, workers: int):
+        self.app = app
+        self.sock = sock
+        self.workers = max(1, workers)
+        self.children: dict[int, float] = {}  # pid -> время запуска
+        self.retiring: dict[int, float] = {}  # pid -> время отправки SIGTERM
+        self.signals: list[int] = []
+        self.fast_failures = 0  # Быстрых падений подряд
+        self.respawn_at = 0.0  # Раньше этого момента (monotonic) упавших не заменяем
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        return pid
+
+    def retire(self, pids) -> None:
+        """Отправляет воркерам SIGTERM: uvicorn дорабатывает запросы и завершается."""
+        now = time.monotonic()
+        for pid in list(pids):
+            self.children.pop(pid, None)
+            self.retiring[pid] = now
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.retiring.pop(pid, None)
+
+    def reap(self) -> None:
+        """Собирает завершившихся воркеров и добивает зависших при остановке."""
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                break
+            started = self.children.pop(pid, None)
+            if started is not None:
+                self.record_exit(time.monotonic() - started)
+            self.retiring.pop(pid, None)
+
+        now = time.monotonic()
+        for pid, since in list(self.retiring.items()):
+            if now - since > SHUTDOWN_TIMEOUT:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    self.retiring.pop(pid, None)
+
+    def record_exit(self, lifetime: float) -> None:
+        """
+        Учитывает неожиданное завершение воркера (не по SIGTERM мастера).
+
+        :param lifetime: Сколько воркер проработал, сек. Короче `FAST_FAILURE_WINDOW` —
+                         быстрое падение: пауза до перезапуска удваивается с каждым подряд.
+        """
+        if lifetime >= FAST_FAILURE_WINDOW:
+            self.fast_failures = 0
+            self.respawn_at = 0.0
+            return
+        self.fast_failures += 1
+        backoff = min(RESPAWN_BACKOFF_MAX, RESPAWN_BACKOFF_MIN * 2 ** (self.fast_failures - 1))
+        self.respawn_at = time.monotonic() + backoff
+
+    def run(self) -> int:
+        """
+        :return: int: Код выхода мастера: 0 — остановлен сигналом, 1 — воркеры падают при запуске.
+        """
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, lambda signum, frame: self.signals.append(signum))
+
+        for _ in range(self.workers):
+            self.spawn()
+
+        stopping = False
+        code = 0
+        # Пока идёт пауза перед перезапуском, живых воркеров может не быть вовсе
+        while not stopping or self.children or self.retiring:
+            while self.signals:
+                signum = self.signals.pop(0)
+                if signum == signal.SIGHUP and not stopping:
+                    old = list(self.children)
+                    for _ in range(self.workers):
+                        self.spawn()
+                    self.retire(old)
+                elif signum in (signal.SIGTERM, signal.SIGINT):
+                    stopping = True
+                    self.retire(self.children)
+
+            self.reap()
+            if not stopping and self.fast_failures >= MAX_FAST_FAILURES:
+                print(
+                    f"AccessGuard: воркеры падают при запуске ({self.fast_failures} раз подряд), остановка",
+                    file=sys.stderr,
+                )
+                stopping = True
+                code = 1
+                self.retire(self.children)
+            now = time.monotonic()
+            if not stopping and now >= self.respawn_at:
+                # Заменяем упавших воркеров
+                for _ in range(self.workers - len(self.children)):
+                    self.spawn()
+                if self.fast_failures and all(
+                    now - started >= FAST_FAILURE_WINDOW for started in self.children.values()
+                ):
+                    self.fast_failures = 0  # Замены прижились
+            time.sleep(0.2)
+        return code
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    app = preload(args.preload_data)
+    sock = bind_socket(args.host, args.port)
+    print(f"AccessGuard: мастер {os.getpid()}, воркеров: {args.workers}, {args.host}:{args.port}", file=sys.stderr)
+    sys.exit(Master(app, sock, args.workers).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Синхронизация политики доступа из файла.
+
+Отправляет полное желаемое состояние (JSON по схеме `app.schemas.policy.Policy`) в
+`PUT /policy/` работающего сервиса. Именно сервис применяет изменения: так после
+синхронизации версии таблиц увеличиваются во всех воркерах и кэши прав сбрасываются.
+Аутентификация — API-токеном администратора политики.
+
+Запуск:
+    python -m app.sync_policy policy.json --url http://localhost:8000 --token ag_... [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="AccessGuard: синхронизация политики доступа")
+    parser.add_argument("policy", help="JSON-файл с ролями, бизнес-элементами и правилами")
+    parser.add_argument("--url", default=os.getenv("ACCESSGUARD_URL", "http://localhost:8000"))
+    parser.add_argument("--token", default=os.getenv("ACCESSGUARD_TOKEN"), help="API-токен (ag_...)")
+    parser.add_argument("--dry-run", action="store_true", help="Только показать сводку изменений")
+    return parser.parse_args(argv)
+
+
+def sync(url: str, token: str, policy: bytes, dry_run: bool) -> dict:
+    """
+    :return: dict: Сводка изменений от сервиса.
+    :raises urllib.error.HTTPError: Сервис отклонил политику.
+    """
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/policy/?dry_run={'true' if dry_run else 'false'}",
+        data=policy,
+        method="PUT",
+        headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if not args.token:
+        print("Нужен API-токен: --token или ACCESSGUARD_TOKEN", file=sys.stderr)
+        return 2
+    with open(args.policy, "rb") as f:
+        policy = f.read()
+    try:
+        result = sync(args.url, args.token, policy, args.dry_run)
+    except urllib.error.HTTPError as e:
+        print(f"{e.code}: {e.read().decode(errors='replace')}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Бенчмарк сжатия ответов (`CompressionMiddleware`).
+
+Для списков ролей и правил доступа (`GET /roles/`, `GET /access-rules/`) разного размера
+показывает байты «на проводе» без сжатия и с каждым доступным кодеком, степень сжатия
+и затраты CPU на один ответ. Маленькие тела показывают, почему ответы меньше порога
+(`minimum_size`) не сжимаются: выигрыш — десятки байт, а заголовки и CPU — не бесплатны.
+Тела строятся так же, как в обработчиках (модели ответа -> orjson); база данных
+и HTTP не используются.
+
+Запуск:
+    python -m benchmarks.bench_compression
+"""
+
+import time
+
+import orjson
+from pydantic import TypeAdapter
+
+from app.backend.compression import ENCODERS
+from app.schemas.access_rule import AccessRuleListItem
+from app.schemas.role import RoleListItem
+
+SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+REPEATS = 5
+
+
+def build_bodies(size: int) -> dict[str, bytes]:
+    """Тела ответов списков ролей и правил из `size` строк."""
+    roles = [RoleListItem(role_id=i, role_name=f"role_{i}") for i in range(size)]
+    rules = [AccessRuleListItem(id=i, role_id=i % 50, element_id=i % 7) for i in range(size)]
+    return {
+        "/roles/": orjson.dumps(TypeAdapter(list[RoleListItem]).dump_python(roles)),
+        "/access-rules/": orjson.dumps(TypeAdapter(list[AccessRuleListItem]).dump_python(rules)),
+    }
+
+
+def measure(encoder, body: bytes) -> tuple[int, float]:
+    """Возвращает размер сжатого тела и лучшее время CPU (мс) из REPEATS сжатий."""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.process_time()
+        compressed = encoder().finish(body)
+        best = min(best, time.process_time() - start)
+    return len(compressed), best * 1000
+
+
+def main() -> None:
+    header = f"{'endpoint':<16}{'rows':>8}{'raw, B':>12}"
+    for name in ENCODERS:
+        header += f"{name + ', B':>12}{'ratio':>8}{'CPU, ms':>10}"
+    print(header)
+    for size in SIZES:
+        for path, body in build_bodies(size).items():
+            line = f"{path:<16}{size:>8}{len(body):>12}"
+            for encoder in ENCODERS.values():
+                compressed, cpu = measure(encoder, body)
+                line += f"{compressed:>12}{len(body) / compressed:>8.1f}{cpu:>10.3f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Бенчмарк сериализации списочных ответов (`GET /roles/`, `GET /access-rules/`).
+
+Сравнивает прежний путь (список словарей -> `jsonable_encoder` -> стандартный `json`)
+с текущим (типизированные модели ответа -> pydantic-core -> orjson) на 1k/10k/100k строк.
+База данных не используется: обработчики отдают заранее подготовленные строки,
+поэтому измеряется только стоимость построения и сериализации ответа.
+
+Запуск:
+    python -m benchmarks.bench_serialization
+"""
+
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.testclient import TestClient
+
+from app.schemas.access_rule import AccessRuleListItem
+from app.schemas.role import RoleListItem
+
+SIZES = (1_000, 10_000, 100_000)
+REPEATS = 5
+
+
+def build_apps(size: int) -> tuple[FastAPI, FastAPI]:
+    """Создаёт приложения со старым и новым способом отдачи списков."""
+    roles = [(i, f"role_{i}") for i in range(size)]
+    rules = [(i, i % 50, i % 7) for i in range(size)]
+
+    legacy = FastAPI(default_response_class=JSONResponse)
+
+    @legacy.get("/roles/")
+    async def legacy_roles():
+        return [{"role_id": role_id, "role_name": name} for role_id, name in roles]
+
+    @legacy.get("/access-rules/")
+    async def legacy_rules():
+        return [
+            {"id": rule_id, "role_id": role_id, "element_id": element_id}
+            for rule_id, role_id, element_id in rules
+        ]
+
+    typed = FastAPI(default_response_class=ORJSONResponse)
+
+    @typed.get("/roles/", response_model=list[RoleListItem])
+    async def typed_roles():
+        return [RoleListItem(role_id=role_id, role_name=name) for role_id, name in roles]
+
+    @typed.get("/access-rules/", response_model=list[AccessRuleListItem])
+    async def typed_rules():
+        return [
+            AccessRuleListItem(id=rule_id, role_id=role_id, element_id=element_id)
+            for rule_id, role_id, element_id in rules
+        ]
+
+    return legacy, typed
+
+
+def measure(client: TestClient, path: str) -> float:
+    """Возвращает лучшее время ответа (мс) из REPEATS запросов."""
+    client.get(path)  # Прогрев
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        response = client.get(path)
+        best = min(best, time.perf_counter() - start)
+        assert response.status_code == 200
+    return best * 1000
+
+
+def main() -> None:
+    print(f"{'endpoint':<16}{'rows':>8}{'legacy, ms':>14}{'typed+orjson, ms':>20}{'speedup':>10}")
+    for size in SIZES:
+        legacy, typed = build_apps(size)
+        with TestClient(legacy) as legacy_client, TestClient(typed) as typed_client:
+            for path in ("/roles/", "/access-rules/"):
+                old = measure(legacy_client, path)
+                new = measure(typed_client, path)
+                print(f"{path:<16}{size:>8}{old:>14.1f}{new:>20.1f}{old / new:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Бенчмарк накладных расходов на «горячие» запросы: построение на каждый вызов
+против заранее построенного выражения с `bindparam` (`app.backend.queries`).
+
+Используется SQLite в памяти, чтобы время выполнения самого запроса было минимальным
+и в измерении доминировали построение конструкции, вычисление ключа кэша и поиск
+в кэше компиляции SQLAlchemy — то есть ровно та часть, которую экономит предпостроение.
+
+Запуск:
+    python -m benchmarks.bench_statements
+"""
+
+import time
+
+from sqlalchemy import create_engine, event, insert, select
+
+from app.backend.queries import ACTIVE_USER_BY_EMAIL, ACTIVE_USER_BY_ID
+from app.backend.statement_cache import StatementCacheStats
+from app.models.access_rule import Base
+from app.models.user import User
+
+CALLS = 20_000
+
+
+def per_call_us(conn, run) -> float:
+    """Возвращает среднее время одного вызова в микросекундах."""
+    for i in range(500):  # Прогрев кэшей
+        run(conn, i)
+    start = time.perf_counter()
+    for i in range(CALLS):
+        run(conn, i)
+    return (time.perf_counter() - start) / CALLS * 1_000_000
+
+
+def main() -> None:
+    engine = create_engine("sqlite://")
+    stats = StatementCacheStats()
+    event.listen(engine, "after_cursor_execute", stats.record)
+    Base.metadata.create_all(engine)
+
+    cases = {
+        "user by id": (
+            lambda conn, i: conn.execute(
+                select(User).where(User.is_active).where(User.id == i % 100)
+            ).first(),
+            lambda conn, i: conn.execute(ACTIVE_USER_BY_ID, {"user_id": i % 100}).first(),
+        ),
+        "user by email": (
+            lambda conn, i: conn.execute(
+                select(User).where(User.is_active).where(User.email == f"user{i % 100}@example.com")
+            ).first(),
+            lambda conn, i: conn.execute(
+                ACTIVE_USER_BY_EMAIL, {"email": f"user{i % 100}@example.com"}
+            ).first(),
+        ),
+    }
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"email": f"user{i}@example.com", "is_active": True, "role_id": None} for i in range(100)
+        ])
+
+    print(f"{'query':<16}{'rebuilt, us':>14}{'prebuilt, us':>15}{'saved':>10}")
+    with engine.connect() as conn:
+        for name, (rebuilt, prebuilt) in cases.items():
+            old = per_call_us(conn, rebuilt)
+            new = per_call_us(conn, prebuilt)
+            print(f"{name:<16}{old:>14.1f}{new:>15.1f}{(old - new) / old:>9.0%}")
+
+    print(f"Кэш компиляции: {stats.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Бенчмарк времени импорта приложения на основе `python -X importtime`.
+
+Импортирует модуль (по умолчанию `app.main`) в чистом подпроцессе несколько раз, берёт
+медиану суммарного времени и выводит самые дорогие модули. Результаты сравниваются
+с базовой линией в `benchmarks/import_time_baseline.json`; флаг `--update` перезаписывает её.
+
+Запуск:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --update
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASELINE = Path(__file__).with_name("import_time_baseline.json")
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure_once(module: str) -> dict[str, int]:
+    """
+    Импортирует модуль в новом интерпретаторе.
+
+    :param module: Имя импортируемого модуля.
+    :return: dict[str, int]: Накопленное время импорта (мкс) по каждому модулю.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line.removeprefix("import time:").split("|"))
+        timings[name] = int(cumulative)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--update", action="store_true", help="перезаписать базовую линию")
+    args = parser.parse_args()
+
+    runs = [measure_once(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(run[args.module] for run in runs) / 1000
+    heaviest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)[: args.top]
+
+    print(f"{args.module}: {total_ms:.1f} ms (медиана из {args.runs})")
+    for name, cumulative in heaviest:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if BASELINE.exists():
+        baseline = json.loads(BASELINE.read_text(encoding="utf-8"))
+        if baseline.get("module") == args.module:
+            delta = total_ms - baseline["total_ms"]
+            print(f"Базовая линия: {baseline['total_ms']:.1f} ms, разница: {delta:+.1f} ms")
+
+    if args.update:
+        BASELINE.write_text(json.dumps({
+            "module": args.module,
+            "total_ms": round(total_ms, 1),
+            "python": sys.version.split()[0],
+            "heaviest": {name: round(cumulative / 1000, 1) for name, cumulative in heaviest},
+        }, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Базовая линия обновлена: {BASELINE.name}")
+
+
+if __name__ == "__main__":
+    main()
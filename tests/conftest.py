@@ -0,0 +1,204 @@
+"""
+Фикстуры интеграционных тестов на настоящей базе данных.
+
+Схема создаётся один раз на сессию pytest: в PostgreSQL, если задан `TEST_DATABASE_URL`
+(`postgresql+asyncpg://...`), иначе — в SQLite в памяти (aiosqlite) как замена.
+Каждый тест работает внутри внешней транзакции соединения: сессии приложения фиксируют
+лишь SAVEPOINT (`join_transaction_mode="create_savepoint"`), а после теста внешняя
+транзакция откатывается — таблицы не пересоздаются и не очищаются.
+
+aiosqlite и pytest-xdist входят в группу зависимостей dev (`poetry install --with dev`).
+
+Параллельный запуск: `pytest -n auto` (pytest-xdist). Каждый процесс получает свою схему
+PostgreSQL `accessguard_test_<worker>` (или свою базу SQLite в памяти), так что тесты
+разных процессов не видят данных друг друга.
+
+Тесты, не запрашивающие эти фикстуры, по-прежнему работают на моках и базу не трогают;
+для них же здесь фабрика `client_as` — клиент от имени пользователя с подменённым снимком прав.
+"""
+
+import os
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.backend import db, permissions
+from app.backend.cache import response_cache
+from app.backend.db_depends import get_read_session, get_session
+from app.backend.permissions import Principal, permission_cache
+from app.backend.snapshot import PermissionSnapshot, compile_snapshot
+from app.backend.versions import table_versions
+from app.models.access_rule import AccessRule, Base
+from app.models.business_element import BusinessElement
+from app.models.role import Role
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+WORKER = os.getenv("PYTEST_XDIST_WORKER", "main")  # gw0, gw1, ... под pytest-xdist
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "integration: тест на настоящей базе данных (фикстура db_session)")
+
+
+def _create_engine():
+    if TEST_DATABASE_URL:
+        schema = f"accessguard_test_{WORKER}"
+        engine = create_async_engine(
+            TEST_DATABASE_URL, connect_args={"server_settings": {"search_path": schema}},
+        )
+        return engine, schema
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    # pysqlite сам начинает и завершает транзакции и ломает SAVEPOINT:
+    # отключаем это и отправляем BEGIN явно
+    @event.listens_for(engine.sync_engine, "connect")
+    def _autocommit(dbapi_connection, _record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    return engine, None
+
+
+def _seed():
+    """
+    Справочные данные, которые в рабочей базе заводятся при развёртывании.
+
+    Этапы вставляются по очереди: у моделей нет relationship, поэтому порядок вставки
+    по внешним ключам (их проверяет PostgreSQL, но не SQLite) задаётся здесь.
+    """
+    return [
+        [
+            Role(id=1, name="admin"),
+            Role(id=2, name="user"),
+            BusinessElement(id=1, name="users"),
+            BusinessElement(id=2, name="roles"),
+            BusinessElement(id=3, name="rule"),
+        ],
+        [
+            *(
+                AccessRule(role_id=1, element_id=element_id, read_permission=True, create_permission=True,
+                           update_permission=True, delete_permission=True)
+                for element_id in (1, 2, 3)
+            ),
+            AccessRule(role_id=2, element_id=1, read_permission=True),
+            AccessRule(role_id=2, element_id=2, read_permission=True),
+        ],
+    ]
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def db_engine(tmp_path_factory):
+    """Движок тестовой базы со схемой и справочными данными (один раз на процесс)."""
+    engine, schema = _create_engine()
+    async with engine.begin() as conn:
+        if schema:
+            await conn.execute(text(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE'))
+            await conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(bind=engine)
+    async with factory() as ss:
+        for stage in _seed():
+            ss.add_all(stage)
+            await ss.flush()
+        if schema:
+            # Явные id не сдвигают последовательности PostgreSQL: следующая вставка
+            # без id получила бы уже занятый ключ
+            for table in ("roles", "business_elements"):
+                await ss.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+                ))
+        await ss.commit()
+    permission_cache.path = str(tmp_path_factory.mktemp("permissions") / "snapshot.bin")
+    yield engine
+    if schema:
+        async with engine.begin() as conn:
+            await conn.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def db_session(db_engine, mocker):
+    """
+    Сессия теста внутри транзакции, откатываемой после теста.
+
+    Фабрики сессий приложения подменяются фабрикой на том же соединении, поэтому
+    обработчики, фоновые загрузчики и сам тест видят одни и те же данные.
+    """
+    async with db_engine.connect() as conn:
+        outer = await conn.begin()
+        factory = async_sessionmaker(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False)
+        mocker.patch.object(db, "get_session_factory", return_value=factory)
+        mocker.patch.object(db, "get_read_session_factory", return_value=factory)
+        async with factory() as ss:
+            yield ss
+        await outer.rollback()
+    # Откат не меняет версий таблиц: сбрасываем всё, что закэшировано по ним
+    for table in Base.metadata.tables:
+        table_versions.bump(table)
+    response_cache.clear()
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def client(db_session):
+    """HTTP-клиент приложения, чьи зависимости сессий работают в транзакции теста."""
+    from app.main import app
+
+    factory = db.get_session_factory()
+
+    async def override_session():
+        async with factory() as ss:
+            yield ss
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_read_session] = override_session
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+            yield http
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client_as(mocker):
+    """
+    Фабрика клиентов без базы: `client_as(rules=..., elements=...)` подменяет снимок прав
+    и возвращает `make(role_id)` — клиент от имени пользователя 5 с этой ролью.
+
+    Роли в снимке фиксированы: 1 — admin, 2 — user.
+    """
+    from app.main import app
+    from app.routers.auth import get_current_user_id
+
+    def factory(*, rules, elements):
+        snapshot = PermissionSnapshot(compile_snapshot(
+            table_versions.epoch,
+            permission_cache._current_versions(),
+            rules=rules,
+            roles=[(1, "admin"), (2, "user")],
+            elements=elements,
+        ))
+        mocker.patch.object(permission_cache, "snapshot", snapshot)
+
+        def make(role_id: int):
+            principal = Principal(id=5, email="a@b.c", first_name=None, last_name=None, role_id=role_id)
+            mocker.patch.object(permissions.flights, "do", AsyncMock(return_value=principal))
+            return TestClient(app)
+
+        return make
+
+    async def override_session():
+        yield AsyncMock()
+
+    app.dependency_overrides[get_read_session] = override_session
+    app.dependency_overrides[get_current_user_id] = lambda: {"user_id": "5"}
+    yield factory
+    app.dependency_overrides.clear()
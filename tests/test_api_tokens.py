@@ -0,0 +1,83 @@
+"""
+Тесты непрозрачных API-токенов.
+
+Проверяют хранение только хеша, кэширование положительных и отрицательных
+результатов проверки, сброс кэша при выпуске/отзыве токена и приём токена
+из заголовка `Authorization`.
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.backend import api_tokens
+from app.backend.api_tokens import TokenVerifier, generate_token, hash_token, is_api_token
+from app.backend.versions import table_versions
+from app.routers.auth import get_current_user_id
+
+
+@pytest.fixture
+def owner_lookup(mocker):
+    """Подменяет запрос владельца токена: известен только токен "ag_known" пользователя 7."""
+    known = hash_token("ag_known")
+    ss = MagicMock(sync_session=Session())  # Настоящая: на неё подписывается statement_timeout
+    ss.scalar = AsyncMock(side_effect=lambda query, params: 7 if params["token_hash"] == known else None)
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=ss)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    mocker.patch.object(api_tokens.db, "get_session_factory", return_value=factory)
+    return ss
+
+
+def test_token_format_and_hash():
+    token = generate_token()
+    assert is_api_token(token)
+    assert len(hash_token(token)) == 64
+    assert hash_token(token) != token
+
+
+@pytest.mark.asyncio
+async def test_verify_caches_positive_and_negative_results(owner_lookup):
+    verifier = TokenVerifier()
+
+    assert await verifier.verify("ag_known") == 7
+    assert await verifier.verify("ag_known") == 7
+    assert await verifier.verify("ag_unknown") is None
+    assert await verifier.verify("ag_unknown") is None
+
+    assert owner_lookup.scalar.await_count == 2
+    stats = verifier.stats()
+    assert stats["hits"] == 1
+    assert stats["negative_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_token_table_write_clears_cache(owner_lookup):
+    """Выпуск или отзыв токена (в любом воркере) сбрасывает кэш проверок."""
+    verifier = TokenVerifier()
+    await verifier.verify("ag_known")
+
+    table_versions.bump("api_tokens")
+    await verifier.verify("ag_known")
+
+    assert owner_lookup.scalar.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_current_user_from_authorization_header(mocker):
+    mocker.patch.object(api_tokens.token_verifier, "verify", AsyncMock(return_value=7))
+    request = MagicMock(headers={"authorization": "Bearer ag_known"}, cookies={})
+
+    assert await get_current_user_id(request) == {"user_id": "7"}
+
+
+@pytest.mark.asyncio
+async def test_invalid_api_token_is_rejected(mocker):
+    mocker.patch.object(api_tokens.token_verifier, "verify", AsyncMock(return_value=None))
+    request = MagicMock(headers={"authorization": "Bearer ag_revoked"}, cookies={})
+
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user_id(request)
+    assert exc.value.status_code == 401
@@ -63,13 +63,14 @@ async def test_register_success(mocker):
 
     Asserts:
         - Функция должна вернуть статус 201 и сообщение об успешной регистрации
-        - Должен быть вызван метод execute для добавления пользователя
+        - Должен быть вызван ровно один execute (INSERT ... ON CONFLICT ... RETURNING)
         - Должен быть вызван метод commit для сохранения изменений
     """
-    # Создаем мок для сессии
+    # Создаем мок для сессии: INSERT ... RETURNING вернул id нового пользователя
     mock_session = AsyncMock()
-    mock_session.scalar.return_value = None
-    mock_session.execute.return_value = AsyncMock()
+    mock_session.execute.return_value = MagicMock(
+        scalar_one_or_none=MagicMock(return_value=1)
+    )
     mock_session.commit = AsyncMock()
     mock_session.rollback = AsyncMock
 
@@ -94,6 +95,7 @@ async def test_register_success(mocker):
         "transaction": "Успешная регистрация",
     }
     mock_session.execute.assert_awaited_once()
+    mock_session.scalar.assert_not_awaited()
     mock_session.commit.assert_awaited_once()
 
 
@@ -111,10 +113,13 @@ async def test_register_user_exists(mocker):
     Asserts:
         - Должно быть выброшено исключение HTTPException с кодом 409
         - Сообщение об ошибке должно содержать информацию о существующем email
+        - Транзакция не должна фиксироваться
     """
-    # Создаем мок для сессии
+    # Создаем мок для сессии: ON CONFLICT DO NOTHING, RETURNING ничего не вернул
     mock_session = AsyncMock()
-    mock_session.scalar.return_value = MagicMock(id=1)
+    mock_session.execute.return_value = MagicMock(
+        scalar_one_or_none=MagicMock(return_value=None)
+    )
 
     # Мокаем is_authenticated
     mocker.patch("app.routers.auth.is_authenticated", return_value=False)
@@ -134,6 +139,8 @@ async def test_register_user_exists(mocker):
 
     assert excinfo.value.status_code == status.HTTP_409_CONFLICT
     assert "Пользователь с таким email уже существует" in str(excinfo.value.detail)
+    mock_session.execute.assert_awaited_once()
+    mock_session.commit.assert_not_awaited()
 
 
 @pytest.mark.asyncio
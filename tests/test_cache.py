@@ -0,0 +1,59 @@
+"""
+Тесты кэша сериализованных ответов.
+
+Проверяют LRU-вытеснение по числу записей и по размеру, инвалидацию
+по эндпоинту и показатели, отдаваемые в `GET /metrics`.
+"""
+
+from fastapi.testclient import TestClient
+
+from app.backend.cache import ResponseCache
+from app.main import app
+
+
+def test_lru_eviction_by_entries():
+    """При превышении числа записей вытесняется давно не использованная."""
+    cache = ResponseCache(max_entries=2)
+    cache.put(("roles", "v1", ""), b"a")
+    cache.put(("roles", "v1", "page=2"), b"b")
+    cache.get(("roles", "v1", ""))  # Запись становится самой свежей
+    cache.put(("access_rules", "v1", ""), b"c")
+
+    assert cache.get(("roles", "v1", "")) == b"a"
+    assert cache.get(("roles", "v1", "page=2")) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_by_size_and_oversized_payload():
+    """Суммарный размер не превышает лимит, слишком большие ответы не кэшируются."""
+    cache = ResponseCache(max_bytes=10)
+    cache.put(("roles", "v1", ""), b"12345678")
+    cache.put(("roles", "v2", ""), b"1234")
+    cache.put(("roles", "v3", ""), b"x" * 11)
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] == 4
+    assert cache.get(("roles", "v3", "")) is None
+
+
+def test_invalidate_endpoint_and_hit_ratio():
+    """Инвалидация удаляет только записи эндпоинта; доля попаданий считается верно."""
+    cache = ResponseCache()
+    cache.put(("roles", "v1", ""), b"roles")
+    cache.put(("access_rules", "v1", ""), b"rules")
+
+    cache.invalidate("roles")
+
+    assert cache.get(("roles", "v1", "")) is None
+    assert cache.get(("access_rules", "v1", "")) == b"rules"
+    assert cache.stats()["hit_ratio"] == 0.5
+    assert cache.stats()["bytes"] == len(b"rules")
+
+
+def test_metrics_endpoint_exposes_cache_stats():
+    """Показатели кэша доступны в `GET /metrics`."""
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert {"hit_ratio", "bytes", "entries"} <= response.json()["response_cache"].keys()
@@ -0,0 +1,77 @@
+"""
+Тесты маршрутизации сессий между основным сервером и репликой.
+
+Проверяют, что обработчики чтения получают сессию реплики, а в окне
+read-your-writes после собственной записи пользователя — сессию основного сервера.
+"""
+
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from starlette.requests import Request
+
+from app.backend import db_depends
+
+
+def _request(cookies: dict | None = None) -> Request:
+    header = "; ".join(f"{name}={value}" for name, value in (cookies or {}).items())
+    headers = [(b"cookie", header.encode())] if header else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def _factory() -> tuple[MagicMock, AsyncMock]:
+    """Фабрика сессий и сессия, которую она выдаёт."""
+    ss = AsyncMock()
+    ctx = MagicMock()
+    ctx.__aenter__ = AsyncMock(return_value=ss)
+    ctx.__aexit__ = AsyncMock(return_value=False)
+    return MagicMock(return_value=ctx), ss
+
+
+async def _resolve(request: Request):
+    gen = db_depends.get_read_session(request)
+    ss = await gen.__anext__()
+    await gen.aclose()
+    return ss
+
+
+@pytest.mark.asyncio
+async def test_read_session_uses_replica_by_default(mocker):
+    """Без cookie записи чтение идёт на реплику."""
+    primary, primary_ss = _factory()
+    replica, replica_ss = _factory()
+    mocker.patch.object(db_depends, "get_session_factory", return_value=primary)
+    mocker.patch.object(db_depends, "get_read_session_factory", return_value=replica)
+
+    ss = await _resolve(_request())
+
+    assert ss is replica_ss
+
+
+@pytest.mark.asyncio
+async def test_read_session_uses_primary_after_own_write(mocker):
+    """В окне read-your-writes чтение идёт на основной сервер."""
+    primary, primary_ss = _factory()
+    replica, replica_ss = _factory()
+    mocker.patch.object(db_depends, "get_session_factory", return_value=primary)
+    mocker.patch.object(db_depends, "get_read_session_factory", return_value=replica)
+
+    ss = await _resolve(_request({db_depends.RW_COOKIE_NAME: str(time.time() + 5)}))
+
+    assert ss is primary_ss
+
+
+@pytest.mark.asyncio
+async def test_read_session_ignores_expired_or_broken_cookie(mocker):
+    """Истёкшее или испорченное значение cookie не влияет на маршрутизацию."""
+    primary, primary_ss = _factory()
+    replica, replica_ss = _factory()
+    mocker.patch.object(db_depends, "get_session_factory", return_value=primary)
+    mocker.patch.object(db_depends, "get_read_session_factory", return_value=replica)
+
+    expired = await _resolve(_request({db_depends.RW_COOKIE_NAME: str(time.time() - 1)}))
+    broken = await _resolve(_request({db_depends.RW_COOKIE_NAME: "garbage"}))
+
+    assert expired is replica_ss
+    assert broken is replica_ss
@@ -0,0 +1,121 @@
+"""
+Тесты дедлайнов запросов и отмены обработчика при отключении клиента.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend import api_tokens, deadline
+from app.backend.middleware import DeadlineMiddleware
+
+
+def make_app(state: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        state["timeout_ms"] = deadline.statement_timeout_ms()
+        try:
+            await asyncio.sleep(2)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+        return {"ok": True}
+
+    @app.get("/budget")
+    @app.get("/fast")
+    async def fast():
+        return {"timeout_ms": deadline.statement_timeout_ms()}
+
+    app.add_middleware(
+        DeadlineMiddleware, default=0.1, routes=[(r"^/fast", None), (r"^/budget", 1.0)],
+    )
+    return app
+
+
+def test_expired_budget_cancels_handler_with_504():
+    state = {}
+    response = TestClient(make_app(state)).get("/slow")
+
+    assert response.status_code == 504
+    assert state["cancelled"] is True
+    assert 0 < state["timeout_ms"] <= 100  # statement_timeout не больше бюджета
+
+
+def test_header_only_shortens_the_route_budget():
+    client = TestClient(make_app({}))
+
+    def timeout_ms(path, header=None):
+        headers = {"X-Request-Timeout": header} if header is not None else {}
+        return client.get(path, headers=headers).json()["timeout_ms"]
+
+    assert 900 < timeout_ms("/budget") <= 1000
+    assert 150 < timeout_ms("/budget", "0.2") <= 200
+    assert 900 < timeout_ms("/budget", "100") <= 1000  # Не больше бюджета маршрута
+    for value in ("nan", "inf", "-inf", "abc"):
+        assert 900 < timeout_ms("/budget", value) <= 1000  # Некорректное значение игнорируется
+    assert timeout_ms("/fast") is None
+    assert timeout_ms("/fast", "5") is None  # Маршруту без дедлайна заголовок его не назначает
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_handler():
+    state = {}
+    app = make_app(state)
+    sent = []
+
+    async def receive():
+        if not sent:
+            sent.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(0.02)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/slow", "raw_path": b"/slow", "root_path": "",
+        "query_string": b"", "headers": [(b"x-request-timeout", b"1")], "server": ("t", 80),
+        "client": ("c", 1),
+    }
+    started = time.monotonic()
+    await app(scope, receive, send)
+
+    assert time.monotonic() - started < 0.5
+    assert state["cancelled"] is True
+    assert len(sent) == 1  # Ответ отключившемуся клиенту не отправлялся
+
+
+def test_loader_sessions_get_a_fixed_statement_timeout():
+    """Общая загрузка ограничена потолком, даже если у вызывающего запроса дедлайна нет."""
+    session = AsyncSession()
+    deadline.apply_loader_timeout(session)
+    connection = MagicMock()
+    connection.dialect.name = "postgresql"
+
+    session.sync_session.dispatch.after_begin(session.sync_session, None, connection)
+
+    connection.exec_driver_sql.assert_called_once_with(
+        f"SET LOCAL statement_timeout = {deadline.LOADER_STATEMENT_TIMEOUT_MS}"
+    )
+
+
+@pytest.mark.asyncio
+async def test_api_token_loader_applies_timeout(mocker):
+    applied = mocker.patch.object(api_tokens, "apply_loader_timeout")
+    ss = MagicMock(scalar=AsyncMock(return_value=7))
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=ss)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    mocker.patch.object(api_tokens.db, "get_session_factory", return_value=factory)
+
+    assert await api_tokens.TokenVerifier().verify("ag_loader-test") == 7
+    applied.assert_called_once_with(ss)
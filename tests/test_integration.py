@@ -0,0 +1,75 @@
+"""
+Интеграционные тесты: полный путь запроса через приложение до настоящей базы данных.
+
+Работают на фикстурах `tests/conftest.py`: схема создаётся один раз, каждый тест
+откатывается. По умолчанию — SQLite в памяти; с `TEST_DATABASE_URL` — PostgreSQL.
+"""
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models.role import Role
+from app.models.user import User
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio(loop_scope="session")]
+
+PASSWORD = "s3cret-pass"
+
+
+async def register_and_login(client, email: str) -> str:
+    registered = await client.post("/auth/register", json={
+        "email": email, "password1": PASSWORD, "password2": PASSWORD,
+        "first_name": "Ann", "last_name": "Lee",
+    })
+    assert registered.status_code == 200, registered.text
+    login = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+    assert login.status_code == 200, login.text
+    client.cookies.clear()  # Дальше — только по Bearer-токену
+    return login.json()["access_token"]
+
+
+async def test_register_login_and_read_own_permissions(client):
+    token = await register_and_login(client, "Ann@Example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    me = await client.get("/users/me", headers=headers)
+    assert me.json()["email"] == "ann@example.com"
+
+    permissions = await client.get("/users/me/permissions", headers=headers)
+    assert permissions.status_code == 200
+    assert permissions.json()["role"] == "user"
+    assert permissions.json()["permissions"]["roles"]["read"] is True
+    assert permissions.json()["permissions"]["roles"]["create"] is False
+
+    again = await client.get(
+        "/users/me/permissions", headers={**headers, "If-None-Match": permissions.headers["etag"]}
+    )
+    assert again.status_code == 304
+
+
+async def test_email_is_unique_regardless_of_case(client):
+    await register_and_login(client, "bob@example.com")
+    duplicate = await client.post("/auth/register", json={
+        "email": "BOB@example.com", "password1": PASSWORD, "password2": PASSWORD,
+        "first_name": "Bob", "last_name": "Ray",
+    })
+    assert duplicate.status_code == 409
+
+
+async def test_admin_creates_role_visible_in_list(client, db_session):
+    token = await register_and_login(client, "root@example.com")
+    user = await db_session.scalar(select(User).where(User.email == "root@example.com"))
+    user.role_id = 1
+    await db_session.commit()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    created = await client.post("/roles/", json={"name": "auditor"}, headers=headers)
+    assert created.status_code < 300, created.text
+    roles = await client.get("/roles/", headers=headers)
+    assert "auditor" in [role["role_name"] for role in roles.json()]
+
+
+async def test_each_test_starts_from_clean_state(db_session):
+    """Пользователи и роли предыдущих тестов откатились, справочные данные на месте."""
+    assert await db_session.scalar(select(func.count()).select_from(User)) == 0
+    assert await db_session.scalar(select(func.count()).select_from(Role)) == 2
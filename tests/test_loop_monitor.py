@@ -0,0 +1,52 @@
+"""
+Тесты монитора задержки цикла событий.
+
+Проверяют раскладку замеров по корзинам гистограммы и то, что блокирующий вызов
+в корутине записывается как блокировка вместе со стеком виновника.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.backend.loop_monitor import LoopMonitor
+
+
+def test_record_fills_histogram():
+    monitor = LoopMonitor(threshold=0.1)
+    monitor.record(0.0005)
+    monitor.record(0.02)
+    monitor.record(5.0)
+
+    stats = monitor.stats()
+    assert stats["samples"] == 3
+    assert stats["histogram_ms"]["le_1"] == 1
+    assert stats["histogram_ms"]["le_25"] == 1
+    assert stats["histogram_ms"]["inf"] == 1
+    assert stats["max_lag_ms"] == 5000.0
+    assert stats["stalls"] == 1
+
+
+def blocking_step():
+    time.sleep(0.4)  # Синхронный вызов в цикле событий
+
+
+@pytest.mark.asyncio
+async def test_stall_is_recorded_with_stack():
+    monitor = LoopMonitor(interval=0.02, threshold=0.1)
+    task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.1)
+
+    blocking_step()
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    stats = monitor.stats()
+    assert stats["stalls"] == 1
+    stall = stats["recent_stalls"][0]
+    assert stall["lag_ms"] >= 300
+    assert "blocking_step" in stall["stack"]
+    assert monitor._stop.is_set()  # Сторожевой поток остановлен вместе с задачей
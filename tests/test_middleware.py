@@ -0,0 +1,199 @@
+"""
+Тесты ограничения конкурентности, сброса нагрузки и сжатия ответов.
+"""
+
+import asyncio
+import gzip
+import zlib
+
+import orjson
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.backend.compression import negotiate
+from app.backend.middleware import CompressionMiddleware, ConcurrencyLimitMiddleware, RouteGroup
+
+
+def build_app(queue_timeout: float) -> tuple[FastAPI, RouteGroup]:
+    group = RouteGroup("reads", limit=1, queue_timeout=queue_timeout, methods=("GET",))
+    app = FastAPI()
+    app.add_middleware(ConcurrencyLimitMiddleware, groups=[group], exempt=("/health",))
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.1)
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    return app, group
+
+
+@pytest.mark.asyncio
+async def test_request_over_queue_budget_is_shed():
+    """Запрос, ждущий дольше бюджета очереди, получает 503 с Retry-After."""
+    app, group = build_app(queue_timeout=0.01)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        first, second = await asyncio.gather(client.get("/slow"), client.get("/slow"))
+
+    statuses = sorted([first.status_code, second.status_code])
+    assert statuses == [200, 503]
+    shed = first if first.status_code == 503 else second
+    assert shed.headers["retry-after"] == "1"
+    assert group.stats()["shed"] == 1
+    assert group.stats()["admitted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_request_within_queue_budget_waits():
+    """Запрос, дождавшийся места в пределах бюджета, обрабатывается."""
+    app, group = build_app(queue_timeout=1.0)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(client.get("/slow"), client.get("/slow"))
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert group.stats()["shed"] == 0
+    assert group.stats()["inflight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_exempt_paths_are_not_limited():
+    """Проверки здоровья не ограничиваются даже при занятой группе."""
+    app, group = build_app(queue_timeout=0.01)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        slow, health = await asyncio.gather(client.get("/slow"), client.get("/health"))
+
+    assert slow.status_code == 200
+    assert health.status_code == 200
+    assert group.stats()["admitted"] == 1
+
+
+def build_compressed_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/roles/")
+    async def roles():
+        return [{"role_id": i, "role_name": f"role_{i}"} for i in range(200)]
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for i in range(3):
+                yield orjson.dumps({"batch": i, "moved": i * 1000}) + b"\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.api_route("/versioned", methods=["GET", "HEAD"])
+    async def versioned(request: Request):
+        # Как условные GET списков: слабое сравнение, 304 без тела
+        if request.headers.get("if-none-match", "").removeprefix("W/") == '"v1"':
+            return Response(status_code=304, headers={"ETag": '"v1"'})
+        return Response(b"[" + b"1," * 600 + b"1]", media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/image")
+    async def image():
+        return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+    return app
+
+
+def test_negotiate_honours_q_values_and_server_preference():
+    """Выбирается кодек с наибольшим q, при равных — предпочтительный для сервера."""
+    available = ("zstd", "br", "gzip")
+    assert negotiate("gzip, zstd", available) == "zstd"
+    assert negotiate("zstd;q=0.5, gzip", available) == "gzip"
+    assert negotiate("*;q=0.1, br;q=0", available) == "zstd"
+    assert negotiate("identity", available) is None
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_compressed_small_and_binary_are_not():
+    """Сжимается только JSON не меньше порога; Content-Length заменяется, Vary добавляется."""
+    transport = ASGITransport(app=build_compressed_app())
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        roles = await client.get("/roles/", headers={"accept-encoding": "gzip"})
+        small = await client.get("/small", headers={"accept-encoding": "gzip"})
+        image = await client.get("/image", headers={"accept-encoding": "gzip"})
+        plain = await client.get("/roles/", headers={"accept-encoding": "identity"})
+
+    assert roles.headers["content-encoding"] == "gzip"
+    assert roles.headers["vary"] == "Accept-Encoding"
+    assert roles.json() == plain.json()
+    assert int(plain.headers["content-length"]) > 3 * len(gzip.compress(plain.content))
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in image.headers
+
+
+@pytest.mark.asyncio
+async def test_streaming_response_is_compressed_chunk_by_chunk():
+    """Каждая часть потока сжимается и отправляется сразу, поток целиком распаковывается."""
+    sent = []
+    app = build_compressed_app()
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.Event().wait()  # Клиент не отключается
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/stream", "raw_path": b"/stream", "query_string": b"",
+        "headers": [(b"accept-encoding", b"gzip")], "http_version": "1.1", "scheme": "http",
+        "server": ("test", 80), "client": ("test", 1), "root_path": "",
+    }
+    await app(scope, receive, send)
+
+    chunks = [m["body"] for m in sent if m["type"] == "http.response.body" and m["body"]]
+    assert len(chunks) >= 3
+    decompressor = zlib.decompressobj(31)
+    first = decompressor.decompress(chunks[0])
+    assert orjson.loads(first) == {"batch": 0, "moved": 0}  # Первая часть читается сразу
+    lines = (first + b"".join(decompressor.decompress(c) for c in chunks[1:])).splitlines()
+    assert [orjson.loads(line)["batch"] for line in lines] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_not_modified_keeps_weak_etag_and_vary():
+    """304 на сжатый ответ несёт тот же слабый ETag и Vary, что и сам ответ."""
+    transport = ASGITransport(app=build_compressed_app())
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        full = await client.get("/versioned", headers={"accept-encoding": "gzip"})
+        again = await client.get(
+            "/versioned", headers={"accept-encoding": "gzip", "if-none-match": full.headers["etag"]}
+        )
+        head = await client.head("/versioned", headers={"accept-encoding": "gzip"})
+        plain = await client.get("/versioned", headers={"accept-encoding": "identity"})
+
+    assert full.headers["etag"] == 'W/"v1"'
+    assert again.status_code == 304
+    assert again.headers["etag"] == full.headers["etag"]
+    assert again.headers["vary"] == "Accept-Encoding"
+    assert head.headers["etag"] == 'W/"v1"' and head.headers["vary"] == "Accept-Encoding"
+    assert plain.headers["etag"] == '"v1"'  # Тело без сжатия — ETag остаётся сильным
+
+
+@pytest.mark.asyncio
+async def test_vary_is_set_on_uncompressed_responses_of_compressible_types():
+    """Кэш не должен отдать несжатую копию клиенту, ждущему сжатую, и наоборот."""
+    transport = ASGITransport(app=build_compressed_app())
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        small = await client.get("/small", headers={"accept-encoding": "gzip"})
+        plain = await client.get("/roles/", headers={"accept-encoding": "identity"})
+        bare = await client.get("/roles/", headers={"accept-encoding": ""})
+        image = await client.get("/image", headers={"accept-encoding": "gzip"})
+
+    for response in (small, plain, bare):
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
+    assert "vary" not in image.headers
@@ -0,0 +1,119 @@
+"""
+Тесты синхронизации политики доступа.
+
+Проверяют вычисление минимального набора изменений и то, что совпадающая
+с базой политика не порождает ни одного запроса на запись.
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.backend.policy import PolicyError, apply_policy, diff_named, diff_rules
+from app.schemas.policy import Policy
+
+CURRENT_ROLES = [(1, "admin", "Администратор"), (2, "user", None)]
+CURRENT_ELEMENTS = [(2, "roles", None), (3, "rule", None)]
+CURRENT_RULES = [
+    (10, 1, 2, True, True, True, True),
+    (11, 1, 3, True, True, True, True),
+    (12, 2, 2, True, False, False, False),
+    (13, 2, 2, True, False, False, False),  # Дубликат пары
+]
+
+POLICY = {
+    "roles": [{"name": "admin", "description": "Администратор"}, {"name": "user"}],
+    "elements": [{"name": "roles"}, {"name": "rule"}],
+    "rules": [
+        {"role": "admin", "element": "roles", "read_permission": True, "create_permission": True,
+         "update_permission": True, "delete_permission": True},
+        {"role": "admin", "element": "rule", "read_permission": True, "create_permission": True,
+         "update_permission": True, "delete_permission": True},
+        {"role": "user", "element": "roles", "read_permission": True},
+    ],
+}
+
+
+def make_session():
+    """Сессия, отдающая текущее состояние на первые четыре запроса и записывающая остальные."""
+    session = MagicMock()
+    session.execute = AsyncMock(side_effect=[
+        None, iter(CURRENT_ROLES), iter(CURRENT_ELEMENTS), iter(CURRENT_RULES),
+    ] + [iter([(3, "auditor")])] * 10)
+    return session
+
+
+def test_diff_named_and_rules():
+    roles = diff_named({"admin": (1, "a"), "old": (5, None)}, {"admin": "b", "new": None})
+    assert (roles.create, roles.update, roles.delete) == ([("new", None)], [(1, "b")], [5])
+
+    rules = diff_rules(
+        {("admin", "roles"): (10, (True,) * 4), ("user", "roles"): (12, (True, False, False, False))},
+        {("admin", "roles"): (True,) * 4, ("user", "rule"): (True, False, False, False)},
+        stale=[13],
+    )
+    assert rules.create == [("user", "rule", (True, False, False, False))]
+    assert rules.update == []
+    assert sorted(rules.delete) == [12, 13]
+
+
+@pytest.mark.asyncio
+async def test_matching_policy_only_removes_duplicates():
+    session = make_session()
+
+    result = await apply_policy(session, Policy.model_validate(POLICY))
+
+    assert result["roles"] == {"created": 0, "updated": 0, "deleted": 0}
+    assert result["rules"] == {"created": 0, "updated": 0, "deleted": 1}
+    assert session.execute.await_count == 5  # Блокировка, три чтения и одно удаление
+
+
+@pytest.mark.asyncio
+async def test_changed_policy_touches_only_changed_rows():
+    policy = Policy.model_validate({
+        **POLICY,
+        "roles": POLICY["roles"] + [{"name": "auditor"}],
+        "rules": POLICY["rules"][:2] + [
+            {"role": "user", "element": "roles", "read_permission": False},
+            {"role": "auditor", "element": "rule", "read_permission": True},
+        ],
+    })
+
+    result = await apply_policy(make_session(), policy, dry_run=True)
+
+    assert result["roles"] == {"created": 1, "updated": 0, "deleted": 0}
+    assert result["rules"] == {"created": 1, "updated": 1, "deleted": 1}
+
+
+@pytest.mark.asyncio
+async def test_rule_with_unknown_role_is_rejected():
+    policy = Policy.model_validate({**POLICY, "rules": [{"role": "ghost", "element": "roles"}]})
+
+    with pytest.raises(PolicyError):
+        await apply_policy(make_session(), policy)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("section", ["roles", "elements"])
+async def test_duplicate_names_are_rejected(section):
+    """Повторное имя не схлопывается молча в одну запись."""
+    policy = Policy.model_validate({**POLICY, section: POLICY[section] + [{"name": POLICY[section][0]["name"]}]})
+
+    with pytest.raises(PolicyError, match="Повторное имя"):
+        await apply_policy(make_session(), policy)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("dry_run", [False, True])
+async def test_referenced_element_cannot_be_deleted_or_renamed(dry_run):
+    """Элемент, на который обработчики ссылаются по id, не удаляется и не пересоздаётся."""
+    policy = Policy.model_validate({
+        **POLICY,
+        "elements": [{"name": "role_admin"}, {"name": "rule"}],
+        "rules": [rule for rule in POLICY["rules"] if rule["element"] == "rule"],
+    })
+    session = make_session()
+
+    with pytest.raises(PolicyError, match="'roles'"):
+        await apply_policy(session, policy, dry_run=dry_run)
+    assert session.execute.await_count == 4  # Только блокировка и чтения
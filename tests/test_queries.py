@@ -0,0 +1,96 @@
+"""
+Тесты запросов к активным пользователям.
+
+Проверяют, что фильтрация деактивированных аккаунтов выполняется в SQL
+и совпадает с предикатом частичных индексов модели `User`.
+"""
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql
+
+from app.backend.queries import (
+    ACTIVE_USER_BY_EMAIL,
+    ACTIVE_USER_BY_ID,
+    INSERT_ACTIVE_USER,
+    UPDATE_ACTIVE_USER,
+)
+from app.backend.statement_cache import StatementCacheStats
+from app.models.access_rule import Base
+from app.models.user import User
+from app.schemas.user import UserLogin
+
+
+def _sql(query) -> str:
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+def test_active_user_by_id_filters_in_sql():
+    """Поиск по id содержит условие `is_active` в WHERE."""
+    sql = _sql(ACTIVE_USER_BY_ID)
+    assert "WHERE users.is_active AND users.id = " in sql
+
+
+def test_active_user_by_email_filters_in_sql():
+    """Поиск по email содержит условие `is_active` и выражение функционального индекса."""
+    sql = _sql(ACTIVE_USER_BY_EMAIL)
+    assert "WHERE users.is_active AND lower(users.email) = " in sql
+
+
+def test_partial_indexes_match_query_predicate():
+    """Частичные индексы построены с тем же предикатом, что и запросы."""
+    indexes = {index.name: index for index in User.__table__.indexes}
+    email_index = indexes["ix_users_email_lower_active"]
+    assert email_index.unique
+    assert [str(expr) for expr in email_index.expressions] == ["lower(users.email)"]
+    assert str(email_index.dialect_options["postgresql"]["where"]) == "users.is_active"
+    assert "ix_users_id_active" in indexes
+
+
+def test_insert_active_user_is_single_upsert_statement():
+    """Регистрация — один INSERT с арбитром конфликта по частичному индексу."""
+    sql = _sql(INSERT_ACTIVE_USER)
+    assert "ON CONFLICT (lower(email)) WHERE is_active DO NOTHING" in sql
+    assert sql.endswith("RETURNING users.id")
+
+
+def test_update_active_user_returns_id():
+    """Обновление профиля — один UPDATE только по активному пользователю."""
+    sql = _sql(UPDATE_ACTIVE_USER)
+    assert "WHERE users.is_active AND users.id = " in sql
+    assert sql.endswith("RETURNING users.id")
+
+
+def test_prebuilt_query_hits_compiled_cache():
+    """Повторное выполнение заранее построенного запроса берёт SQL из кэша компиляции."""
+    engine = create_engine("sqlite://")
+    stats = StatementCacheStats()
+    event.listen(engine, "after_cursor_execute", stats.record)
+    Base.metadata.create_all(engine)
+
+    with engine.connect() as conn:
+        for user_id in range(1, 6):
+            conn.execute(ACTIVE_USER_BY_ID, {"user_id": user_id})
+
+    result = stats.stats()
+    assert result["cache_miss"] == 1
+    assert result["cache_hit"] == 4
+    assert result["hit_ratio"] == 0.8
+
+
+def test_email_is_unique_and_found_regardless_of_case():
+    """Email нормализуется схемой; индекс по lower(email) не пускает второй регистр."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    login = UserLogin(email="  Foo@X.com", password="secret")
+    assert login.email == "foo@x.com"
+
+    users = User.__table__
+    with engine.connect() as conn:
+        conn.execute(users.insert(), [{"email": "foo@x.com", "is_active": True}])
+        with pytest.raises(IntegrityError):
+            conn.execute(users.insert(), [{"email": "FOO@x.com", "is_active": True}])
+        found = conn.execute(ACTIVE_USER_BY_EMAIL, {"email": login.email}).all()
+
+    assert len(found) == 1
@@ -0,0 +1,114 @@
+"""
+Тесты журнала медленных запросов.
+
+Проверяют нормализацию SQL в отпечатки и то, что выполнения на настоящем движке
+(SQLite в памяти) сливаются по отпечатку и приписываются шаблону маршрута, а также
+проверку прав администратора и ошибки построения плана.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.backend import query_stats as query_stats_module
+from app.backend.db_depends import get_read_session
+from app.backend.query_stats import QueryStats, current_scope, fingerprint, fingerprint_id
+from app.models.access_rule import Base
+from app.main import app
+from app.models.role import Role
+from app.routers.auth import get_current_user_id
+
+
+def test_fingerprint_normalizes_literals_and_in_lists():
+    first = fingerprint("SELECT id FROM roles WHERE name = 'admin' AND id IN ($1, $2, $3) LIMIT 10")
+    second = fingerprint("SELECT id  FROM roles\nWHERE name = 'user' AND id IN ($1) LIMIT 20")
+
+    assert first == second == "SELECT id FROM roles WHERE name = ? AND id IN (...) LIMIT ?"
+    assert fingerprint("SELECT roles_1.id::text FROM roles AS roles_1") == \
+        "SELECT roles_1.id::text FROM roles AS roles_1"
+
+
+def test_record_keeps_slow_samples_for_explain():
+    stats = QueryStats(threshold=0.1)
+    stats.record("SELECT 1 FROM users WHERE id = $1", (5,), 0.01)
+    stats.record("SELECT 1 FROM users WHERE id = $1", (7,), 0.3)
+
+    [row] = stats.report()
+    assert row["calls"] == 2 and row["max_ms"] == 300.0
+    sample = stats.slow_sample(row["id"])
+    assert sample["parameters"] == (7,) and sample["route"] == "-"
+
+
+@pytest.mark.asyncio
+async def test_engine_statements_are_attributed_to_route(mocker):
+    stats = QueryStats(threshold=10.0)
+    mocker.patch.object(query_stats_module, "query_stats", stats)
+    engine = query_stats_module.instrument(create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    stats.reset()
+
+    route = SimpleNamespace(path="/roles/{role_id}")
+    token = current_scope.set({"type": "http", "method": "GET", "path": "/roles/1", "route": route})
+    try:
+        async with engine.connect() as conn:
+            for role_id in (1, 2, 3):
+                await conn.execute(select(Role.name).where(Role.id == role_id))
+    finally:
+        current_scope.reset(token)
+    await engine.dispose()
+
+    [row] = stats.report(route="GET /roles/{role_id}")
+    assert row["calls"] == 3
+    assert row["id"] == fingerprint_id(row["fingerprint"])
+    assert "roles.id = ?" in row["fingerprint"]
+
+
+@pytest.fixture
+def admin_client(mocker):
+    """Клиент администратора; снимок прав в воркере ещё не загружен."""
+    cache = MagicMock(is_fresh=False, roles={})
+
+    async def refresh():
+        cache.roles = {1: "admin"}
+        cache.is_fresh = True
+
+    cache.refresh = AsyncMock(side_effect=refresh)
+    mocker.patch("app.routers.admin.permission_cache", cache)
+    mocker.patch("app.routers.admin.load_principal", AsyncMock(return_value=MagicMock(role_id=1)))
+
+    async def override_session():
+        yield AsyncMock()
+
+    app.dependency_overrides[get_read_session] = override_session
+    app.dependency_overrides[get_current_user_id] = lambda: {"user_id": "1"}
+    client = TestClient(app)
+    client.cache = cache
+    yield client
+    app.dependency_overrides.clear()
+
+
+def test_admin_check_refreshes_unloaded_snapshot(admin_client):
+    """Пока снимок не загружен, администратор не получает 403: снимок загружается по запросу."""
+    assert admin_client.get("/admin/queries").status_code == 200
+    admin_client.cache.refresh.assert_awaited_once()
+
+
+def test_explain_driver_error_is_422(admin_client, mocker):
+    sample = {"statement": "SELECT $1", "parameters": ("x",)}
+    mocker.patch.object(query_stats_module.query_stats, "slow_sample", return_value=sample)
+    mocker.patch(
+        "app.routers.admin.explain",
+        AsyncMock(side_effect=DBAPIError("EXPLAIN", (), Exception("could not determine data type"))),
+    )
+
+    response = admin_client.post("/admin/queries/abc/explain")
+
+    assert response.status_code == 422
+    assert "could not determine data type" in response.json()["detail"]
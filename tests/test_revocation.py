@@ -0,0 +1,159 @@
+"""
+Тесты списка отозванных токенов.
+
+Проверяют, что фильтр Блума не даёт ложных отрицаний, что обычный (не отозванный)
+токен проверяется без запроса к базе данных, а выход из системы отзывает токен.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.backend import revocation
+from app.backend.revocation import BloomFilter, RevocationList
+from app.backend.versions import table_versions
+from app.routers.auth import get_current_user_id, get_security, logout, token_lifetime
+
+
+@pytest.fixture
+def revoked_table(mocker):
+    """Подменяет базу: таблица revoked_tokens пуста, проверка по jti возвращает None."""
+    ss = MagicMock(sync_session=Session())  # Настоящая: на неё подписывается statement_timeout
+    ss.execute = AsyncMock(return_value=MagicMock(all=MagicMock(return_value=[])))
+    ss.scalar = AsyncMock(return_value=None)
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=ss)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    mocker.patch.object(revocation.db, "get_session_factory", return_value=factory)
+    return ss
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10_000))
+    assert false_positives < 300  # ~1% при расчётной ёмкости
+
+
+@pytest.mark.asyncio
+async def test_not_revoked_token_needs_no_query(revoked_table):
+    revocations = RevocationList(capacity=1000)
+    await revocations.sync()
+    revoked_table.execute.reset_mock()
+
+    assert await revocations.is_revoked("fresh-jti") is False
+    revoked_table.execute.assert_not_awaited()
+    revoked_table.scalar.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_recently_revoked_token_is_rejected_without_query(revoked_table):
+    revocations = RevocationList(capacity=1000)
+    await revocations.sync()
+    revocations.remember("stolen-jti", time.time() + 60)
+
+    assert await revocations.is_revoked("stolen-jti") is True
+    revoked_table.scalar.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_sync_loads_only_new_revocations_including_late_commits(revoked_table):
+    """После первой загрузки догружается только окно новых записей; поздно зафиксированная
+    запись с более ранним created_at не теряется, а уже известные не добавляются повторно."""
+    now = datetime.now(timezone.utc)
+    expires = now + timedelta(minutes=5)
+    revocations = RevocationList()
+    revoked_table.execute.return_value.all.return_value = [("jti-20", expires, now)]
+    await revocations.sync()
+
+    revoked_table.execute.return_value.all.return_value = [
+        ("jti-19", expires, now - timedelta(seconds=1)),  # Транзакция началась раньше, зафиксирована позже
+        ("jti-20", expires, now),
+    ]
+    table_versions.bump("revoked_tokens")
+    assert await revocations.is_revoked("jti-19") is True
+    revoked_table.scalar.assert_not_awaited()
+
+    query = str(revoked_table.execute.call_args.args[0])
+    assert "created_at >" in query  # Окно, а не всё множество
+    assert revocations.bloom.count == 2
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_token(mocker):
+    remember = mocker.patch.object(revocation.revocation_list, "remember")
+    is_revoked = mocker.patch.object(revocation.revocation_list, "is_revoked", AsyncMock(return_value=True))
+    token = get_security().create_access_token(uid="5")
+    request = MagicMock(headers={}, cookies={"my_secret_token": token})
+    session = MagicMock(execute=AsyncMock(), commit=AsyncMock())
+    version = table_versions.get("revoked_tokens")
+
+    await logout(request, MagicMock(), session)
+
+    session.execute.assert_awaited_once()
+    session.commit.assert_awaited_once()
+    assert remember.call_args.args[0] == session.execute.call_args.args[1]["jti"]
+    assert table_versions.get("revoked_tokens") == version + 1
+
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user_id(request)
+    assert exc.value.status_code == 401
+    is_revoked.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("token", ["not-a-jwt", "a.eyJleHAiOiAidG9tb3Jyb3cifQ.c"])
+async def test_malformed_token_is_unauthorized(token):
+    """Нечитаемый токен или `exp` не числом — 401, а не 500."""
+    request = MagicMock(headers={}, cookies={"my_secret_token": token})
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user_id(request)
+    assert exc.value.status_code == 401
+
+
+def signed(key: str = "SUPER_SECRET_KEY", **claims) -> str:
+    return jwt.encode({"sub": "5", "exp": int(time.time()) + 600, **claims}, key, algorithm="HS256")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("claims", [
+    {"key": "attacker-key", "jti": "victim-jti"},  # Подпись не сервиса
+    {},  # Без jti: такой токен нельзя было бы отозвать
+], ids=["forged", "without-jti"])
+async def test_forged_or_jti_less_token_is_rejected_and_not_revoked(claims, mocker):
+    # Токен собирается в тесте: со сроком из time.time() при сборе id тестов разошлись бы между воркерами xdist
+    token = signed(**claims)
+    remember = mocker.patch.object(revocation.revocation_list, "remember")
+    request = MagicMock(headers={}, cookies={"my_secret_token": token})
+    session = MagicMock(execute=AsyncMock(), commit=AsyncMock())
+
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user_id(request)
+    assert exc.value.status_code == 401
+
+    await logout(request, MagicMock(), session)
+    session.execute.assert_not_awaited()
+    remember.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_revocation_lifetime_is_capped(mocker):
+    """Подписанный `exp` далеко в будущем не продлевает хранение записи об отзыве."""
+    mocker.patch.object(revocation.revocation_list, "remember")
+    token = signed(jti="long-lived", exp=int(time.time()) + 10 * 365 * 24 * 3600)
+    request = MagicMock(headers={}, cookies={"my_secret_token": token})
+    session = MagicMock(execute=AsyncMock(), commit=AsyncMock())
+
+    await logout(request, MagicMock(), session)
+
+    expires_at = session.execute.call_args.args[1]["expires_at"].timestamp()
+    assert expires_at <= time.time() + token_lifetime() + 1
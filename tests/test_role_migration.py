@@ -0,0 +1,58 @@
+"""
+Тесты переноса пользователей между ролями и каскадного удаления роли.
+
+Выполняются на SQLite в памяти: проверяют перенос пачками, удаление правил
+вместе с ролью и отказ удалять роль, у которой остались пользователи.
+"""
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.backend import role_migration
+from app.models.access_rule import AccessRule, Base
+from app.models.role import Role
+from app.models.user import User
+
+
+@pytest_asyncio.fixture
+async def factory(mocker):
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(bind=engine)
+    async with factory() as ss:
+        ss.add_all([Role(id=1, name="admin"), Role(id=2, name="user"), Role(id=3, name="guest")])
+        ss.add_all([User(email=f"u{i}@x.io", role_id=3) for i in range(7)])
+        ss.add(AccessRule(role_id=3, element_id=2, read_permission=True))
+        await ss.commit()
+    mocker.patch.object(role_migration.db, "get_session_factory", return_value=factory)
+    yield factory
+    await engine.dispose()
+
+
+async def count_users(factory, role_id):
+    async with factory() as ss:
+        return await ss.scalar(select(func.count()).where(User.role_id == role_id))
+
+
+@pytest.mark.asyncio
+async def test_migrate_role_moves_users_in_batches_and_deletes_role(factory):
+    steps = [step async for step in role_migration.migrate_role(3, 2, delete_source=True, batch_size=3)]
+
+    assert [step["moved"] for step in steps if step.get("stage") == "users"] == [3, 6, 7]
+    assert steps[-1] == {"done": True, "moved": 7, "role_deleted": True, "rules_deleted": 1}
+    assert await count_users(factory, 2) == 7
+    async with factory() as ss:
+        assert await ss.get(Role, 3) is None
+        assert await ss.scalar(select(func.count()).select_from(AccessRule)) == 0
+
+
+@pytest.mark.asyncio
+async def test_role_with_users_is_not_deleted(factory):
+    with pytest.raises(role_migration.RoleInUseError):
+        await role_migration.delete_role(3)
+
+    assert await count_users(factory, 3) == 7
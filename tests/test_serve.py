@@ -0,0 +1,85 @@
+"""
+Тесты pre-fork запуска: параметры по умолчанию, сброс движков в воркере и перезапуск
+падающих воркеров с нарастающей паузой.
+"""
+
+import os
+
+from app import serve
+from app.backend import db
+from app.serve import parse_args
+
+
+def test_workers_default_to_cpu_count(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert parse_args([]).workers == (os.cpu_count() or 1)
+
+
+def test_reset_engines_creates_new_engine_in_worker():
+    """После fork воркер не должен использовать движок (и пул) родителя."""
+    parent_engine = db.get_engine()
+    parent_factory = db.get_session_factory()
+
+    db.reset_engines()
+
+    assert db.get_engine() is not parent_engine
+    assert db.get_session_factory() is not parent_factory
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def crashing_master(mocker, lifetime: float):
+    """Мастер с одним воркером, который каждый раз завершается через `lifetime` секунд."""
+    clock = FakeClock()
+    mocker.patch.object(serve.time, "monotonic", clock.monotonic)
+    mocker.patch.object(serve.time, "sleep", clock.sleep)
+    mocker.patch.object(serve.signal, "signal")
+    master = serve.Master(app=None, sock=None, workers=1)
+    spawned = []
+
+    def spawn():
+        pid = len(spawned) + 100
+        spawned.append(clock.now)
+        master.children[pid] = clock.now
+        return pid
+
+    def waitpid(_pid, _options):
+        dead = [pid for pid, started in master.children.items() if clock.now - started >= lifetime]
+        return (dead[0], 0) if dead else (0, 0)
+
+    mocker.patch.object(master, "spawn", side_effect=spawn)
+    mocker.patch.object(serve.os, "waitpid", side_effect=waitpid)
+    return master, spawned
+
+
+def test_crash_loop_backs_off_and_gives_up(mocker):
+    """Воркер, падающий сразу после запуска, перезапускается всё реже, затем мастер сдаётся."""
+    master, spawned = crashing_master(mocker, lifetime=0.2)
+
+    assert master.run() == 1
+
+    assert len(spawned) == serve.MAX_FAST_FAILURES
+    gaps = [later - earlier for earlier, later in zip(spawned, spawned[1:])]
+    assert all(later > earlier for earlier, later in zip(gaps, gaps[1:]))  # Паузы растут
+    assert max(gaps) <= serve.RESPAWN_BACKOFF_MAX + 1
+
+
+def test_long_lived_worker_resets_backoff(mocker):
+    """Падение воркера, проработавшего дольше окна, не считается падением при запуске."""
+    master, _ = crashing_master(mocker, lifetime=0.2)
+    master.record_exit(0.1)
+    master.record_exit(0.1)
+    assert master.fast_failures == 2 and master.respawn_at > 0
+
+    master.record_exit(serve.FAST_FAILURE_WINDOW + 1)
+
+    assert master.fast_failures == 0 and master.respawn_at == 0.0
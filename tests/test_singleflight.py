@@ -0,0 +1,67 @@
+"""
+Тесты объединения одинаковых конкурентных загрузок (single-flight).
+"""
+
+import asyncio
+
+import pytest
+
+from app.backend.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_load():
+    """Одновременные вызовы с одним ключом выполняют загрузку один раз."""
+    flight = SingleFlight()
+    started = 0
+
+    async def load():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.01)
+        return "user"
+
+    results = await asyncio.gather(*(flight.do(("principal", 1), load) for _ in range(50)))
+
+    assert results == ["user"] * 50
+    assert started == 1
+    assert flight.stats() == {"calls": 1, "shared": 49, "inflight": 0}
+
+
+@pytest.mark.asyncio
+async def test_key_is_released_after_completion_and_errors_are_shared():
+    """После завершения ключ освобождается; исключение получают все ожидающие."""
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("db down")
+
+    results = await asyncio.gather(
+        flight.do("rule", fail), flight.do("rule", fail), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def ok():
+        return 42
+
+    assert await flight.do("rule", ok) == 42
+    assert flight.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_load():
+    """Отмена одного ожидающего не отменяет загрузку для остальных."""
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.02)
+        return "rule"
+
+    first = asyncio.ensure_future(flight.do("rule", load))
+    second = asyncio.ensure_future(flight.do("rule", load))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "rule"
+    assert first.cancelled()
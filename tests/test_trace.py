@@ -0,0 +1,44 @@
+"""
+Тесты трассировки решений авторизации.
+
+Проверяют, что трасса с путём решения и этапами отдаётся администратору по заголовку
+`X-AuthZ-Trace` и не отдаётся обычному пользователю.
+"""
+
+import json
+
+import pytest
+
+
+@pytest.fixture
+def as_role(client_as):
+    """Клиент от имени пользователя с заданной ролью; правила берутся из подменённого кэша."""
+    return client_as(
+        rules=[(1, 2, False, True, True, True)],
+        elements=[(2, "role"), (3, "access_rule")],
+    )
+
+
+def test_admin_gets_decision_path_and_stages(as_role):
+    response = as_role(1).get("/roles/", headers={"X-AuthZ-Trace": "1"})
+
+    assert response.status_code == 403
+    trace = json.loads(response.headers["X-AuthZ-Trace"])
+    assert trace["decision"] == "deny:permission_bit_false"
+    stages = {stage["stage"]: stage for stage in trace["stages"]}
+    assert stages["principal"]["found"] is True
+    assert stages["rule"]["cache"] == "hit"
+    assert stages["rule"]["read"] is False
+    assert all(stage["ms"] >= 0 for stage in trace["stages"])
+
+
+def test_missing_rule_is_reported(as_role):
+    response = as_role(1).get("/access-rules/", headers={"X-AuthZ-Trace": "1"})
+
+    assert json.loads(response.headers["X-AuthZ-Trace"])["decision"] == "deny:no_rule"
+
+
+def test_trace_is_admin_only_and_opt_in(as_role):
+    client = as_role(2)
+    assert "X-AuthZ-Trace" not in client.get("/roles/", headers={"X-AuthZ-Trace": "1"}).headers
+    assert "X-AuthZ-Trace" not in as_role(1).get("/roles/").headers
@@ -0,0 +1,42 @@
+"""
+Тесты карты эффективных прав текущего пользователя (`GET /users/me/permissions`).
+"""
+
+import pytest
+
+from app.backend.versions import table_versions
+
+
+@pytest.fixture
+def as_role(client_as):
+    """Клиент от имени пользователя с заданной ролью и снимком прав из двух элементов."""
+    return client_as(
+        rules=[(2, 2, True, False, False, False)],
+        elements=[(2, "roles"), (3, "rule")],
+    )
+
+
+def test_permissions_map_for_role(as_role):
+    response = as_role(2).get("/users/me/permissions")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "role_id": 2,
+        "role": "user",
+        "permissions": {
+            "roles": {"read": True, "create": False, "update": False, "delete": False},
+            "rule": {"read": False, "create": False, "update": False, "delete": False},
+        },
+    }
+    assert "max-age" in response.headers["Cache-Control"]
+
+
+def test_revalidation_returns_304_until_role_or_rules_change(as_role):
+    client = as_role(2)
+    etag = client.get("/users/me/permissions").headers["ETag"]
+
+    assert client.get("/users/me/permissions", headers={"If-None-Match": etag}).status_code == 304
+    assert as_role(1).get("/users/me/permissions", headers={"If-None-Match": etag}).status_code == 200
+
+    table_versions.bump("access_rules")
+    assert as_role(2).get("/users/me/permissions", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,117 @@
+"""
+Тесты версий таблиц и условных GET-запросов к спискам ролей и правил.
+
+Проверяют, что ETag меняется после записи, а запрос с актуальным `If-None-Match`
+получает 304 без обращения к базе данных.
+"""
+
+import multiprocessing
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.backend.cache import response_cache
+from app.backend.db_depends import get_read_session
+from app.backend.versions import TableVersions, table_versions
+from app.main import app
+from app.routers.auth import get_current_user_id
+
+
+@pytest.fixture
+def client(mocker):
+    """Клиент с авторизованным пользователем и сессией, обращение к которой — ошибка."""
+    untouched = AsyncMock()
+    untouched.execute.side_effect = AssertionError("запрос к БД при 304")
+    untouched.scalar.side_effect = AssertionError("запрос к БД при 304")
+    rule = MagicMock(read_permission=True)
+    for module in ("app.routers.roles", "app.routers.ac_rule"):
+        # Права проверяются и перед 304: принципал и правило — из кэшей в памяти
+        mocker.patch(f"{module}.load_principal", AsyncMock(return_value=MagicMock(role_id=2)))
+        mocker.patch(f"{module}.load_rule", AsyncMock(side_effect=lambda role_id, element_id: rule))
+
+    # Промах кэша списка читается с основного сервера: его сессия тоже «нетронутая»
+    primary = MagicMock(__aenter__=AsyncMock(return_value=untouched), __aexit__=AsyncMock(return_value=False))
+    mocker.patch("app.backend.db.get_session_factory", return_value=MagicMock(return_value=primary))
+
+    async def override_session():
+        yield untouched
+
+    app.dependency_overrides[get_read_session] = override_session
+    app.dependency_overrides[get_current_user_id] = lambda: {"user_id": "1"}
+    client = TestClient(app)
+    client.rule = rule
+    yield client
+    app.dependency_overrides.clear()
+
+
+def test_etag_changes_after_bump():
+    """ETag зависит от версии таблицы."""
+    versions = TableVersions()
+    before = versions.etag("roles")
+    versions.bump("roles")
+    assert versions.etag("roles") != before
+    assert versions.etag("roles").startswith('"') and versions.etag("roles").endswith('"')
+
+
+@pytest.mark.parametrize("path, table", [("/roles/", "roles"), ("/access-rules/", "access_rules")])
+def test_if_none_match_returns_304_without_db(client, path, table):
+    """Актуальный ETag — 304 без запросов к БД."""
+    etag = table_versions.etag(table)
+
+    response = client.get(path, headers={"If-None-Match": f'W/"other", W/{etag}'})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == f"W/{etag}"  # Клиент принимает gzip: ETag как у сжатого ответа
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("path, table", [("/roles/", "roles"), ("/access-rules/", "access_rules")])
+def test_if_none_match_without_read_permission_is_forbidden(client, path, table):
+    """Без права чтения — 403, а не 304 с версией таблицы, в том числе для `*`."""
+    client.rule.read_permission = False
+
+    for validator in (table_versions.etag(table), "*"):
+        response = client.get(path, headers={"If-None-Match": validator})
+        assert response.status_code == 403
+        assert "etag" not in response.headers
+
+
+def test_stale_etag_is_not_matched(client):
+    """После записи прежний ETag не совпадает и запрос идёт в БД."""
+    etag = table_versions.etag("roles")
+    table_versions.bump("roles")
+
+    with pytest.raises(AssertionError, match="запрос к БД"):
+        client.get("/roles/", headers={"If-None-Match": etag})
+
+
+def test_cache_miss_reads_primary_not_replica(client, mocker):
+    """Тело, кэшируемое под новым ETag, строится с основного сервера, а не с отстающей реплики."""
+    table_versions.bump("roles")
+    fresh = AsyncMock()
+    fresh.execute.return_value = [(1, "admin"), (7, "auditor")]
+    primary = MagicMock(__aenter__=AsyncMock(return_value=fresh), __aexit__=AsyncMock(return_value=False))
+    mocker.patch("app.backend.db.get_session_factory", return_value=MagicMock(return_value=primary))
+
+    response = client.get("/roles/")
+
+    assert response.status_code == 200
+    assert [role["role_name"] for role in response.json()] == ["admin", "auditor"]
+    assert response_cache.get(("roles", response.headers["ETag"], "")) == response.content
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="нужен fork")
+def test_bump_in_forked_worker_is_visible_to_others():
+    """Запись в одном воркере меняет версию для всех процессов мастера."""
+    versions = TableVersions()
+    before = versions.etag("roles")
+
+    worker = multiprocessing.get_context("fork").Process(target=versions.bump, args=("roles",))
+    worker.start()
+    worker.join()
+
+    assert worker.exitcode == 0
+    assert versions.get("roles") == 1
+    assert versions.etag("roles") != before
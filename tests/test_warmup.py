@@ -0,0 +1,191 @@
+"""
+Тесты прогрева, готовности экземпляра и кэша данных авторизации.
+"""
+
+import os
+import shutil
+import stat
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.backend import permissions, warmup
+from app.backend.snapshot import PermissionSnapshot, compile_snapshot
+from app.backend.versions import table_versions
+from app.main import app
+
+
+@pytest.fixture
+def fresh_readiness(mocker):
+    state = warmup.Readiness()
+    mocker.patch.object(warmup, "readiness", state)
+    mocker.patch("app.routers.health.readiness", state)
+    return state
+
+
+def test_ready_is_503_until_warm(fresh_readiness):
+    """До окончания прогрева /health/ready отвечает 503, после — 200."""
+    client = TestClient(app)
+
+    assert client.get("/health/ready").status_code == 503
+    fresh_readiness.ready = True
+    assert client.get("/health/ready").json() == {"status": "ready"}
+    assert client.get("/health/live").status_code == 200
+
+
+def test_ready_does_not_expose_warm_up_error(fresh_readiness):
+    """Текст ошибки прогрева остаётся в журнале: анонимный клиент видит только статус и попытки."""
+    fresh_readiness.attempts = 3
+    fresh_readiness.last_error = "password authentication failed for user \"accessguard\""
+
+    response = TestClient(app).get("/health/ready")
+
+    assert response.status_code == 503
+    assert response.json() == {"status": "warming_up", "attempts": 3}
+
+
+@pytest.mark.asyncio
+async def test_warm_up_retries_until_success(fresh_readiness, mocker):
+    """Неудачный прогрев повторяется, ошибка видна до успеха."""
+    mocker.patch.object(warmup, "warm_up", AsyncMock(side_effect=[OSError("db down"), None]))
+
+    await warmup.warm_up_until_ready(retry_delay=0)
+
+    assert fresh_readiness.ready
+    assert fresh_readiness.attempts == 2
+    assert fresh_readiness.last_error is None
+
+
+def _fake_session_factory(rules, roles, elements):
+    ss = MagicMock(sync_session=Session())  # Настоящая: на неё подписывается statement_timeout
+    ss.execute = AsyncMock(side_effect=[
+        iter(rules), MagicMock(all=lambda: roles), MagicMock(all=lambda: elements)
+    ])
+    ctx = MagicMock()
+    ctx.__aenter__ = AsyncMock(return_value=ss)
+    ctx.__aexit__ = AsyncMock(return_value=False)
+    return MagicMock(return_value=ctx)
+
+
+@pytest.mark.asyncio
+async def test_permission_cache_reloads_only_after_write(mocker, tmp_path):
+    """Правила читаются из снимка; пересборка — только после изменения таблицы."""
+    factory = _fake_session_factory(
+        rules=[(1, 2, True, False, False, False)],
+        roles=[(1, "admin")],
+        elements=[(2, "role")],
+    )
+    mocker.patch.object(permissions.db, "get_session_factory", return_value=factory)
+    cache = permissions.PermissionCache(path=str(tmp_path / "permissions.bin"))
+
+    rule = await cache.get_rule(1, 2)
+    assert rule.read_permission and not rule.create_permission
+    assert await cache.get_rule(1, 3) is None
+    assert cache.roles == {1: "admin"} and cache.elements == {2: "role"}
+    assert factory.call_count == 1
+
+    table_versions.bump("access_rules")
+    factory.return_value.__aenter__.return_value.execute.side_effect = [
+        iter([(1, 2, True, True, False, False)]),
+        MagicMock(all=lambda: [(1, "admin")]),
+        MagicMock(all=lambda: [(2, "role")]),
+    ]
+
+    assert (await cache.get_rule(1, 2)).create_permission
+    assert factory.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_snapshot_built_by_one_worker_is_reused_by_others(mocker, tmp_path):
+    """Второй воркер открывает уже собранный снимок вместо запроса к базе данных."""
+    factory = _fake_session_factory(
+        rules=[(1, 2, True, False, False, True)],
+        roles=[(1, "admin")],
+        elements=[(2, "role")],
+    )
+    mocker.patch.object(permissions.db, "get_session_factory", return_value=factory)
+    path = str(tmp_path / "permissions.bin")
+    first, second = permissions.PermissionCache(path=path), permissions.PermissionCache(path=path)
+
+    await first.refresh()
+    rule = await second.get_rule(1, 2)
+
+    assert rule.read_permission and rule.delete_permission and not rule.update_permission
+    assert factory.call_count == 1
+    assert (first.refreshes, second.reopens) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_of_previous_master_is_overwritten(mocker, tmp_path):
+    """Имя файла не зависит от эпохи: снимок прошлого запуска не принимается и перезаписывается."""
+    tmp_path.chmod(0o700)
+    mocker.patch.object(permissions, "get_settings", return_value=MagicMock(PERMISSION_SNAPSHOT_DIR=str(tmp_path)))
+    mocker.patch.object(table_versions, "epoch", "previous")
+    factory = _fake_session_factory(rules=[(1, 2, True, False, False, False)], roles=[], elements=[])
+    mocker.patch.object(permissions.db, "get_session_factory", return_value=factory)
+    await permissions.PermissionCache().refresh()
+
+    mocker.patch.object(table_versions, "epoch", "current")
+    factory = _fake_session_factory(rules=[(1, 2, True, True, False, False)], roles=[], elements=[])
+    mocker.patch.object(permissions.db, "get_session_factory", return_value=factory)
+    cache = permissions.PermissionCache()
+
+    assert (await cache.get_rule(1, 2)).create_permission
+    assert (cache.refreshes, cache.reopens) == (1, 0)
+    assert sorted(os.listdir(tmp_path)) == ["permissions.bin", "permissions.bin.lock"]
+
+
+def test_default_snapshot_directory_is_private_per_master(mocker):
+    """Без настройки каждый мастер получает свой каталог 0700, а не общее имя в /dev/shm."""
+    mocker.patch.object(permissions, "get_settings", return_value=MagicMock(PERMISSION_SNAPSHOT_DIR=None))
+    first, second = permissions.PermissionCache().snapshot_path(), permissions.PermissionCache().snapshot_path()
+
+    assert os.path.dirname(first) != os.path.dirname(second)
+    for path in (first, second):
+        assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+        shutil.rmtree(os.path.dirname(path))
+
+
+def test_shared_snapshot_directory_is_refused(mocker, tmp_path):
+    """Каталог, открытый на запись другим, не используется."""
+    tmp_path.chmod(0o1777)
+    mocker.patch.object(permissions, "get_settings", return_value=MagicMock(PERMISSION_SNAPSHOT_DIR=str(tmp_path)))
+
+    with pytest.raises(PermissionError):
+        permissions.PermissionCache().snapshot_path()
+
+
+@pytest.mark.asyncio
+async def test_planted_symlinks_are_not_followed(mocker, tmp_path):
+    """Подложенные ссылки вместо снимка и временного файла не читаются и не перезаписывают цель."""
+    forged = tmp_path / "forged.bin"
+    forged.write_bytes(compile_snapshot(
+        table_versions.epoch, tuple(table_versions.get(t) for t in permissions.PermissionCache.TABLES),
+        [(1, 2, True, True, True, True)], [], [],
+    ))
+    victim = tmp_path / "victim"
+    victim.write_bytes(b"keep")
+    path = tmp_path / "permissions.bin"
+    path.symlink_to(forged)
+    (tmp_path / f"permissions.bin.{os.getpid()}.tmp").symlink_to(victim)
+    factory = _fake_session_factory(rules=[(1, 2, True, False, False, False)], roles=[], elements=[])
+    mocker.patch.object(permissions.db, "get_session_factory", return_value=factory)
+    cache = permissions.PermissionCache(path=str(path))
+
+    rule = await cache.get_rule(1, 2)
+
+    assert rule.read_permission and not rule.delete_permission  # Из базы, а не из подложенного файла
+    assert (cache.refreshes, cache.reopens) == (1, 0)
+    assert victim.read_bytes() == b"keep" and not path.is_symlink()
+
+
+@pytest.mark.skipif(not hasattr(os, "geteuid") or os.geteuid() != 0, reason="нужен root для chown")
+def test_snapshot_owned_by_another_user_is_not_mapped(tmp_path):
+    path = tmp_path / "permissions.bin"
+    path.write_bytes(compile_snapshot(table_versions.epoch, (0, 0, 0), [], [], []))
+    os.chown(path, 65534, 65534)
+
+    with pytest.raises(PermissionError):
+        PermissionSnapshot.open(str(path))